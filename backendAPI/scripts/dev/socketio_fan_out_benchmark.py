@@ -0,0 +1,174 @@
+"""Benchmarks the latency of Socket.IO emits fanning out through Redis to the clients of several workers.
+
+Runs a Socket.IO server with 1, 2, ... uvicorn workers sharing the Redis manager,
+connects clients over websockets, emits from outside the workers
+and measures the time until each client received the message.
+Needs the same environment as the backendAPI and a reachable Redis:
+
+    python scripts/dev/socketio_fan_out_benchmark.py --workers 1 2 4 --clients 200
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+import socketio
+
+NAMESPACE = "/benchmark"
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../src")
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+
+def create_app():
+    """Returns the Socket.IO server of one worker - started by uvicorn in the worker processes"""
+    from routers.socketio.v1.base import get_client_manager
+
+    server = socketio.AsyncServer(
+        async_mode="asgi",
+        client_manager=get_client_manager(),
+        logger=False,
+        engineio_logger=False,
+    )
+
+    @server.on("connect", namespace=NAMESPACE)
+    async def connect(sid, environ):
+        await server.emit("worker", os.getpid(), to=sid, namespace=NAMESPACE)
+
+    return socketio.ASGIApp(server)
+
+
+def start_workers(workers: int, port: int, environment: dict) -> subprocess.Popen:
+    """Starts uvicorn with the benchmark server in several worker processes"""
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "socketio_fan_out_benchmark:create_app",
+            "--factory",
+            "--app-dir",
+            os.path.dirname(os.path.abspath(__file__)),
+            "--workers",
+            str(workers),
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=environment,
+    )
+
+
+async def wait_for_workers(url: str, timeout: float = 30.0) -> None:
+    """Waits until the server accepts connections"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"{url}/socket.io/?EIO=4&transport=polling")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise TimeoutError(f"Workers did not start within {timeout} seconds.")
+
+
+async def connect_clients(url: str, count: int, latencies: dict, worker_ids: set):
+    """Connects the clients over websockets - load balancing needs no sticky sessions then"""
+    clients = []
+    for _ in range(count):
+        client = socketio.AsyncClient()
+
+        @client.on("worker", namespace=NAMESPACE)
+        async def worker(pid):
+            worker_ids.add(pid)
+
+        @client.on("tick", namespace=NAMESPACE)
+        async def tick(data):
+            latencies[data["id"]].append(time.time() - data["sent"])
+
+        await client.connect(url, namespaces=[NAMESPACE], transports=["websocket"])
+        clients.append(client)
+    return clients
+
+
+async def run(workers: int, clients: int, messages: int, interval: float, port: int):
+    """Measures the fan-out latency for one number of workers"""
+    from routers.socketio.v1.base import get_client_manager
+
+    url = f"http://127.0.0.1:{port}"
+    process = start_workers(workers, port, dict(os.environ))
+    latencies = {message_id: [] for message_id in range(messages)}
+    worker_ids = set()
+    connected = []
+    try:
+        await wait_for_workers(url)
+        connected = await connect_clients(url, clients, latencies, worker_ids)
+        emitter = get_client_manager(write_only=True)
+        for message_id in range(messages):
+            await emitter.emit(
+                "tick",
+                {"id": message_id, "sent": time.time()},
+                namespace=NAMESPACE,
+            )
+            await asyncio.sleep(interval)
+        # the last messages might still be on their way:
+        await asyncio.sleep(1.0)
+    finally:
+        for client in connected:
+            await client.disconnect()
+        process.terminate()
+        process.wait()
+
+    received = [latency for values in latencies.values() for latency in values]
+    fan_outs = [max(values) for values in latencies.values() if values]
+    if not received:
+        return f"{workers:>7} | no messages received"
+    percentiles = statistics.quantiles(received, n=100)
+    return (
+        f"{workers:>7} | {len(worker_ids):>7} | "
+        f"{100 * len(received) / (clients * messages):>8.1f}% | "
+        f"{1000 * percentiles[49]:>8.2f} | {1000 * percentiles[94]:>8.2f} | "
+        f"{1000 * percentiles[98]:>8.2f} | {1000 * statistics.mean(fan_outs):>11.2f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8765)
+    arguments = parser.parse_args()
+    # the workers of all runs share a channel, that no running backendAPI listens to:
+    os.environ["SOCKETIO_REDIS_MANAGER"] = "true"
+    os.environ["SOCKETIO_REDIS_CHANNEL"] = f"socketio:benchmark:{uuid.uuid4()}"
+    os.environ["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [SOURCE_DIRECTORY, os.environ.get("PYTHONPATH")])
+    )
+
+    print(f"{arguments.clients} clients, {arguments.messages} messages - in ms:")
+    print(
+        "workers | reached | received |      p50 |      p95 |      p99 | mean fan-out"
+    )
+    for workers in arguments.workers:
+        print(
+            await run(
+                workers,
+                arguments.clients,
+                arguments.messages,
+                arguments.interval,
+                arguments.port,
+            ),
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.cache import redis_session_client
+from core.cache import close_redis_clients, redis_session_client
 from core.databases import postgres_async_engine  # should be SQLite here only!
 from core.security import CurrentAccessToken, Guards, provide_http_token_payload
 from core.types import Action, CurrentUserData, IdentityType, ResourceType
@@ -17,6 +17,7 @@ from crud.access import (
     AccessPolicyCRUD,
     IdentityHierarchyCRUD,
     ResourceHierarchyCRUD,
+    access_log_partitions,
 )
 from crud.base import BaseCRUD
 from crud.identity import (
@@ -83,12 +84,20 @@ async def run_migrations():
     """Runs the migrations before each test function."""
     async with postgres_async_engine.begin() as connection:
         await connection.run_sync(SQLModel.metadata.create_all)
+    # the access logs are written into monthly partitions:
+    await access_log_partitions.maintain()
 
     yield
 
     async with postgres_async_engine.begin() as connection:
         await connection.run_sync(SQLModel.metadata.drop_all)
         await postgres_async_engine.dispose()
+    # the signed up users and authenticated Socket.IO sessions are gone with the database:
+    for pattern in ["signed_up_user:*", "socketio_auth:*"]:
+        async for location in redis_session_client.scan_iter(pattern):
+            await redis_session_client.delete(location)
+    # the pooled connections belong to the event loop of this test:
+    await close_redis_clients()
 
 
 @pytest.fixture(scope="function")
@@ -202,13 +211,13 @@ async def setup_redis_session_data():
     for azure_user_account in many_azure_user_accounts:
         session_id = uuid4()
         sessions.append({session_id: {"microsoftAccount": azure_user_account}})
-        redis_session_client.json().set(
+        await redis_session_client.json().set(
             f"session:{session_id}", ".", {"microsoftAccount": azure_user_account}
         )
     yield sessions
     # Clean up after the test
     for session in sessions:
-        redis_session_client.json().delete(f"session:{session.keys()}")
+        await redis_session_client.json().delete(f"session:{session.keys()}")
 
 
 async def register_entity_to_identity_type_link_table(
@@ -1,14 +1,153 @@
+import hashlib
+import json
+import logging
+import time
+from typing import List, Optional
+from uuid import UUID
+
 import redis
+import redis.asyncio
 
 from core.config import config
+from core.types import CurrentUserData
+
+logger = logging.getLogger(__name__)
 
 # print("=== cache.py started ===")
 
-redis_session_client = redis.Redis(
-    host=config.REDIS_HOST,
-    port=config.REDIS_PORT,
-    password=config.REDIS_PASSWORD,
-    db=config.REDIS_SESSION_DB,
-)
+redis_connection_settings = {
+    "host": config.REDIS_HOST,
+    "port": config.REDIS_PORT,
+    "password": config.REDIS_PASSWORD,
+    "db": config.REDIS_SESSION_DB,
+    "max_connections": config.REDIS_POOL_MAX_CONNECTIONS,
+    "socket_timeout": config.REDIS_SOCKET_TIMEOUT,
+    "socket_connect_timeout": config.REDIS_SOCKET_CONNECT_TIMEOUT,
+    "health_check_interval": config.REDIS_HEALTH_CHECK_INTERVAL,
+}
+
+redis_session_pool = redis.asyncio.ConnectionPool(**redis_connection_settings)
+redis_session_client = redis.asyncio.Redis(connection_pool=redis_session_pool)
+
+# MSAL's BasePersistence interface is synchronous - don't use this client anywhere else:
+redis_sync_session_pool = redis.ConnectionPool(**redis_connection_settings)
+redis_sync_session_client = redis.Redis(connection_pool=redis_sync_session_pool)
+
+
+async def close_redis_clients() -> None:
+    """Closes the connections of both pools - called on application shutdown"""
+    await redis_session_pool.disconnect()
+    redis_sync_session_pool.disconnect()
+
 
 # print("=== cache.py finished ===")
+
+
+def get_signed_up_user_location(azure_user_id: str) -> str:
+    """Returns the location of a signed up user in the cache"""
+    return f"signed_up_user:{azure_user_id}"
+
+
+def hash_groups(groups: Optional[List[str]]) -> str:
+    """Returns a hash of the groups, independent of their order"""
+    groups = sorted(str(group) for group in groups or [])
+    return hashlib.sha256(json.dumps(groups).encode()).hexdigest()
+
+
+async def get_signed_up_user_id(
+    azure_user_id: str, groups: Optional[List[str]]
+) -> Optional[UUID]:
+    """Returns the user id, if the user signed up with the same groups before - None otherwise"""
+    if config.SIGNED_UP_USER_CACHE_TTL <= 0:
+        return None
+    try:
+        signed_up_user = await redis_session_client.get(
+            get_signed_up_user_location(azure_user_id)
+        )
+        if signed_up_user is None:
+            return None
+        signed_up_user = json.loads(signed_up_user)
+        if signed_up_user["groups_hash"] != hash_groups(groups):
+            return None
+        return UUID(signed_up_user["user_id"])
+    except Exception as err:
+        logger.error(f"🔑 Failed to get signed up user from cache: {err}")
+        return None
+
+
+async def set_signed_up_user_id(
+    azure_user_id: str, groups: Optional[List[str]], user_id: UUID
+) -> None:
+    """Remembers the user id of a signed up user and its groups until the cache expires"""
+    if config.SIGNED_UP_USER_CACHE_TTL <= 0:
+        return
+    try:
+        await redis_session_client.set(
+            get_signed_up_user_location(azure_user_id),
+            json.dumps({"user_id": str(user_id), "groups_hash": hash_groups(groups)}),
+            ex=config.SIGNED_UP_USER_CACHE_TTL,
+        )
+    except Exception as err:
+        logger.error(f"🔑 Failed to set signed up user in cache: {err}")
+
+
+async def delete_signed_up_user_id(azure_user_id: str) -> None:
+    """Forgets a signed up user, so the next request signs it up again"""
+    try:
+        await redis_session_client.delete(get_signed_up_user_location(azure_user_id))
+    except Exception as err:
+        logger.error(f"🔑 Failed to delete signed up user from cache: {err}")
+
+
+def get_socketio_auth_location(session_id: str) -> str:
+    """Returns the location of an authenticated Socket.IO session in the cache"""
+    return f"socketio_auth:{session_id}"
+
+
+async def get_socketio_auth(session_id: str) -> Optional[dict]:
+    """Returns token payload and current user of a live session, that authenticated before - None otherwise"""
+    if config.SOCKETIO_AUTH_CACHE_TTL <= 0:
+        return None
+    try:
+        # a session, that logged out or expired, must not connect until its token expires:
+        async with redis_session_client.pipeline(transaction=False) as pipeline:
+            pipeline.get(get_socketio_auth_location(session_id))
+            pipeline.exists(f"session:{session_id}")
+            socketio_auth, session_exists = await pipeline.execute()
+        if socketio_auth is None:
+            return None
+        if not session_exists:
+            await redis_session_client.delete(get_socketio_auth_location(session_id))
+            return None
+        socketio_auth = json.loads(socketio_auth)
+        return {
+            "token_payload": socketio_auth["token_payload"],
+            "current_user": CurrentUserData(**socketio_auth["current_user"]),
+        }
+    except Exception as err:
+        logger.error(f"🔑 Failed to get Socket.IO session from cache: {err}")
+        return None
+
+
+async def set_socketio_auth(
+    session_id: str, token_payload: dict, current_user: CurrentUserData
+) -> None:
+    """Remembers an authenticated session until its token expires"""
+    expires_in = config.SOCKETIO_AUTH_CACHE_TTL
+    if "exp" in token_payload:
+        expires_in = min(expires_in, int(token_payload["exp"] - time.time()))
+    if expires_in <= 0:
+        return
+    try:
+        await redis_session_client.set(
+            get_socketio_auth_location(session_id),
+            json.dumps(
+                {
+                    "token_payload": token_payload,
+                    "current_user": current_user.model_dump(mode="json"),
+                }
+            ),
+            ex=expires_in,
+        )
+    except Exception as err:
+        logger.error(f"🔑 Failed to set Socket.IO session in cache: {err}")
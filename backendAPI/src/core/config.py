@@ -86,6 +86,30 @@ class Config(BaseSettings):
     APP_REG_CLIENT_ID: str = get_variable("APP_REG_CLIENT_ID")
     APP_CLIENT_SECRET: str = get_variable("APP_CLIENT_SECRET")
     AZURE_AUTHORITY: str = f"https://login.microsoftonline.com/{AZURE_TENANT_ID}"
+    # seconds between scheduled refreshes of the token signing keys:
+    JWKS_REFRESH_INTERVAL: int = int(os.getenv("JWKS_REFRESH_INTERVAL", 3600))
+    # minimum seconds between two fetches of the signing keys for unknown key ids:
+    JWKS_MIN_REFRESH_INTERVAL: int = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL", 60))
+    # verified tokens per worker, that skip the signature check until they expire:
+    VERIFIED_TOKEN_CACHE_SIZE: int = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", 1024))
+    # maximum seconds a verified token is remembered, 0 verifies on every call:
+    VERIFIED_TOKEN_CACHE_TTL: int = int(os.getenv("VERIFIED_TOKEN_CACHE_TTL", 300))
+    # MSAL token caches of user accounts per worker, reloaded from Redis only when changed:
+    MSAL_TOKEN_CACHE_SIZE: int = int(os.getenv("MSAL_TOKEN_CACHE_SIZE", 1024))
+
+    # Outgoing HTTP configuration:
+    # one client per process keeps the connections to Azure and Microsoft Graph alive:
+    HTTP_CLIENT_HTTP2: bool = os.getenv("HTTP_CLIENT_HTTP2", "true").lower() == "true"
+    HTTP_CLIENT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_TIMEOUT", 10.0))
+    HTTP_CLIENT_CONNECT_TIMEOUT: float = float(
+        os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", 5.0)
+    )
+    HTTP_CLIENT_MAX_CONNECTIONS: int = int(
+        os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", 100)
+    )
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        os.getenv("HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", 20)
+    )
 
     # Postgres configuration:
     # always get those variables from the environment:
@@ -115,6 +139,51 @@ class Config(BaseSettings):
             path=values.data["POSTGRES_DB"] or "",
         )
 
+    # Connection pool per process - one connection serves one request or Socket.IO event:
+    POSTGRES_POOL_SIZE: int = int(os.getenv("POSTGRES_POOL_SIZE", 10))
+    POSTGRES_MAX_OVERFLOW: int = int(os.getenv("POSTGRES_MAX_OVERFLOW", 20))
+    POSTGRES_POOL_PRE_PING: bool = (
+        os.getenv("POSTGRES_POOL_PRE_PING", "true").lower() == "true"
+    )
+    # seconds until a connection gets replaced, -1 keeps connections forever:
+    POSTGRES_POOL_RECYCLE: int = int(os.getenv("POSTGRES_POOL_RECYCLE", 1800))
+
+    # Pagination of the list endpoints - clients request smaller pages with limit:
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", 100))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", 1000))
+    # rows per chunk of the streamed responses - bounds the memory of a streamed listing:
+    STREAM_CHUNK_SIZE: int = int(os.getenv("STREAM_CHUNK_SIZE", 500))
+    # levels below the root, that a resource tree can be read at most:
+    RESOURCE_TREE_MAX_DEPTH: int = int(os.getenv("RESOURCE_TREE_MAX_DEPTH", 10))
+
+    # Access control configuration:
+    # maintains the table effectivepermission on every policy and hierarchy change
+    # and resolves access through it instead of the recursive hierarchy queries:
+    ACCESS_EFFECTIVE_PERMISSIONS: bool = (
+        os.getenv("ACCESS_EFFECTIVE_PERMISSIONS", "false").lower() == "true"
+    )
+    # access logs are queued and written in batches, when the batch is full or the interval passed -
+    # so reading access logs is eventually consistent within the flush interval:
+    ACCESS_LOG_BATCH_SIZE: int = int(os.getenv("ACCESS_LOG_BATCH_SIZE", 500))
+    ACCESS_LOG_FLUSH_INTERVAL: float = float(
+        os.getenv("ACCESS_LOG_FLUSH_INTERVAL", 1.0)
+    )
+    ACCESS_LOG_QUEUE_SIZE: int = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", 10000))
+    # "block" waits for space in a full queue, "drop" discards the access log:
+    ACCESS_LOG_QUEUE_FULL_POLICY: str = os.getenv(
+        "ACCESS_LOG_QUEUE_FULL_POLICY", "block"
+    )
+    # access logs are partitioned by month - partitions are created ahead for the next months:
+    ACCESS_LOG_PARTITIONS_AHEAD: int = int(os.getenv("ACCESS_LOG_PARTITIONS_AHEAD", 3))
+    # months of access logs to keep before the current one, 0 keeps all:
+    ACCESS_LOG_RETENTION_MONTHS: int = int(os.getenv("ACCESS_LOG_RETENTION_MONTHS", 0))
+    # "drop" removes expired partitions, "detach" keeps them as standalone tables for archival:
+    ACCESS_LOG_RETENTION_POLICY: str = os.getenv("ACCESS_LOG_RETENTION_POLICY", "drop")
+    # seconds between the checks for partitions to create or to remove:
+    ACCESS_LOG_PARTITION_INTERVAL: int = int(
+        os.getenv("ACCESS_LOG_PARTITION_INTERVAL", 3600)
+    )
+
     # Redis configuration:
     REDIS_HOST: str = os.getenv("REDIS_HOST")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT"))
@@ -124,10 +193,47 @@ class Config(BaseSettings):
     # print(get_variable("REDIS_SESSION_DB"))
     REDIS_SESSION_DB: int = int(get_variable("REDIS_SESSION_DB"))
     REDIS_PASSWORD: str = get_variable("REDIS_PASSWORD")
+    # Connection pool per process - shared by all requests, Socket.IO events and background tasks:
+    REDIS_POOL_MAX_CONNECTIONS: int = int(os.getenv("REDIS_POOL_MAX_CONNECTIONS", 50))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5.0))
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = float(
+        os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 5.0)
+    )
+    # seconds a connection may idle, before it gets checked on its next use:
+    REDIS_HEALTH_CHECK_INTERVAL: int = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+    # seconds a signed up user is remembered for its token groups, 0 signs up on every request:
+    SIGNED_UP_USER_CACHE_TTL: int = int(os.getenv("SIGNED_UP_USER_CACHE_TTL", 300))
 
     # Socket.io configuration:
     SOCKETIO_ADMIN_USERNAME: Optional[str] = get_variable("SOCKETIO_ADMIN_USERNAME")
     SOCKETIO_ADMIN_PASSWORD: Optional[str] = get_variable("SOCKETIO_ADMIN_PASSWORD")
+    # fans out emits through Redis pub/sub to the clients of all workers and replicas:
+    SOCKETIO_REDIS_MANAGER: bool = (
+        os.getenv("SOCKETIO_REDIS_MANAGER", "false").lower() == "true"
+    )
+    SOCKETIO_REDIS_CHANNEL: str = os.getenv("SOCKETIO_REDIS_CHANNEL", "socketio")
+    # seconds a session stays authenticated for reconnects and further namespaces - never beyond
+    # the expiry of its token, 0 authenticates every connect:
+    SOCKETIO_AUTH_CACHE_TTL: int = int(os.getenv("SOCKETIO_AUTH_CACHE_TTL", 3600))
+    # state of a namespace is sent in pages on connect, compressed above the threshold in bytes:
+    SOCKETIO_SNAPSHOT_PAGE_SIZE: int = int(
+        os.getenv("SOCKETIO_SNAPSHOT_PAGE_SIZE", 500)
+    )
+    SOCKETIO_SNAPSHOT_COMPRESSION_THRESHOLD: int = int(
+        os.getenv("SOCKETIO_SNAPSHOT_COMPRESSION_THRESHOLD", 1024)
+    )
+    # comments kept for the interactive documentation, older ones are dropped:
+    INTERACTIVE_DOCUMENTATION_MAX_COMMENTS: int = int(
+        os.getenv("INTERACTIVE_DOCUMENTATION_MAX_COMMENTS", 1000)
+    )
+
+    # Websocket configuration:
+    # messages queued per websocket client, before the slow client policy applies:
+    WEBSOCKET_SEND_QUEUE_SIZE: int = int(os.getenv("WEBSOCKET_SEND_QUEUE_SIZE", 100))
+    # "coalesce" drops the oldest queued message, "disconnect" closes the slow client:
+    WEBSOCKET_SLOW_CLIENT_POLICY: str = os.getenv(
+        "WEBSOCKET_SLOW_CLIENT_POLICY", "coalesce"
+    )
 
 
 def update_config(tries=0):
@@ -1,4 +1,15 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import base64
+import json
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterator, List, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from core.config import config
@@ -6,16 +17,193 @@ from core.config import config
 # from sqlmodel import SQLmodel  # noqa: F401
 
 postgres_async_engine = create_async_engine(
-    config.POSTGRES_URL.unicode_string()
+    config.POSTGRES_URL.unicode_string(),
+    pool_size=config.POSTGRES_POOL_SIZE,
+    max_overflow=config.POSTGRES_MAX_OVERFLOW,
+    pool_pre_ping=config.POSTGRES_POOL_PRE_PING,
+    pool_recycle=config.POSTGRES_POOL_RECYCLE,
 )  # TBD: remove echo=True
 
+async_session_factory = async_sessionmaker(
+    bind=postgres_async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+class UnitOfWork:
+    """One connection, transaction and session shared by all CRUDs within a request or event."""
+
+    def __init__(self):
+        self.connection: Optional[AsyncConnection] = None
+        self.session: Optional[AsyncSession] = None
+        self.finished = False
+        self.after_commit_callbacks: List[Callable[[], Awaitable[None]]] = []
+
+    async def get_session(self) -> AsyncSession:
+        """Returns the shared session - connects on first use only."""
+        if self.session is None:
+            connection = await postgres_async_engine.connect()
+            try:
+                await connection.begin()
+            except BaseException:
+                # returns the connection to the pool, the next call connects again:
+                await connection.close()
+                raise
+            self.connection = connection
+            # commits of the CRUDs release savepoints, the transaction is committed in finish():
+            self.session = AsyncSession(
+                bind=self.connection,
+                expire_on_commit=False,
+                join_transaction_mode="create_savepoint",
+            )
+        return self.session
+
+    def add_after_commit_callback(self, callback: Callable[[], Awaitable[None]]):
+        """Registers a coroutine function, that runs only after the transaction committed."""
+        self.after_commit_callbacks.append(callback)
+
+    async def finish(self, commit: bool = True) -> None:
+        """Commits or rolls back the transaction and returns the connection to the pool."""
+        if self.finished:
+            return
+        self.finished = True
+        if self.session is not None:
+            try:
+                # discards everything, that no CRUD committed:
+                await self.session.close()
+                if commit:
+                    await self.connection.commit()
+                else:
+                    await self.connection.rollback()
+            finally:
+                await self.connection.close()
+        if commit:
+            for callback in self.after_commit_callbacks:
+                await callback()
+
+
+unit_of_work_context: ContextVar[Optional[UnitOfWork]] = ContextVar(
+    "unit_of_work", default=None
+)
+
+
+@asynccontextmanager
+async def unit_of_work():
+    """Shares one database session and transaction between all CRUDs inside the context."""
+    unit = UnitOfWork()
+    token = unit_of_work_context.set(unit)
+    try:
+        yield unit
+    except BaseException:
+        await unit.finish(commit=False)
+        raise
+    else:
+        await unit.finish(commit=True)
+    finally:
+        unit_of_work_context.reset(token)
+
+
+class UnitOfWorkMiddleware:
+    """Runs every HTTP request in one unit of work - committed before the response starts."""
+
+    def __init__(self, app, exclude_path_prefixes: tuple = ()):
+        self.app = app
+        self.exclude_path_prefixes = exclude_path_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(
+            self.exclude_path_prefixes
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async with unit_of_work() as unit:
+
+            async def send_after_commit(message):
+                # clients must not see a response before its changes are visible:
+                if message["type"] == "http.response.start":
+                    await unit.finish(commit=message["status"] < 500)
+                await send(message)
+
+            await self.app(scope, receive, send_after_commit)
+
+
+def get_unit_of_work() -> Optional[UnitOfWork]:
+    """Returns the unit of work of the current request or event - None if there is no open one."""
+    unit = unit_of_work_context.get()
+    if unit is not None and not unit.finished:
+        return unit
+    return None
+
 
 async def get_async_session() -> AsyncSession:
-    """Returns a database session."""
-    async_session = async_sessionmaker(
-        bind=postgres_async_engine, class_=AsyncSession, expire_on_commit=False
+    """Returns a database session - the shared one inside a unit of work."""
+    unit = get_unit_of_work()
+    if unit is not None:
+        return await unit.get_session()
+    return async_session_factory()
+
+
+async def close_async_session(session: AsyncSession) -> None:
+    """Closes a database session - the shared one only gets rolled back, if its transaction failed."""
+    unit = unit_of_work_context.get()
+    if unit is not None and session is unit.session and not unit.finished:
+        await rollback_failed_session(session)
+    else:
+        await session.close()
+
+
+async def rollback_failed_session(session: AsyncSession) -> None:
+    """Rolls back a session after a database error, so it can be used again."""
+    # a healthy transaction stays untouched, as rollback expires all loaded objects:
+    if not session.is_active:
+        await session.rollback()
+
+
+# PostgreSQL takes at most 32767 parameters per statement:
+MAX_STATEMENT_PARAMETERS = 32767
+
+
+def chunk_rows(rows: List[dict]) -> Iterator[List[dict]]:
+    """Splits the rows of a multi-row statement into chunks within the parameter limit."""
+    if not rows:
+        return
+    size = max(1, MAX_STATEMENT_PARAMETERS // max(1, len(rows[0])))
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encodes the keyset values of the last row of a page into an opaque cursor."""
+    data = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ],
+        default=str,
     )
-    return async_session()
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[Any]) -> List[Any]:
+    """Decodes an opaque cursor into the values of the keyset columns - raises ValueError if it does not fit."""
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except Exception as err:
+        raise ValueError(f"Invalid cursor: {err}")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError("Invalid cursor: does not match the keyset columns.")
+    decoded = []
+    for key, value in zip(keys, values):
+        python_type = key.type.python_type
+        try:
+            if issubclass(python_type, datetime):
+                decoded.append(datetime.fromisoformat(value))
+            else:
+                decoded.append(python_type(value))
+        except (TypeError, ValueError) as err:
+            raise ValueError(f"Invalid cursor: {err}")
+    return decoded
 
 
 # Run extraordinary migrations:
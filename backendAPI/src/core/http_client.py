@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """Long-lived async HTTP client of the process for calls to the identity provider and Microsoft Graph"""
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        self.in_flight: Dict[str, asyncio.Task] = {}
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Returns the client - opens it, if the application lifespan did not"""
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                http2=config.HTTP_CLIENT_HTTP2,
+                timeout=httpx.Timeout(
+                    config.HTTP_CLIENT_TIMEOUT,
+                    connect=config.HTTP_CLIENT_CONNECT_TIMEOUT,
+                ),
+                limits=httpx.Limits(
+                    max_connections=config.HTTP_CLIENT_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            )
+        return self.client
+
+    async def start(self) -> None:
+        """Opens the client - called on application startup"""
+        self.get_client()
+
+    async def stop(self) -> None:
+        """Closes the client and its connections - called on application shutdown"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        """Sends a GET request and returns the JSON body - raises for error status codes"""
+        response = await self.get_client().get(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_once(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs fetch only once for all concurrent callers with the same key - they all get its result"""
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            logger.info(f"🌐 Joining the request in flight for {key}")
+        # a cancelled caller must not cancel the request for the others:
+        return await asyncio.shield(task)
+
+
+http_client = HttpClient()
@@ -1,22 +1,34 @@
+import asyncio
+import copy
+import hashlib
 import json
 import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 # from enum import Enum
 from uuid import UUID
 
-# import asyncio
-import httpx
 import jwt
 from fastapi import Depends, HTTPException, Request
 from jwt.algorithms import RSAAlgorithm
-from msal import ConfidentialClientApplication
-from msal_extensions.persistence import BasePersistence
-from msal_extensions.token_cache import PersistedTokenCache
-
-from core.cache import redis_session_client
+from msal import ConfidentialClientApplication, SerializableTokenCache
+from msal_extensions.persistence import BasePersistence, PersistenceNotFound
+
+from core.cache import (
+    get_signed_up_user_id,
+    redis_session_client,
+    redis_sync_session_client,
+    set_signed_up_user_id,
+)
 from core.config import config
+from core.databases import get_unit_of_work
+from core.http_client import http_client
 from core.types import CurrentUserData, GuardTypes
 from crud.identity import UserCRUD
 from models.identity import UserRead
@@ -46,6 +58,34 @@ logger = logging.getLogger(__name__)
 #         raise err
 
 
+async def fetch_azure_jwks():
+    """Fetches the JWKs from Azure and caches them"""
+    logger.info("🔑 Getting JWKs from Azure")
+    try:
+        oidc_config = await http_client.get_json(config.AZURE_OPENID_CONFIG_URL)
+    except Exception as err:
+        raise HTTPException(
+            status_code=404, detail=f"Failed to fetch Open ID config: ${err}"
+        )
+    print("=== 🔑 got JWKs from Azure ===")
+    try:
+        jwks = await http_client.get_json(oidc_config["jwks_uri"])
+    except Exception as err:
+        raise HTTPException(
+            status_code=404, detail=f"Failed to fetch JWKS online ${err}"
+        )
+    try:
+        # TBD: for real multi-tenant applications, the cache-key should be tenant specific
+        await redis_session_client.json().set("jwks:microsoft", ".", jwks)
+        logger.info("🔑 Setting JWKs in cache")
+        print("=== 🔑 JWKS set in cache ===")
+        return jwks
+    except Exception as err:
+        raise HTTPException(
+            status_code=404, detail=f"Failed to set JWKS in redis: ${err}"
+        )
+
+
 # Helper function for get_token_payload:
 async def get_azure_jwks(no_cache: bool = False):
     """Fetches the JWKs from identity provider"""
@@ -54,51 +94,177 @@ async def get_azure_jwks(no_cache: bool = False):
         if no_cache is False:
             # print("=== no_cache ===")
             # print(no_cache)
-            jwks = redis_session_client.json().get("jwks:microsoft")
+            jwks = await redis_session_client.json().get("jwks:microsoft")
             # print("=== jwks ===")
             # print(jwks)
             if jwks:
                 # print("=== 🔑 JWKS fetched from cache ===")
                 return jwks
             else:
-                await get_azure_jwks(no_cache=True)
+                return await get_azure_jwks(no_cache=True)
         else:
-            logger.info("🔑 Getting JWKs from Azure")
-            oidc_config = httpx.get(config.AZURE_OPENID_CONFIG_URL).json()
-            print("=== 🔑 got JWKs from Azure ===")
-            if oidc_config is False:
-                raise HTTPException(
-                    status_code=404, detail="Failed to fetch Open ID config."
-                )
-            try:
-                jwks = httpx.get(oidc_config["jwks_uri"]).json()
-            except Exception as err:
-                raise HTTPException(
-                    status_code=404, detail=f"Failed to fetch JWKS online ${err}"
-                )
-            try:
-                # TBD: for real multi-tenant applications, the cache-key should be tenant specific
-                redis_session_client.json().set("jwks:microsoft", ".", jwks)
-                logger.info("🔑 Setting JWKs in cache")
-                print("=== 🔑 JWKS set in cache ===")
-                return jwks
-            except Exception as err:
-                raise HTTPException(
-                    status_code=404, detail=f"Failed to set JWKS in redis: ${err}"
-                )
+            # concurrent cache misses and key rotations share one request to Azure:
+            return await http_client.fetch_once("jwks:microsoft", fetch_azure_jwks)
     except Exception as err:
         logger.error("🔑 Failed to get JWKS.")
         raise err
 
 
-async def decode_token(token: str, jwks: dict) -> dict:
+class JsonWebKeyStore:
+    """In-process store of the identity provider's public keys by key id, ready to verify signatures"""
+
+    # all workers reload the keys from the cache, when one of them fetched new keys:
+    channel = "jwks:microsoft:refreshed"
+
+    def __init__(self):
+        self.keys: Dict[str, Any] = {}
+        self.fetched_at: Optional[float] = None
+        self.lock = asyncio.Lock()
+        self.tasks: List[asyncio.Task] = []
+
+    def load(self, jwks: dict) -> None:
+        """Builds the public keys from the JWKS"""
+        self.keys = {key["kid"]: RSAAlgorithm.from_jwk(key) for key in jwks["keys"]}
+
+    async def reload(self) -> None:
+        """Loads the keys from the cache - or from the identity provider, if the cache is empty"""
+        self.load(await get_azure_jwks())
+
+    async def fetch(self, force: bool = False) -> None:
+        """Fetches the keys from the identity provider and tells the other workers"""
+        now = time.monotonic()
+        # unknown key ids must not hammer the identity provider:
+        if (
+            not force
+            and self.fetched_at is not None
+            and now - self.fetched_at < config.JWKS_MIN_REFRESH_INTERVAL
+        ):
+            return
+        self.fetched_at = now
+        self.load(await get_azure_jwks(no_cache=True))
+        try:
+            await redis_session_client.publish(self.channel, "refreshed")
+        except Exception as err:
+            logger.error(f"🔑 Failed to publish refreshed JWKS: {err}")
+
+    async def get_key(self, kid: str) -> Any:
+        """Returns the public key for a key id - refreshes the keys, if the key id is unknown"""
+        key = self.keys.get(kid)
+        if key is None:
+            async with self.lock:
+                # another request might have refreshed the keys in the meantime:
+                if kid not in self.keys:
+                    await self.reload()
+                if kid not in self.keys:
+                    await self.fetch()
+            key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown key id {kid}.")
+        return key
+
+    async def start(self) -> None:
+        """Starts refreshing on schedule and listening to the other workers - called on application startup"""
+        self.tasks = [
+            asyncio.create_task(self._refresh_on_schedule()),
+            asyncio.create_task(self._listen_to_refreshes()),
+        ]
+
+    async def stop(self) -> None:
+        """Stops the background tasks - called on application shutdown"""
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _refresh_on_schedule(self) -> None:
+        while True:
+            await asyncio.sleep(config.JWKS_REFRESH_INTERVAL)
+            try:
+                async with self.lock:
+                    await self.fetch(force=True)
+            except Exception as err:
+                logger.error(f"🔑 Failed to refresh JWKS: {err}")
+
+    async def _listen_to_refreshes(self) -> None:
+        pubsub = redis_session_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(self.channel)
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    try:
+                        async with self.lock:
+                            await self.reload()
+                    except Exception as err:
+                        logger.error(f"🔑 Failed to reload JWKS: {err}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            logger.error(f"🔑 Stopped listening to refreshed JWKS: {err}")
+        finally:
+            await pubsub.aclose()
+
+
+json_web_key_store = JsonWebKeyStore()
+
+
+class VerifiedTokenCache:
+    """In-process LRU cache of the payloads of verified tokens by the hash of the token"""
+
+    def __init__(self):
+        self.entries: OrderedDict[str, Tuple[float, dict]] = OrderedDict()
+
+    @staticmethod
+    def hash_token(token: str) -> str:
+        """Returns the key for a token - the token itself is never kept"""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Returns a copy of the payload, if the token was verified and is not expired"""
+        key = self.hash_token(token)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return copy.deepcopy(payload)
+
+    def set(self, token: str, payload: dict) -> None:
+        """Remembers the payload of a verified token - never beyond its expiry"""
+        if (
+            config.VERIFIED_TOKEN_CACHE_TTL <= 0
+            or config.VERIFIED_TOKEN_CACHE_SIZE <= 0
+        ):
+            return
+        expires_at = time.time() + config.VERIFIED_TOKEN_CACHE_TTL
+        if "exp" in payload:
+            expires_at = min(expires_at, float(payload["exp"]))
+        key = self.hash_token(token)
+        self.entries[key] = (expires_at, copy.deepcopy(payload))
+        self.entries.move_to_end(key)
+        while len(self.entries) > config.VERIFIED_TOKEN_CACHE_SIZE:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forgets all verified tokens"""
+        self.entries.clear()
+
+
+verified_token_cache = VerifiedTokenCache()
+
+
+async def decode_token(token: str) -> dict:
     """Decodes the token"""
+    # every token is verified once per worker within its lifetime:
+    payload = verified_token_cache.get(token)
+    if payload is not None:
+        return payload
     # Get the key that matches the kid:
     kid = jwt.get_unverified_header(token)["kid"]
-    rsa_key = {}
-    for key in jwks["keys"]:
-        if key["kid"] == kid:
-            rsa_key = RSAAlgorithm.from_jwk(key)
+    rsa_key = await json_web_key_store.get_key(kid)
     logger.info("Decoding token")
     # validate the token
     payload = jwt.decode(
@@ -118,6 +284,7 @@ async def decode_token(token: str, jwks: dict) -> dict:
     # print("=== decode_token - payload ===")
     # print(payload)
     logger.info("Token decoded successfully")
+    verified_token_cache.set(token, payload)
     return payload
 
 
@@ -128,17 +295,11 @@ async def get_azure_token_payload(token: str) -> Optional[dict]:
     """Validates the Azure access token sent in the request header and returns the payload if valid"""
     # print("=== get_azure_token_payload - called  ===")
     logger.info("🔑 Validating token")
-    try:
-        jwks = await get_azure_jwks()
-        payload = await decode_token(token, jwks)
-        return payload
-    except Exception:
-        logger.info("🔑 Failed to validate token, fetching new JWKS and trying again.")
-        jwks = await get_azure_jwks(no_cache=True)
-        payload = await decode_token(token, jwks)
-        # print("=== get_azure_token_payload - payload ===")
-        # print(payload)
-        return payload
+    # unknown key ids refresh the keys in the store:
+    payload = await decode_token(token)
+    # print("=== get_azure_token_payload - payload ===")
+    # print(payload)
+    return payload
 
 
 # From get_http_access_token_payload, optional_get_http_access_token_payload to provide_http_token_payload:
@@ -196,15 +357,21 @@ class RedisPersistence(BasePersistence):
     def save(self, content):
         """Saves the token to the cache"""
         # raise Exception("Backend does not support saving tokens")
-        result = redis_session_client.json().set(
-            self.get_location(), ".", json.loads(content)
-        )
+        # the version tells the other workers and the frontend to reload:
+        with redis_sync_session_client.pipeline(transaction=True) as pipeline:
+            pipeline.json().set(self.get_location(), ".", json.loads(content))
+            pipeline.incr(self.get_version_location())
+            pipeline.expire(self.get_location(), 60 * 60 * 24 * 7)
+            pipeline.expire(self.get_version_location(), 60 * 60 * 24 * 7)
+            result, version, *_ = pipeline.execute()
         # print("===➡️ 🔑 token saved to cache in backend based on session_id ===")
-        return json.dumps(result)
+        return version
 
     def load(self):
         """Loads the token from the cache"""
-        result = redis_session_client.json().get(self.get_location())
+        result = redis_sync_session_client.json().get(self.get_location())
+        if result is None:
+            raise PersistenceNotFound(location=self.get_location())
         # print("===⬅️ 🔑 token loaded from cache in backend based on session_id ===")
         return json.dumps(result)
 
@@ -213,10 +380,21 @@ class RedisPersistence(BasePersistence):
         location = f"msal:{self.user_account['homeAccountId']}"
         return location
 
+    def get_version_location(self):
+        """Returns the location of the version, that every writer increments"""
+        return f"{self.get_location()}:version"
+
+    def get_version(self) -> Optional[int]:
+        """Returns the version of the cache - None, if a writer did not set it"""
+        version = redis_sync_session_client.get(self.get_version_location())
+        return int(version) if version is not None else None
+
     def time_last_modified(self):
         """Returns the time the cache was last modified"""
         try:
-            idle_time = redis_session_client.object("idletime", self.get_location())
+            idle_time = redis_sync_session_client.object(
+                "idletime", self.get_location()
+            )
             if idle_time:
                 last_accessed_time = datetime.now() - timedelta(seconds=idle_time)
                 return last_accessed_time.timestamp()
@@ -227,18 +405,114 @@ class RedisPersistence(BasePersistence):
             raise Exception("no modification time available")
 
 
-def get_persistent_cache(user_account):
-    """Returns the persistent cache for the user account"""
-    persistence = RedisPersistence(user_account)
-    persistedTokenCache = PersistedTokenCache(persistence)
-    return persistedTokenCache
+class RedisTokenCache(SerializableTokenCache):
+    """MSAL token cache of one user account in memory - reloaded only when the version in Redis changed"""
+
+    def __init__(self, persistence: RedisPersistence):
+        super().__init__()
+        self.persistence = persistence
+        self.version: Optional[int] = None
+        self.reload_lock = threading.Lock()
+
+    def reload_if_changed(self) -> None:
+        """Loads the cache from Redis, if another writer changed it since the last load"""
+        with self.reload_lock:
+            version = self.persistence.get_version()
+            # without a version the change is unknown:
+            if version is not None and version == self.version:
+                return
+            try:
+                self.deserialize(self.persistence.load())
+            except PersistenceNotFound:
+                self.deserialize(None)
+            self.version = version
+
+    def search(self, credential_type, **kwargs):
+        self.reload_if_changed()
+        return super().search(credential_type, **kwargs)
+
+    def modify(self, credential_type, old_entry, new_key_value_pairs=None):
+        self.reload_if_changed()
+        super().modify(
+            credential_type, old_entry, new_key_value_pairs=new_key_value_pairs
+        )
+        with self.reload_lock:
+            self.version = self.persistence.save(self.serialize())
+
+
+class SwappableTokenCache:
+    """Token cache of a pooled MSAL application - forwards to the token cache swapped in"""
+
+    def __init__(self):
+        self.user_cache: Optional[RedisTokenCache] = None
+
+    def __getattr__(self, name):
+        return getattr(self.user_cache, name)
+
+    # MSAL binds these two when it builds the application:
+    def remove_rt(self, *args, **kwargs):
+        return self.user_cache.remove_rt(*args, **kwargs)
+
+    def update_rt(self, *args, **kwargs):
+        return self.user_cache.update_rt(*args, **kwargs)
+
+
+class ConfidentialClientPool:
+    """Reuses the MSAL applications and the token caches of the user accounts across token acquisitions"""
+
+    def __init__(self):
+        # the authority metadata is discovered once per application:
+        self.applications: queue.SimpleQueue = queue.SimpleQueue()
+        self.token_caches: OrderedDict[str, RedisTokenCache] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_token_cache(self, user_account) -> RedisTokenCache:
+        """Returns the token cache of the user account - kept for the least recently used ones"""
+        key = user_account["homeAccountId"]
+        with self.lock:
+            token_cache = self.token_caches.get(key)
+            if token_cache is None:
+                token_cache = RedisTokenCache(RedisPersistence(user_account))
+                self.token_caches[key] = token_cache
+            self.token_caches.move_to_end(key)
+            while len(self.token_caches) > config.MSAL_TOKEN_CACHE_SIZE:
+                self.token_caches.popitem(last=False)
+        return token_cache
+
+    @contextmanager
+    def application(self, user_account) -> Iterator[ConfidentialClientApplication]:
+        """Checks out an application with the token cache of the user account swapped in"""
+        try:
+            application = self.applications.get_nowait()
+        except queue.Empty:
+            application = ConfidentialClientApplication(
+                client_id=config.APP_REG_CLIENT_ID,
+                client_credential=config.APP_CLIENT_SECRET,
+                authority=config.AZURE_AUTHORITY,
+                token_cache=SwappableTokenCache(),
+            )
+        application.token_cache.user_cache = self.get_token_cache(user_account)
+        try:
+            yield application
+        finally:
+            application.token_cache.user_cache = None
+            self.applications.put(application)
+
+    def clear(self) -> None:
+        """Forgets the applications and the token caches"""
+        with self.lock:
+            self.applications = queue.SimpleQueue()
+            self.token_caches.clear()
+
+
+confidential_client_pool = ConfidentialClientPool()
 
 
 # TBD: write tests for this
 async def get_user_account_from_session_cache(session_id: str) -> dict:
     """Gets the user account from the cache"""
     logger.info("🔑 Getting user account from cache")
-    user_account = redis_session_client.json().get(
+    user_account = await redis_session_client.json().get(
         f"session:{session_id}", "$.microsoftAccount"
     )
     if not user_account:
@@ -246,28 +520,26 @@ async def get_user_account_from_session_cache(session_id: str) -> dict:
     return user_account[0]
 
 
+def acquire_azure_token_silently(user_account, scopes: List[str] = []) -> str:
+    """Acquires the azure token through MSAL - blocks on the synchronous token cache and refreshes"""
+    with confidential_client_pool.application(user_account) as msal_conf_client:
+        accounts = msal_conf_client.get_accounts(user_account["username"])
+        for account in accounts:
+            # TBD: change into scopes:
+            # result = msal_conf_client.acquire_token_silent(["User.Read"], account=account)
+            result = msal_conf_client.acquire_token_silent(scopes, account=account)
+            if result and "access_token" in result:
+                # print("===🔑 azure access_token from cache - access-token ===")
+                # print(result["access_token"])
+                return result["access_token"]
+    return None
+
+
 # TBD: write tests for this
 async def get_azure_token_from_cache(user_account, scopes: List[str] = []) -> str:
     """Gets the azure token from the cache"""
-    # Create the PersistentTokenCache
-    cache = get_persistent_cache(user_account)
-    msal_conf_client = ConfidentialClientApplication(
-        client_id=config.APP_REG_CLIENT_ID,
-        client_credential=config.APP_CLIENT_SECRET,
-        authority=config.AZURE_AUTHORITY,
-        token_cache=cache,
-    )
-
-    accounts = msal_conf_client.get_accounts(user_account["username"])
-    for account in accounts:
-        # TBD: change into scopes:
-        # result = msal_conf_client.acquire_token_silent(["User.Read"], account=account)
-        result = msal_conf_client.acquire_token_silent(scopes, account=account)
-        if "access_token" in result:
-            # print("===🔑 azure access_token from cache - access-token ===")
-            # print(result["access_token"])
-            return result["access_token"]
-    return None
+    # MSAL is synchronous - keeps the event loop free while it talks to Redis and Azure:
+    return await asyncio.to_thread(acquire_azure_token_silently, user_account, scopes)
 
 
 async def get_token_from_cache(session_id: str, scopes: List[str] = []) -> str:
@@ -450,6 +722,20 @@ class CurrentAccessToken:
             logger.error(f"🔑 User not found in database: ${err}")
             raise HTTPException(status_code=401, detail="Invalid token.")
 
+    async def remembers_signed_up_user(
+        self, azure_user_id: str, groups: Optional[List[str]], user_id: UUID
+    ) -> None:
+        """Caches the signed up user - inside a unit of work only after the sign-up committed"""
+
+        async def remember():
+            await set_signed_up_user_id(azure_user_id, groups, user_id)
+
+        unit = get_unit_of_work()
+        if unit is None:
+            await remember()
+        else:
+            unit.add_after_commit_callback(remember)
+
     # TBD: call get_or_sign_up_current_user from all checks that require a user
     # TBD: merge with gets_or_signs_up_current_user?
     async def provides_current_user(self) -> CurrentUserData:
@@ -460,10 +746,21 @@ class CurrentAccessToken:
             roles = self.payload["roles"]
         if "groups" in self.payload:
             groups = self.payload["groups"]
-        user_in_database = await self.gets_or_signs_up_current_user()
+        # sign-up and group synchronization only run, when the token groups changed or the cache expired:
+        azure_user_id = self.payload.get("oid")
+        user_id = (
+            await get_signed_up_user_id(azure_user_id, groups)
+            if azure_user_id
+            else None
+        )
+        if user_id is None:
+            user_in_database = await self.gets_or_signs_up_current_user()
+            user_id = user_in_database.id
+            if azure_user_id:
+                await self.remembers_signed_up_user(azure_user_id, groups, user_id)
         # TBD: use CurrentUserData class instead of dict for type safety!
         current_user = CurrentUserData(
-            user_id=user_in_database.id,
+            user_id=user_id,
             azure_token_roles=roles,
             azure_token_groups=groups,
         )
@@ -576,10 +873,8 @@ class CurrentAzureUserInDatabase(CurrentAccessToken):
         return await self.gets_or_signs_up_current_user()
 
 
-async def check_token_against_guards(
-    token_payload: dict, guards: GuardTypes
-) -> CurrentUserData:
-    """checks if token fulfills the required guards and returns current user."""
+async def check_guards(token_payload: dict, guards: GuardTypes) -> None:
+    """checks if token fulfills the required guards - raises otherwise."""
     token = CurrentAccessToken(token_payload)
     if guards is not None:
         if guards.scopes is not None:
@@ -591,7 +886,14 @@ async def check_token_against_guards(
         if guards.groups is not None:
             for group in guards.groups:
                 await token.has_group(group)
-    return await token.provides_current_user()
+
+
+async def check_token_against_guards(
+    token_payload: dict, guards: GuardTypes
+) -> CurrentUserData:
+    """checks if token fulfills the required guards and returns current user."""
+    await check_guards(token_payload, guards)
+    return await CurrentAccessToken(token_payload).provides_current_user()
 
 
 # endregion: Specific checks
@@ -0,0 +1,92 @@
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlmodel import select
+
+from core.databases import UnitOfWork, get_async_session, unit_of_work
+from crud.access import AccessLoggingCRUD, AccessPolicyCRUD
+from models.access import AccessLog, AccessLogCreate
+
+# region: Testing the unit of work:
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_shares_one_session_between_cruds(register_many_resources):
+    """Test all CRUDs inside a unit of work use the same session."""
+    async with unit_of_work() as unit:
+        async with AccessLoggingCRUD() as logging_crud:
+            async with AccessPolicyCRUD() as policy_crud:
+                assert logging_crud.session is policy_crud.session
+                assert logging_crud.session is unit.session
+
+    session = await get_async_session()
+    assert session is not unit.session
+    await session.close()
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_commits_when_finished(
+    register_many_resources, get_async_test_session
+):
+    """Test the changes of a unit of work become visible, when it finishes."""
+    resource_id = uuid.UUID(register_many_resources[0])
+    access_log = AccessLogCreate(
+        resource_id=resource_id, action="read", status_code=200
+    )
+    statement = select(AccessLog).where(AccessLog.resource_id == resource_id)
+
+    async with unit_of_work():
+        async with AccessLoggingCRUD() as logging_crud:
+            await logging_crud.create(access_log)
+
+        response = await get_async_test_session.exec(statement)
+        assert response.all() == []
+
+    response = await get_async_test_session.exec(statement)
+    assert len(response.all()) == 1
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_rolls_back_on_exception(register_many_resources):
+    """Test the changes of a unit of work are discarded, when it fails."""
+    resource_id = uuid.UUID(register_many_resources[0])
+    access_log = AccessLogCreate(
+        resource_id=resource_id, action="read", status_code=200
+    )
+
+    try:
+        async with unit_of_work():
+            async with AccessLoggingCRUD() as logging_crud:
+                await logging_crud.create(access_log)
+            raise RuntimeError("Failure after commit of the CRUD.")
+    except RuntimeError:
+        pass
+
+    async with AccessLoggingCRUD() as logging_crud:
+        response = await logging_crud.session.exec(
+            select(AccessLog).where(AccessLog.resource_id == resource_id)
+        )
+        assert response.all() == []
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_closes_connection_when_begin_fails():
+    """Test the connection goes back to the pool, if the transaction does not start."""
+    connection = AsyncMock()
+    connection.begin.side_effect = ConnectionError("Transaction failed to start.")
+    unit = UnitOfWork()
+
+    engine = MagicMock()
+    engine.connect = AsyncMock(return_value=connection)
+
+    with patch("core.databases.postgres_async_engine", engine):
+        with pytest.raises(ConnectionError):
+            await unit.get_session()
+
+    connection.close.assert_awaited_once()
+    assert unit.connection is None
+    assert unit.session is None
+
+
+# endregion: Testing the unit of work
@@ -0,0 +1,71 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from core.config import config
+from core.http_client import HttpClient
+
+# region: Testing the shared HTTP client:
+
+
+@pytest.mark.anyio
+async def test_fetch_once_shares_one_request_between_concurrent_callers():
+    """Tests concurrent callers with the same key wait for the same request."""
+    http_client = HttpClient()
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        await asyncio.sleep(0.01)
+        return {"keys": []}
+
+    results = await asyncio.gather(
+        *[http_client.fetch_once("jwks", fetch) for _ in range(5)]
+    )
+
+    assert calls == ["fetch"]
+    assert results == [{"keys": []}] * 5
+    assert http_client.in_flight == {}
+
+    # the next caller after the request finished fetches again:
+    await http_client.fetch_once("jwks", fetch)
+    assert calls == ["fetch", "fetch"]
+
+
+@pytest.mark.anyio
+async def test_fetch_once_raises_for_all_callers():
+    """Tests a failed request reaches all waiting callers and is not remembered."""
+    http_client = HttpClient()
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        await asyncio.sleep(0.01)
+        raise ConnectionError("Identity provider not reachable.")
+
+    results = await asyncio.gather(
+        *[http_client.fetch_once("jwks", fetch) for _ in range(3)],
+        return_exceptions=True,
+    )
+
+    assert calls == ["fetch"]
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert http_client.in_flight == {}
+
+
+@pytest.mark.anyio
+async def test_client_is_reused_until_stopped():
+    """Tests the client keeps its connections until the application stops."""
+    http_client = HttpClient()
+    with patch.object(config, "HTTP_CLIENT_HTTP2", False):
+        await http_client.start()
+        client = http_client.get_client()
+        assert http_client.get_client() is client
+
+        await http_client.stop()
+        assert client.is_closed
+        assert http_client.client is None
+
+
+# endregion: Testing the shared HTTP client
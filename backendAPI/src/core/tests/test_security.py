@@ -1,21 +1,39 @@
+import asyncio
+import json
 import uuid
 from datetime import datetime, timedelta
 from typing import Annotated, List
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import jwt
 import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
 from fastapi import Depends, FastAPI
 from httpx import AsyncClient
 
+from core.cache import get_signed_up_user_id, redis_session_client
+from core.config import config
+from core.databases import unit_of_work
+from core.http_client import http_client
 from core.security import (
+    ConfidentialClientPool,
+    CurrentAccessToken,
     CurrentAccessTokenHasRole,
     CurrentAccessTokenHasScope,
     CurrentAccessTokenIsValid,
     CurrentAzureUserInDatabase,
+    JsonWebKeyStore,
+    RedisPersistence,
+    RedisTokenCache,
+    VerifiedTokenCache,
+    acquire_azure_token_silently,
+    decode_token,
     get_azure_jwks,
     get_user_account_from_session_cache,
 )
 from core.types import Action, CurrentUserData
 from crud.access import AccessLoggingCRUD
+from crud.identity import UserCRUD
 from models.access import AccessLogRead
 from models.identity import User, UserRead
 from routers.api.v1.identities import get_user_by_id
@@ -74,6 +92,154 @@ async def test_get_azure_jwks():
         assert "issuer" in key
 
 
+@pytest.mark.anyio
+async def test_get_azure_jwks_fetches_once_for_concurrent_cache_misses():
+    """Tests concurrent requests without cached keys share one fetch from Azure."""
+    jwks = {"keys": [{"kid": "key1"}]}
+
+    async def mocked_get_json(url: str):
+        await asyncio.sleep(0.01)
+        if url == config.AZURE_OPENID_CONFIG_URL:
+            return {"jwks_uri": "https://login.microsoftonline.com/keys"}
+        return jwks
+
+    with patch.object(
+        http_client, "get_json", new=AsyncMock(side_effect=mocked_get_json)
+    ) as mocked:
+        results = await asyncio.gather(
+            *[get_azure_jwks(no_cache=True) for _ in range(5)]
+        )
+
+    assert results == [jwks] * 5
+    assert mocked.call_count == 2
+    assert await get_azure_jwks() == jwks
+    await redis_session_client.json().delete("jwks:microsoft")
+
+
+def generate_signing_key(kid: str):
+    """Returns a private key for signing test tokens and its public JWK."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_jwk = jwt.algorithms.RSAAlgorithm.to_jwk(
+        private_key.public_key(), as_dict=True
+    )
+    return private_key, {**public_jwk, "kid": kid}
+
+
+def sign_test_token(private_key, kid: str) -> str:
+    """Returns a token signed like the identity provider does."""
+    now = datetime.now()
+    return jwt.encode(
+        {
+            "aud": config.API_SCOPE,
+            "iss": config.AZURE_ISSUER_URL,
+            "iat": now,
+            "nbf": now,
+            "exp": now + timedelta(minutes=5),
+            **token_payload_user_id,
+        },
+        private_key,
+        algorithm="RS256",
+        headers={"kid": kid},
+    )
+
+
+@pytest.mark.anyio
+async def test_decode_token_builds_keys_once():
+    """Tests the public keys are built once and reused for every token."""
+    private_key, public_jwk = generate_signing_key("key1")
+    token = sign_test_token(private_key, "key1")
+
+    with (
+        patch("core.security.json_web_key_store", JsonWebKeyStore()),
+        patch(
+            "core.security.get_azure_jwks",
+            new=AsyncMock(return_value={"keys": [public_jwk]}),
+        ) as mocked_get_azure_jwks,
+    ):
+        first_payload = await decode_token(token)
+        second_payload = await decode_token(token)
+
+    assert mocked_get_azure_jwks.call_count == 1
+    assert first_payload["oid"] == token_payload_user_id["oid"]
+    assert second_payload == first_payload
+
+
+@pytest.mark.anyio
+async def test_decode_token_fetches_unknown_key_id_from_identity_provider():
+    """Tests an unknown key id fetches new keys - but not more often than allowed."""
+    _, old_public_jwk = generate_signing_key("old_key")
+    new_private_key, new_public_jwk = generate_signing_key("new_key")
+    unknown_private_key, _ = generate_signing_key("unknown_key")
+
+    async def mocked_get_azure_jwks(no_cache: bool = False):
+        if no_cache:
+            return {"keys": [old_public_jwk, new_public_jwk]}
+        return {"keys": [old_public_jwk]}
+
+    with (
+        patch("core.security.json_web_key_store", JsonWebKeyStore()),
+        patch(
+            "core.security.get_azure_jwks",
+            new=AsyncMock(side_effect=mocked_get_azure_jwks),
+        ) as mocked,
+    ):
+        payload = await decode_token(sign_test_token(new_private_key, "new_key"))
+        assert payload["oid"] == token_payload_user_id["oid"]
+        assert [call.kwargs for call in mocked.call_args_list] == [
+            {},
+            {"no_cache": True},
+        ]
+
+        with pytest.raises(jwt.InvalidTokenError):
+            await decode_token(sign_test_token(unknown_private_key, "unknown_key"))
+        # the identity provider was asked only just now:
+        assert [call.kwargs for call in mocked.call_args_list][2:] == [{}]
+
+
+@pytest.mark.anyio
+async def test_decode_token_verifies_each_token_once():
+    """Tests a token is verified once and its payload is reused afterwards."""
+    private_key, public_jwk = generate_signing_key("key1")
+    token = sign_test_token(private_key, "key1")
+
+    with (
+        patch("core.security.json_web_key_store", JsonWebKeyStore()),
+        patch("core.security.verified_token_cache", VerifiedTokenCache()),
+        patch(
+            "core.security.get_azure_jwks",
+            new=AsyncMock(return_value={"keys": [public_jwk]}),
+        ),
+        patch("core.security.jwt.decode", wraps=jwt.decode) as spied_decode,
+    ):
+        first_payload = await decode_token(token)
+        first_payload["groups"] = ["changed by the caller"]
+        second_payload = await decode_token(token)
+
+    assert spied_decode.call_count == 1
+    assert second_payload["oid"] == token_payload_user_id["oid"]
+    assert "groups" not in second_payload
+
+
+def test_verified_token_cache_expires_with_token_and_evicts_least_recent():
+    """Tests the cache forgets expired tokens and the least recently used ones."""
+    cache = VerifiedTokenCache()
+    now = datetime.now().timestamp()
+
+    cache.set("expired", {"exp": now - 1})
+    assert cache.get("expired") is None
+
+    with patch.object(config, "VERIFIED_TOKEN_CACHE_SIZE", 2):
+        cache.set("first", {"exp": now + 60})
+        cache.set("second", {"exp": now + 60})
+        assert cache.get("first") == {"exp": now + 60}
+        cache.set("third", {"exp": now + 60})
+
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+    assert "first" not in cache.entries
+
+
 # endregion
 
 # region: Testing user self signup
@@ -462,6 +628,102 @@ async def test_existing_user_logs_in(
     assert last_accessed_at.action == Action.read
 
 
+@pytest.mark.anyio
+async def test_signed_up_user_is_cached_until_token_groups_change():
+    """Test the sign-up only runs again, when the groups in the token change."""
+    token_payload = {
+        **token_payload_user_id,
+        **token_payload_tenant_id,
+        **token_payload_roles_user,
+        **token_payload_one_group,
+    }
+
+    with patch.object(
+        UserCRUD,
+        "create_azure_user_and_groups_if_not_exist",
+        side_effect=UserCRUD.create_azure_user_and_groups_if_not_exist,
+        autospec=True,
+    ) as sign_up:
+        first_user = await CurrentAccessToken(token_payload).provides_current_user()
+        cached_user = await CurrentAccessToken(token_payload).provides_current_user()
+        assert sign_up.call_count == 1
+        assert cached_user == first_user
+
+        token_payload = {**token_payload, **token_payload_many_groups}
+        regrouped_user = await CurrentAccessToken(token_payload).provides_current_user()
+        assert sign_up.call_count == 2
+        assert regrouped_user.user_id == first_user.user_id
+        assert regrouped_user.azure_token_groups == [
+            uuid.UUID(group) for group in token_payload_many_groups["groups"]
+        ]
+
+        with patch.object(config, "SIGNED_UP_USER_CACHE_TTL", 0):
+            await CurrentAccessToken(token_payload).provides_current_user()
+        assert sign_up.call_count == 3
+
+
+@pytest.mark.anyio
+async def test_user_without_azure_user_id_is_not_cached():
+    """Test a token without an object id neither reads nor writes the signed up user cache."""
+    token_payload = {**token_payload_tenant_id, **token_payload_roles_user}
+    user_id = uuid.uuid4()
+
+    with (
+        patch.object(
+            CurrentAccessToken,
+            "gets_or_signs_up_current_user",
+            new=AsyncMock(return_value=MagicMock(id=user_id)),
+        ),
+        patch("core.security.get_signed_up_user_id", new=AsyncMock()) as get_cached,
+        patch("core.security.set_signed_up_user_id", new=AsyncMock()) as set_cached,
+    ):
+        current_user = await CurrentAccessToken(token_payload).provides_current_user()
+
+    assert current_user.user_id == user_id
+    get_cached.assert_not_called()
+    set_cached.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_deleted_user_signs_up_again(register_current_user):
+    """Test deleting a user removes it from the cache of signed up users."""
+    current_admin_user = await register_current_user(current_user_data_admin)
+    token_payload = {
+        **token_payload_user_id,
+        **token_payload_tenant_id,
+        **token_payload_roles_user,
+    }
+
+    first_user = await CurrentAccessToken(token_payload).provides_current_user()
+    async with UserCRUD() as crud:
+        await crud.delete(current_admin_user, first_user.user_id)
+    new_user = await CurrentAccessToken(token_payload).provides_current_user()
+
+    assert new_user.user_id != first_user.user_id
+
+
+@pytest.mark.anyio
+async def test_deleted_user_is_forgotten_after_the_deletion_committed(
+    register_current_user,
+):
+    """Test the signed up user stays cached until the unit of work of the deletion commits."""
+    current_admin_user = await register_current_user(current_user_data_admin)
+    token_payload = {
+        **token_payload_user_id,
+        **token_payload_tenant_id,
+        **token_payload_roles_user,
+    }
+    azure_user_id = token_payload["oid"]
+
+    user = await CurrentAccessToken(token_payload).provides_current_user()
+    async with unit_of_work():
+        async with UserCRUD() as crud:
+            await crud.delete(current_admin_user, user.user_id)
+        assert await get_signed_up_user_id(azure_user_id, None) == user.user_id
+
+    assert await get_signed_up_user_id(azure_user_id, None) is None
+
+
 # endregion
 
 
@@ -508,6 +770,107 @@ async def test_get_user_account_from_session_cache_nonexistent():
     #     assert 0
 
 
+@pytest.mark.anyio
+async def test_msal_token_cache_persists_through_the_shared_redis():
+    """Tests the synchronous MSAL persistence and the async client share the cache."""
+    user_account = {"homeAccountId": f"{uuid.uuid4()}.tenant"}
+    persistence = RedisPersistence(user_account)
+    content = {"AccessToken": {"key": {"secret": "token"}}}
+
+    persistence.save(json.dumps(content))
+
+    assert json.loads(persistence.load()) == content
+    assert await redis_session_client.json().get(persistence.get_location()) == content
+    await redis_session_client.json().delete(persistence.get_location())
+
+
+@pytest.mark.anyio
+async def test_msal_token_cache_reloads_only_when_the_version_changed():
+    """Tests the token cache stays in memory until another writer changes it in Redis."""
+    user_account = {"homeAccountId": f"{uuid.uuid4()}.tenant"}
+    now = int(datetime.now().timestamp())
+    access_token = {
+        "credential_type": "AccessToken",
+        "secret": "token",
+        "home_account_id": user_account["homeAccountId"],
+        "environment": "login.microsoftonline.com",
+        "client_id": "client",
+        "realm": "tenant",
+        "target": "api.read",
+        "cached_at": str(now),
+        "expires_on": str(now + 3600),
+        "extended_expires_on": str(now + 3600),
+    }
+    access_token_key = "-".join(
+        [
+            access_token["home_account_id"],
+            access_token["environment"],
+            "accesstoken",
+            access_token["client_id"],
+            access_token["realm"],
+            access_token["target"],
+        ]
+    ).lower()
+    writer = RedisPersistence(user_account)
+    writer.save(json.dumps({"AccessToken": {}}))
+    token_cache = RedisTokenCache(RedisPersistence(user_account))
+
+    with patch.object(
+        token_cache.persistence, "load", wraps=token_cache.persistence.load
+    ) as load:
+        for _ in range(3):
+            list(token_cache.search(RedisTokenCache.CredentialType.ACCESS_TOKEN))
+        assert load.call_count == 1
+
+        writer.save(json.dumps({"AccessToken": {access_token_key: access_token}}))
+        access_tokens = list(
+            token_cache.search(RedisTokenCache.CredentialType.ACCESS_TOKEN)
+        )
+        assert load.call_count == 2
+
+    assert [entry["secret"] for entry in access_tokens] == ["token"]
+    await redis_session_client.delete(
+        writer.get_location(), writer.get_version_location()
+    )
+
+
+def test_confidential_client_pool_reuses_applications_and_token_caches():
+    """Tests silent token acquisitions share the MSAL application of the process."""
+    pool = ConfidentialClientPool()
+    user_accounts = [
+        {"homeAccountId": f"{uuid.uuid4()}.tenant", "username": "user@example.com"}
+        for _ in range(2)
+    ]
+    user_caches = []
+
+    def create_application(**kwargs):
+        application = MagicMock(token_cache=kwargs["token_cache"])
+        application.get_accounts.return_value = [{"username": "user@example.com"}]
+
+        def acquire_token_silent(scopes, account):
+            user_caches.append(application.token_cache.user_cache)
+            return {"access_token": "token"}
+
+        application.acquire_token_silent.side_effect = acquire_token_silent
+        return application
+
+    with (
+        patch(
+            "core.security.ConfidentialClientApplication",
+            side_effect=create_application,
+        ) as application_class,
+        patch("core.security.confidential_client_pool", pool),
+    ):
+        for user_account in user_accounts + user_accounts:
+            assert acquire_azure_token_silently(user_account, ["User.Read"]) == "token"
+
+    assert application_class.call_count == 1
+    assert user_caches[0] is user_caches[2]
+    assert user_caches[1] is user_caches[3]
+    assert user_caches[0] is not user_caches[1]
+    assert user_caches[0].persistence.user_account == user_accounts[0]
+
+
 # endregion: Testing Session and Cache interaction
 
 
@@ -1,5 +1,6 @@
 from enum import Enum
-from typing import List, Optional
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Type
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -18,6 +19,46 @@ def get_all_models(SQLModel=SQLModel):
     return all_models
 
 
+class ModelRegistry:
+    """Maps the class names to the models - built once instead of walking all SQLModel subclasses on every lookup"""
+
+    def __init__(self):
+        self.models: Dict[str, Type[SQLModel]] = {}
+        # names without a model - looked up again only after the next build:
+        self.missing: Set[str] = set()
+
+    def build(self) -> None:
+        """Registers all models, that are imported - called on application startup."""
+        models = {}
+        for model in get_all_models():
+            # the first model with a name wins, same as the walk through the subclasses:
+            models.setdefault(model.__name__, model)
+        self.models = models
+        self.missing = set()
+
+    def get(self, name: str) -> Optional[Type[SQLModel]]:
+        """Returns the model for a class name - rebuilds once for models imported after the last build."""
+        model = self.models.get(name)
+        if model is None and name not in self.missing:
+            self.build()
+            model = self.models.get(name)
+            if model is None:
+                self.missing.add(name)
+        return model
+
+
+model_registry = ModelRegistry()
+
+
+class SnapshotPage(BaseModel):
+    """One page of the state of a socket.io namespace - sent to clients on connect"""
+
+    data: Any
+    # opaque position after the last item of the page - clients resume from here after a reconnect:
+    cursor: Optional[str] = None
+    more: bool = False
+
+
 class GuardTypes(BaseModel):
     """Protectors for the routes"""
 
@@ -57,6 +98,14 @@ class Action(str, Enum):
     own = "own"
 
 
+class TimeBucket(str, Enum):
+    """Enum for the time buckets, the access logs are counted in"""
+
+    hour = "hour"
+    day = "day"
+    month = "month"
+
+
 class BaseType(str, Enum):
     """Base enum for types of entities in the database"""
 
@@ -66,10 +115,15 @@ class BaseType(str, Enum):
     def list(cls):
         return list(map(lambda x: x.value, cls._member_map_.values()))
 
+    @classmethod
+    @lru_cache(maxsize=None)
+    def values(cls) -> FrozenSet[str]:
+        """Returns the values of the enum as a set - computed once per enum."""
+        return frozenset(cls.list())
+
     @classmethod
     def get_model(cls, entity_type: str):
-        all_models = get_all_models()
-        model = next(filter(lambda m: m.__name__ == entity_type, all_models), None)
+        model = model_registry.get(entity_type)
         if model is None:
             raise ValueError(f"Table {entity_type} not found.")
         else:
@@ -1,25 +1,53 @@
+import asyncio
 import logging
-from typing import Generic, List, Optional, Type, TypeVar
+import re
+from datetime import date, datetime
+from typing import AsyncIterator, Generic, List, Optional, Type, TypeVar
 from uuid import UUID
 
 from fastapi import HTTPException
-from sqlalchemy.orm import aliased
+from sqlalchemy import (
+    Boolean,
+    Integer,
+    Uuid,
+    cast,
+    column,
+    literal,
+    literal_column,
+    null,
+    text,
+    union,
+    union_all,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased, raiseload
 
 # from sqlalchemy import union_all
-from sqlmodel import SQLModel, and_, delete, or_, select, func
+from sqlmodel import SQLModel, and_, delete, func, or_, select, update
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.databases import get_async_session
+from core.config import config
+from core.databases import (
+    async_session_factory,
+    chunk_rows,
+    close_async_session,
+    get_async_session,
+    get_unit_of_work,
+)
 from core.types import (  # BaseHierarchy,; IdentityHierarchy,; ResourceHierarchy,
     Action,
     CurrentUserData,
     IdentityType,
     ResourceType,
+    TimeBucket,
 )
 from models.access import (
     AccessLog,
+    AccessLogAggregate,
     AccessLogCreate,
     AccessLogRead,
+    AccessLogRollup,
     AccessPermission,
     AccessPolicy,
     AccessPolicyCreate,
@@ -28,6 +56,7 @@ from models.access import (
     AccessPolicyUpdate,
     AccessRequest,
     BaseHierarchy,
+    EffectivePermission,
     IdentifierTypeLink,
     IdentityHierarchy,
     IdentityHierarchyCreate,
@@ -35,6 +64,7 @@ from models.access import (
     ResourceHierarchy,
     ResourceHierarchyCreate,
     ResourceHierarchyRead,
+    ResourceHierarchyTree,
 )
 
 # from core.access import AccessControl
@@ -46,6 +76,11 @@ read = Action.read
 write = Action.write
 own = Action.own
 
+# children get their order keys with gaps in between, so a move or an append writes one row:
+ORDER_GAP = 1024
+# the order keys are 32-bit integers:
+MAX_ORDER = 2**31 - 1
+
 
 class AccessPolicyCRUD:
     """CRUD for access control policies"""
@@ -61,7 +96,7 @@ class AccessPolicyCRUD:
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Closes the database session."""
-        await self.session.close()
+        await close_async_session(self.session)
 
     def __get_resource_inheritance_common_table_expression(
         self,
@@ -185,6 +220,175 @@ class AccessPolicyCRUD:
             # print(current_user)
             return False
 
+    def __get_inheriting_descendants_common_table_expression(
+        self,
+        hierarchy: Type[BaseHierarchy],
+        base_ids: Optional[List[UUID]],
+        all_ids: select,
+    ):
+        """Returns the base ids and all descendants inheriting from them - or all_ids, if no base ids are provided"""
+        if base_ids is None:
+            return all_ids.cte()
+
+        HierarchyAlias = aliased(hierarchy)
+        base_ids_values = values(column("id", Uuid), name="base_ids").data(
+            [(base_id,) for base_id in base_ids]
+        )
+
+        descendants_cte = select(base_ids_values.c.id).cte(recursive=True)
+        # union instead of union_all: stops on cycles in the hierarchy.
+        descendants_cte = descendants_cte.union(
+            select(HierarchyAlias.child_id.label("id")).where(
+                HierarchyAlias.parent_id == descendants_cte.c.id,
+                HierarchyAlias.inherit.is_(True),
+            )
+        )
+        return descendants_cte
+
+    def __get_inherited_ancestors_common_table_expression(
+        self,
+        hierarchy: Type[BaseHierarchy],
+        origins_cte,
+    ):
+        """Pairs every origin with itself and all ancestors, it inherits permissions from"""
+        HierarchyAlias = aliased(hierarchy)
+
+        ancestors_cte = select(
+            origins_cte.c.id.label("origin_id"),
+            origins_cte.c.id.label("ancestor_id"),
+        ).cte(recursive=True)
+        ancestors_cte = ancestors_cte.union(
+            select(
+                ancestors_cte.c.origin_id,
+                HierarchyAlias.parent_id.label("ancestor_id"),
+            ).where(
+                HierarchyAlias.child_id == ancestors_cte.c.ancestor_id,
+                HierarchyAlias.inherit.is_(True),
+            )
+        )
+        return ancestors_cte
+
+    async def refresh_effective_permissions(
+        self,
+        session: AsyncSession,
+        identity_ids: Optional[List[UUID]] = None,
+        resource_ids: Optional[List[UUID]] = None,
+    ) -> None:
+        """Recomputes the effective permissions for the identities and resources including everything inheriting from them; None stands for all."""
+        # Runs inside the callers session, so it commits together with the change of policies or hierarchies.
+        if identity_ids == [] or resource_ids == []:
+            return
+
+        identities_cte = self.__get_inheriting_descendants_common_table_expression(
+            IdentityHierarchy,
+            identity_ids,
+            union(
+                select(AccessPolicy.identity_id.label("id")).where(
+                    AccessPolicy.identity_id.is_not(None)
+                ),
+                select(IdentityHierarchy.child_id.label("id")),
+            ),
+        )
+        resources_cte = self.__get_inheriting_descendants_common_table_expression(
+            ResourceHierarchy,
+            resource_ids,
+            union(
+                select(AccessPolicy.resource_id.label("id")),
+                select(ResourceHierarchy.child_id.label("id")),
+            ),
+        )
+
+        statement = delete(EffectivePermission)
+        if identity_ids is not None:
+            statement = statement.where(
+                EffectivePermission.identity_id.in_(select(identities_cte.c.id))
+            )
+        if resource_ids is not None:
+            statement = statement.where(
+                EffectivePermission.resource_id.in_(select(resources_cte.c.id))
+            )
+        await session.exec(statement)
+
+        identity_ancestors_cte = self.__get_inherited_ancestors_common_table_expression(
+            IdentityHierarchy, identities_cte
+        )
+        resource_ancestors_cte = self.__get_inherited_ancestors_common_table_expression(
+            ResourceHierarchy, resources_cte
+        )
+
+        # The database orders the action enum by declaration: read < write < own.
+        permissions = (
+            select(
+                identity_ancestors_cte.c.origin_id,
+                resource_ancestors_cte.c.origin_id,
+                func.max(AccessPolicy.action),
+            )
+            .select_from(AccessPolicy)
+            .join(
+                identity_ancestors_cte,
+                AccessPolicy.identity_id == identity_ancestors_cte.c.ancestor_id,
+            )
+            .join(
+                resource_ancestors_cte,
+                AccessPolicy.resource_id == resource_ancestors_cte.c.ancestor_id,
+            )
+            .group_by(
+                identity_ancestors_cte.c.origin_id,
+                resource_ancestors_cte.c.origin_id,
+            )
+        )
+        # public policies only change, when all identities are refreshed:
+        if identity_ids is None:
+            public_permissions = (
+                select(
+                    null(),
+                    resource_ancestors_cte.c.origin_id,
+                    func.max(AccessPolicy.action),
+                )
+                .select_from(AccessPolicy)
+                .join(
+                    resource_ancestors_cte,
+                    AccessPolicy.resource_id == resource_ancestors_cte.c.ancestor_id,
+                )
+                .where(AccessPolicy.public)
+                .group_by(resource_ancestors_cte.c.origin_id)
+            )
+            permissions = permissions.union_all(public_permissions)
+
+        statement = insert(EffectivePermission).from_select(
+            ["identity_id", "resource_id", "action"], permissions
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["identity_id", "resource_id"],
+            set_={"action": statement.excluded.action},
+        )
+        await session.exec(statement)
+
+    async def rebuild_effective_permissions(self) -> None:
+        """Recomputes all effective permissions from policies and hierarchies."""
+        async with self:
+            # one worker at a time:
+            await self.session.exec(
+                select(
+                    func.pg_advisory_xact_lock(
+                        func.hashtextextended(
+                            literal(f"{EffectivePermission.__tablename__}:rebuild"), 0
+                        )
+                    )
+                )
+            )
+            # nothing to do, where the migration did not create the table yet:
+            response = await self.session.exec(
+                text("SELECT to_regclass(:table)").bindparams(
+                    table=EffectivePermission.__tablename__
+                )
+            )
+            if response.scalar_one() is None:
+                logger.warning("Effective permissions not rebuilt - table missing.")
+                return
+            await self.refresh_effective_permissions(self.session)
+            await self.session.commit()
+
     def filters_allowed(
         self,
         statement: select,
@@ -251,7 +455,7 @@ class AccessPolicyCRUD:
                 .where(AccessPolicy.action.in_(action))
                 .where(AccessPolicy.public)
             )
-            if (model == AccessPolicy) or (model == AccessLog):
+            if model in (AccessPolicy, AccessLog, AccessLogRollup):
                 statement = statement.where(model.resource_id.in_(subquery))
             else:
                 statement = statement.where(model.id.in_(subquery))
@@ -264,6 +468,23 @@ class AccessPolicyCRUD:
             # TBD: avoid a return in the the middle of the function!
             return statement
         # Users can access the resources, they have permission for including public resources:
+        elif config.ACCESS_EFFECTIVE_PERMISSIONS:
+            # inheritance is already resolved in the table of effective permissions:
+            effective_resource_ids = select(EffectivePermission.resource_id).where(
+                EffectivePermission.action.in_(action),
+                or_(
+                    EffectivePermission.identity_id == current_user.user_id,
+                    EffectivePermission.identity_id.is_(None),
+                ),
+            )
+            if model in (AccessPolicy, AccessLog, AccessLogRollup):
+                statement = statement.where(
+                    model.resource_id.in_(effective_resource_ids)
+                )
+            else:
+                statement = statement.where(model.id.in_(effective_resource_ids))
+            # TBD: avoid a return in the the middle of the function!
+            return statement
         else:
             # for resource hierarchy:
             # get all parent resource id's, that the resource inherits from
@@ -359,7 +580,7 @@ class AccessPolicyCRUD:
         # else:
         #     statement = statement.where(model.id.in_(subquery))
 
-        if (model == AccessPolicy) or (model == AccessLog):
+        if model in (AccessPolicy, AccessLog, AccessLogRollup):
             statement = statement.where(
                 or_(
                     # TBD: both should be returned in the new function "__get_accessible_resource_ids"
@@ -627,6 +848,90 @@ class AccessPolicyCRUD:
 
         return False
 
+    async def check_access_many(
+        self,
+        current_user: CurrentUserData,
+        resource_ids: List[UUID],
+    ) -> List[AccessPermission]:
+        """Checks the access levels of the user to several resources in one query."""
+        # Necessary as otherwise an empty database could never get data into it.
+        if current_user.azure_token_roles and "Admin" in current_user.azure_token_roles:
+            return [
+                AccessPermission(resource_id=resource_id, action=own)
+                for resource_id in resource_ids
+            ]
+        if not resource_ids:
+            return []
+
+        try:
+            resource_ids_values = values(column("id", Uuid), name="resource_ids").data(
+                [(resource_id,) for resource_id in set(resource_ids)]
+            )
+            # The database orders the action enum by declaration: read < write < own.
+            if config.ACCESS_EFFECTIVE_PERMISSIONS:
+                statement = (
+                    select(
+                        EffectivePermission.resource_id,
+                        func.max(EffectivePermission.action),
+                    )
+                    .where(
+                        EffectivePermission.resource_id.in_(
+                            select(resource_ids_values.c.id)
+                        ),
+                        or_(
+                            EffectivePermission.identity_id == current_user.user_id,
+                            EffectivePermission.identity_id.is_(None),
+                        ),
+                    )
+                    .group_by(EffectivePermission.resource_id)
+                )
+            else:
+                identity_hierarchy_cte = (
+                    self.__get_identity_inheritance_common_table_expression(
+                        current_user.user_id
+                    )
+                )
+                resource_ancestors_cte = (
+                    self.__get_inherited_ancestors_common_table_expression(
+                        ResourceHierarchy,
+                        select(resource_ids_values.c.id).cte(),
+                    )
+                )
+                statement = (
+                    select(
+                        resource_ancestors_cte.c.origin_id,
+                        func.max(AccessPolicy.action),
+                    )
+                    .select_from(AccessPolicy)
+                    .join(
+                        resource_ancestors_cte,
+                        AccessPolicy.resource_id
+                        == resource_ancestors_cte.c.ancestor_id,
+                    )
+                    .where(
+                        or_(
+                            AccessPolicy.identity_id.in_(
+                                select(identity_hierarchy_cte.c.identity_id)
+                            ),
+                            AccessPolicy.identity_id == current_user.user_id,
+                            AccessPolicy.public,
+                        )
+                    )
+                    .group_by(resource_ancestors_cte.c.origin_id)
+                )
+
+            async with self:
+                response = await self.session.exec(statement)
+                actions = dict(response.all())
+        except Exception as e:
+            logger.error(f"Error in reading policy: {e}")
+            raise HTTPException(status_code=403, detail="Forbidden.")
+
+        return [
+            AccessPermission(resource_id=resource_id, action=actions.get(resource_id))
+            for resource_id in resource_ids
+        ]
+
     async def check_access(
         self,
         current_user: CurrentUserData,
@@ -636,44 +941,10 @@ class AccessPolicyCRUD:
         # print("=== check_access - current_user ===")
         # print(current_user)
         try:
-            if await self.allows(
-                AccessRequest(
-                    resource_id=resource_id,
-                    action=own,
-                    current_user=current_user,
-                )
-            ):
-                return AccessPermission(
-                    resource_id=resource_id,
-                    action=own,
-                )
-            elif await self.allows(
-                AccessRequest(
-                    resource_id=resource_id,
-                    action=write,
-                    current_user=current_user,
-                )
-            ):
-                return AccessPermission(
-                    resource_id=resource_id,
-                    action=write,
-                )
-            elif await self.allows(
-                AccessRequest(
-                    resource_id=resource_id,
-                    action=read,
-                    current_user=current_user,
-                )
-            ):
-                return AccessPermission(
-                    resource_id=resource_id,
-                    action=read,
-                )
-            else:
-                return AccessPermission(
-                    resource_id=resource_id,
-                    action=None,
-                )
+            access_permissions = await self.check_access_many(
+                current_user, [resource_id]
+            )
+            return access_permissions[0]
 
             # Reading the access policies for the resource from database
             # - not working, finds access policies from other users as well!:
@@ -843,6 +1114,12 @@ class AccessPolicyCRUD:
 
             # Works:
             self.session.add(policy)
+            if config.ACCESS_EFFECTIVE_PERMISSIONS:
+                await self.refresh_effective_permissions(
+                    self.session,
+                    identity_ids=None if policy.public else [policy.identity_id],
+                    resource_ids=[policy.resource_id],
+                )
             await self.session.commit()
             await self.session.refresh(policy)
             return policy
@@ -1067,6 +1344,12 @@ class AccessPolicyCRUD:
             # await self.session.exec(statement)
             # print("=== AccessPolicyCRUD.delete - response ===")
             # pprint(response.rowcount)
+            if config.ACCESS_EFFECTIVE_PERMISSIONS and response.rowcount > 0:
+                await self.refresh_effective_permissions(
+                    self.session,
+                    identity_ids=[identity_id] if identity_id else None,
+                    resource_ids=[resource_id] if resource_id else None,
+                )
             await self.session.commit()
             # results = response.all()
             # print("=== AccessPolicyCRUD.delete - results ===")
@@ -1079,8 +1362,289 @@ class AccessPolicyCRUD:
             raise HTTPException(status_code=404, detail="Access policy not found.")
 
 
+class AccessLogWriter:
+    """Queues access logs and writes them in batches from a background task."""
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.wake_up: Optional[asyncio.Event] = None
+        self.lock: Optional[asyncio.Lock] = None
+        self.stopping = False
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        """True while the background task accepts access logs."""
+        return self.task is not None and not self.task.done() and not self.stopping
+
+    async def start(self) -> None:
+        """Starts the background task - called on application startup."""
+        self.queue = asyncio.Queue(maxsize=config.ACCESS_LOG_QUEUE_SIZE)
+        self.wake_up = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.stopping = False
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the background task and writes the remaining access logs - called on application shutdown."""
+        if self.task is None:
+            return
+        self.stopping = True
+        self.wake_up.set()
+        await self.task
+        self.task = None
+        await self.flush()
+
+    async def submit(self, access_logs: List[AccessLog]) -> None:
+        """Queues access logs - inside a unit of work only after its transaction committed."""
+        # the logs refer to identifiers, that are not visible to other connections before the commit:
+        unit = get_unit_of_work()
+        if unit is None:
+            await self.enqueue(access_logs)
+        else:
+            unit.add_after_commit_callback(lambda: self.enqueue(access_logs))
+
+    async def enqueue(self, access_logs: List[AccessLog]) -> None:
+        """Puts access logs into the queue, waits for space or drops them if the queue is full."""
+        for access_log in access_logs:
+            if self.queue.full() and config.ACCESS_LOG_QUEUE_FULL_POLICY == "drop":
+                self.dropped += 1
+                continue
+            # back-pressure: waits until the background task made space in the queue:
+            await self.queue.put(access_log)
+        if self.queue.qsize() >= config.ACCESS_LOG_BATCH_SIZE:
+            self.wake_up.set()
+
+    async def flush(self) -> None:
+        """Writes all queued access logs now."""
+        if self.queue is None:
+            return
+        async with self.lock:
+            if self.dropped:
+                logger.warning(f"Access log queue full - dropped {self.dropped} logs.")
+                self.dropped = 0
+            while not self.queue.empty():
+                batch = []
+                while (
+                    len(batch) < config.ACCESS_LOG_BATCH_SIZE and not self.queue.empty()
+                ):
+                    batch.append(self.queue.get_nowait())
+                await self._write(batch)
+
+    async def _run(self) -> None:
+        """Flushes the queue, whenever a batch is full or the flush interval passed."""
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(
+                    self.wake_up.wait(), timeout=config.ACCESS_LOG_FLUSH_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            self.wake_up.clear()
+            try:
+                await self.flush()
+            except Exception as err:
+                logger.error(f"Error in flushing access logs: {err}")
+
+    async def _write(self, access_logs: List[AccessLog]) -> None:
+        """Writes a batch of access logs with multi-row INSERTs within the parameter limit."""
+        async with async_session_factory() as session:
+            try:
+                for rows in chunk_rows(
+                    [
+                        access_log.model_dump(exclude={"id"})
+                        for access_log in access_logs
+                    ]
+                ):
+                    await session.exec(insert(AccessLog).values(rows))
+                await write_access_log_rollup(session, access_logs)
+                await session.commit()
+            except Exception as err:
+                await session.rollback()
+                logger.error(
+                    f"Error in writing {len(access_logs)} access logs at once, writing one by one: {err}"
+                )
+                # keeps the valid logs of a batch, that contains invalid ones:
+                for access_log in access_logs:
+                    try:
+                        await session.exec(
+                            insert(AccessLog).values(
+                                access_log.model_dump(exclude={"id"})
+                            )
+                        )
+                        await write_access_log_rollup(session, [access_log])
+                        await session.commit()
+                    except Exception as err:
+                        await session.rollback()
+                        logger.error(f"Error in writing access log: {err}")
+
+
+access_log_writer = AccessLogWriter()
+
+
+async def write_access_log_rollup(
+    session: AsyncSession, access_logs: List[AccessLog]
+) -> None:
+    """Adds access logs to the hourly counts - in the transaction, that writes the logs."""
+    rollups = {}
+    for access_log in access_logs:
+        bucket = access_log.time.replace(minute=0, second=0, microsecond=0)
+        key = (
+            access_log.resource_id,
+            access_log.action,
+            access_log.status_code,
+            bucket,
+        )
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollups[key] = {
+                "resource_id": access_log.resource_id,
+                "action": access_log.action,
+                "status_code": access_log.status_code,
+                "bucket": bucket,
+                "count": 1,
+                "first_time": access_log.time,
+                "last_time": access_log.time,
+            }
+        else:
+            rollup["count"] += 1
+            rollup["first_time"] = min(rollup["first_time"], access_log.time)
+            rollup["last_time"] = max(rollup["last_time"], access_log.time)
+    # same row order in all workers, so concurrent batches don't deadlock:
+    rows = [rollups[key] for key in sorted(rollups)]
+    for chunk in chunk_rows(rows):
+        statement = insert(AccessLogRollup).values(chunk)
+        await session.exec(
+            statement.on_conflict_do_update(
+                index_elements=["resource_id", "action", "status_code", "bucket"],
+                set_={
+                    "count": AccessLogRollup.count + statement.excluded.count,
+                    "first_time": func.least(
+                        AccessLogRollup.first_time, statement.excluded.first_time
+                    ),
+                    "last_time": func.greatest(
+                        AccessLogRollup.last_time, statement.excluded.last_time
+                    ),
+                },
+            )
+        )
+
+
+def add_months(month: date, months: int) -> date:
+    """Returns the first day of the month, that is the number of months apart."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class AccessLogPartitions:
+    """Creates the monthly partitions of the access logs ahead of time and removes the expired ones."""
+
+    table = AccessLog.__tablename__
+    name_pattern = re.compile(rf"^{table}_(\d{{4}})_(\d{{2}})$")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Maintains the partitions now and then periodically - called on application startup."""
+        await self.maintain()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the periodic maintenance - called on application shutdown."""
+        if self.task is None:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    @classmethod
+    def get_name(cls, month: date) -> str:
+        """Returns the name of the partition for a month."""
+        return f"{cls.table}_{month:%Y_%m}"
+
+    async def maintain(self) -> None:
+        """Creates the partitions up to the configured months ahead and removes the expired ones."""
+        this_month = date.today().replace(day=1)
+        async with async_session_factory() as session:
+            # one worker at a time:
+            await session.exec(
+                select(
+                    func.pg_advisory_xact_lock(
+                        func.hashtextextended(literal(f"{self.table}:partitions"), 0)
+                    )
+                )
+            )
+            # nothing to do, where the table is not partitioned yet:
+            response = await session.exec(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table"
+                    " WHERE partrelid = to_regclass(:table)"
+                ).bindparams(table=self.table)
+            )
+            if response.first() is None:
+                return
+            for months in range(config.ACCESS_LOG_PARTITIONS_AHEAD + 1):
+                month = add_months(this_month, months)
+                # the bounds are dates, so formatting them into DDL is safe:
+                await session.exec(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {self.get_name(month)}"
+                        f" PARTITION OF {self.table}"
+                        f" FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+                    )
+                )
+            if config.ACCESS_LOG_RETENTION_MONTHS:
+                oldest_month = add_months(
+                    this_month, -config.ACCESS_LOG_RETENTION_MONTHS
+                )
+                for name in await self._get_partitions(session):
+                    match = self.name_pattern.match(name)
+                    if not match:
+                        continue
+                    month = date(int(match.group(1)), int(match.group(2)), 1)
+                    if month >= oldest_month:
+                        continue
+                    # a whole month goes at once instead of deleting row by row:
+                    if config.ACCESS_LOG_RETENTION_POLICY == "detach":
+                        logger.info(f"Detaching expired access log partition {name}.")
+                        await session.exec(
+                            text(f"ALTER TABLE {self.table} DETACH PARTITION {name}")
+                        )
+                    else:
+                        logger.info(f"Dropping expired access log partition {name}.")
+                        await session.exec(text(f"DROP TABLE {name}"))
+            await session.commit()
+
+    async def _get_partitions(self, session: AsyncSession) -> List[str]:
+        response = await session.exec(
+            text(
+                "SELECT child.relname FROM pg_inherits"
+                " JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid"
+                " WHERE pg_inherits.inhparent = to_regclass(:table)"
+            ).bindparams(table=self.table)
+        )
+        return [name for (name,) in response.all()]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(config.ACCESS_LOG_PARTITION_INTERVAL)
+            try:
+                await self.maintain()
+            except Exception as err:
+                logger.error(f"Error in maintaining access log partitions: {err}")
+
+
+access_log_partitions = AccessLogPartitions()
+
+
 class AccessLoggingCRUD:
-    """Logging access attempts to database."""
+    """Logging access attempts to database.
+
+    Reads are eventually consistent: while the access log writer runs, logs of all workers
+    become visible after at most ACCESS_LOG_FLUSH_INTERVAL seconds.
+    """
 
     def __init__(self):
         self
@@ -1093,7 +1657,7 @@ class AccessLoggingCRUD:
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Closes the database session."""
-        await self.session.close()
+        await close_async_session(self.session)
 
     # def add_log_to_session(
     #     self,
@@ -1110,10 +1674,14 @@ class AccessLoggingCRUD:
     #         raise HTTPException(status_code=400, detail="Bad request: logging failed.")
 
     async def create(self, access_log: AccessLogCreate) -> AccessLog:
-        """Creates an access log entry."""
+        """Creates an access log entry - written in the background, if the access log writer runs."""
         try:
             access_log = AccessLog.model_validate(access_log)
+            if access_log_writer.running:
+                await access_log_writer.submit([access_log])
+                return access_log
             self.session.add(access_log)
+            await write_access_log_rollup(self.session, [access_log])
             await self.session.commit()
             await self.session.refresh(access_log)
 
@@ -1125,6 +1693,27 @@ class AccessLoggingCRUD:
             logger.error(f"Error in creating log: {e}")
             raise HTTPException(status_code=400, detail="Bad request: logging failed.")
 
+    async def create_many(self, access_logs: List[AccessLogCreate]) -> None:
+        """Creates several access log entries at once."""
+        if not access_logs:
+            return
+        try:
+            access_logs = [
+                AccessLog.model_validate(access_log) for access_log in access_logs
+            ]
+            if access_log_writer.running:
+                await access_log_writer.submit(access_logs)
+                return
+            for rows in chunk_rows(
+                [access_log.model_dump(exclude={"id"}) for access_log in access_logs]
+            ):
+                await self.session.exec(insert(AccessLog).values(rows))
+            await write_access_log_rollup(self.session, access_logs)
+            await self.session.commit()
+        except Exception as e:
+            logger.error(f"Error in creating logs: {e}")
+            raise HTTPException(status_code=400, detail="Bad request: logging failed.")
+
     # async def log_access(
     #     self,
     #     access_log: AccessLogCreate,
@@ -1145,6 +1734,66 @@ class AccessLoggingCRUD:
     #         logger.error(f"Error in logging: {e}")
     #         raise HTTPException(status_code=400, detail="Bad request: logging failed")
 
+    def _filter_statement(
+        self,
+        current_user: Optional["CurrentUserData"],
+        resource_id: Optional[UUID],
+        identity_id: Optional[UUID],
+        action: Optional[Action],
+        status_code: Optional[int],
+        required_action: Action,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ):
+        """Selects the access logs, the current user may see, matching the provided parameters."""
+        statement = select(AccessLog)
+        statement = self.policy_crud.filters_allowed(
+            statement, required_action, AccessLog, current_user
+        )
+        if resource_id:
+            statement = statement.where(AccessLog.resource_id == resource_id)
+        if identity_id:
+            statement = statement.where(AccessLog.identity_id == identity_id)
+        if action:
+            statement = statement.where(AccessLog.action == action)
+        if status_code:
+            statement = statement.where(AccessLog.status_code == status_code)
+        # bounds on the partition key limit the query to the partitions of those months:
+        if since:
+            statement = statement.where(AccessLog.time >= since)
+        if until:
+            statement = statement.where(AccessLog.time < until)
+        return statement
+
+    async def stream(
+        self,
+        current_user: Optional["CurrentUserData"] = None,
+        resource_id: Optional[UUID] = None,
+        identity_id: Optional[UUID] = None,
+        action: Optional[Action] = None,
+        status_code: Optional[int | None] = 200,
+        required_action: Optional[Action] = Action.own,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> AsyncIterator[List[AccessLog]]:
+        """Reads access logs chunk by chunk through a server-side cursor - same parameters as read."""
+        statement = self._filter_statement(
+            current_user,
+            resource_id,
+            identity_id,
+            action,
+            status_code,
+            required_action,
+            since,
+            until,
+        )
+        statement = statement.order_by(AccessLog.time, AccessLog.id).execution_options(
+            yield_per=config.STREAM_CHUNK_SIZE
+        )
+        response = await self.session.stream_scalars(statement)
+        async for access_logs in response.partitions():
+            yield access_logs
+
     async def read(
         self,
         current_user: Optional["CurrentUserData"] = None,
@@ -1156,22 +1805,22 @@ class AccessLoggingCRUD:
         limit: Optional[int] = None,
         status_code: Optional[int | None] = 200,
         required_action: Optional[Action] = Action.own,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
     ) -> List[AccessLogRead]:
-        """Reads access logs based on the provided parameters."""
+        """Reads access logs based on the provided parameters - since and until bound the time."""
         try:
             session = self.session
-            statement = select(AccessLog)
-            statement = self.policy_crud.filters_allowed(
-                statement, required_action, AccessLog, current_user
+            statement = self._filter_statement(
+                current_user,
+                resource_id,
+                identity_id,
+                action,
+                status_code,
+                required_action,
+                since,
+                until,
             )
-            if resource_id:
-                statement = statement.where(AccessLog.resource_id == resource_id)
-            if identity_id:
-                statement = statement.where(AccessLog.identity_id == identity_id)
-            if action:
-                statement = statement.where(AccessLog.action == action)
-            if status_code:
-                statement = statement.where(AccessLog.status_code == status_code)
             if ascending_order_by:
                 statement = statement.order_by(ascending_order_by.asc())
             if descending_order_by:
@@ -1216,27 +1865,99 @@ class AccessLoggingCRUD:
             logging.error(err)
             raise HTTPException(status_code=404, detail="Access logs not found.")
 
-    async def read_resource_created_at(
+    def _rollup_statement(
+        self,
+        current_user: Optional["CurrentUserData"],
+        required_action: Action,
+        *columns,
+    ):
+        """Selects from the hourly counts of the access logs, the current user may see."""
+        statement = select(*columns)
+        return self.policy_crud.filters_allowed(
+            statement, required_action, AccessLogRollup, current_user
+        )
+
+    async def read_aggregates(
         self,
         current_user: CurrentUserData,
         resource_id: UUID,
-    ):
-        """Reads the first access log with action "Own" for a resource id - corresponds to create."""
+        action: Optional[Action] = None,
+        status_code: Optional[int] = None,
+        bucket: TimeBucket = TimeBucket.hour,
+    ) -> List[AccessLogAggregate]:
+        """Reads the number, first and last time of access attempts per action, status code and time bucket."""
         try:
-            first_owner_entry = await self.read(
+            # the bucket is an enum, so it's safe to inline - the same parameter in select and group by:
+            time_bucket = func.date_trunc(
+                literal_column(f"'{TimeBucket(bucket).value}'"), AccessLogRollup.bucket
+            )
+            statement = self._rollup_statement(
                 current_user,
-                resource_id,
-                status_code=201,
-                action=Action.own,
-                ascending_order_by=AccessLog.time,
-                limit=1,
-                required_action=Action.read,
+                Action.read,
+                AccessLogRollup.resource_id,
+                AccessLogRollup.action,
+                AccessLogRollup.status_code,
+                time_bucket.label("bucket"),
+                func.sum(AccessLogRollup.count).label("count"),
+                func.min(AccessLogRollup.first_time).label("first_time"),
+                func.max(AccessLogRollup.last_time).label("last_time"),
+            ).where(AccessLogRollup.resource_id == resource_id)
+            if action:
+                statement = statement.where(AccessLogRollup.action == action)
+            if status_code:
+                statement = statement.where(AccessLogRollup.status_code == status_code)
+            statement = statement.group_by(
+                AccessLogRollup.resource_id,
+                AccessLogRollup.action,
+                AccessLogRollup.status_code,
+                time_bucket,
+            ).order_by(time_bucket, AccessLogRollup.action, AccessLogRollup.status_code)
+            response = await self.session.exec(statement)
+            results = response.all()
+            if not results:
+                raise HTTPException(status_code=404, detail="Access logs not found.")
+            return [AccessLogAggregate.model_validate(row._mapping) for row in results]
+        except Exception as err:
+            logging.error(err)
+            raise HTTPException(status_code=404, detail="Access logs not found.")
+
+    async def read_resources_created_at(
+        self,
+        current_user: CurrentUserData,
+        resource_ids: List[UUID],
+    ) -> List[datetime]:
+        """Reads the time of the first access log with action "Own" for each resource id - corresponds to create."""
+        try:
+            statement = (
+                self._rollup_statement(
+                    current_user,
+                    Action.read,
+                    AccessLogRollup.resource_id,
+                    func.min(AccessLogRollup.first_time),
+                )
+                .where(AccessLogRollup.resource_id.in_(resource_ids))
+                .where(AccessLogRollup.action == Action.own)
+                .where(AccessLogRollup.status_code == 201)
+                .group_by(AccessLogRollup.resource_id)
             )
-            return first_owner_entry[0].time
+            response = await self.session.exec(statement)
+            created_at = dict(response.all())
+            return [created_at[UUID(str(resource_id))] for resource_id in resource_ids]
         except Exception as err:
             logging.error(err)
             raise HTTPException(status_code=404, detail="Access logs not found.")
 
+    async def read_resource_created_at(
+        self,
+        current_user: CurrentUserData,
+        resource_id: UUID,
+    ) -> datetime:
+        """Reads the first access log with action "Own" for a resource id - corresponds to create."""
+        (created_at,) = await self.read_resources_created_at(
+            current_user, [resource_id]
+        )
+        return created_at
+
     async def read_resource_last_accessed_at(
         self,
         current_user: CurrentUserData,
@@ -1245,6 +1966,13 @@ class AccessLoggingCRUD:
     ) -> AccessLogRead:
         """Reads the last access log for a resource id."""
         try:
+            # the hourly counts tell, which partition holds the last access:
+            response = await self.session.exec(
+                select(func.max(AccessLogRollup.bucket)).where(
+                    AccessLogRollup.resource_id == resource_id
+                )
+            )
+            last_bucket = response.one()
             last_accessed_entry = await self.read(
                 current_user,
                 resource_id,
@@ -1252,23 +1980,54 @@ class AccessLoggingCRUD:
                 limit=1,
                 status_code=None,
                 required_action=action,
+                since=last_bucket,
             )
             return last_accessed_entry[0]
         except Exception as err:
             logging.error(err)
             raise HTTPException(status_code=404, detail="Access logs not found.")
 
+    async def read_resources_last_accessed_at(
+        self,
+        current_user: CurrentUserData,
+        resource_ids: List[UUID],
+    ) -> List[datetime]:
+        """Reads the time of the last access log for each resource id."""
+        try:
+            statement = (
+                self._rollup_statement(
+                    current_user,
+                    Action.read,
+                    AccessLogRollup.resource_id,
+                    func.max(AccessLogRollup.last_time),
+                )
+                .where(AccessLogRollup.resource_id.in_(resource_ids))
+                .group_by(AccessLogRollup.resource_id)
+            )
+            response = await self.session.exec(statement)
+            last_accessed_at = dict(response.all())
+            return [
+                last_accessed_at[UUID(str(resource_id))] for resource_id in resource_ids
+            ]
+        except Exception as err:
+            logging.error(err)
+            raise HTTPException(status_code=404, detail="Access logs not found.")
+
     async def read_resource_access_count(
         self,
         current_user: CurrentUserData,
         resource_id: UUID,
-    ):
+    ) -> int:
         """Reads the number of access logs for a resource id."""
         try:
-            access_count = await self.read(
-                current_user, resource_id, required_action=Action.read, status_code=None
-            )
-            return len(access_count)
+            statement = self._rollup_statement(
+                current_user, Action.read, func.sum(AccessLogRollup.count)
+            ).where(AccessLogRollup.resource_id == resource_id)
+            response = await self.session.exec(statement)
+            access_count = response.one()
+            if access_count is None:
+                raise HTTPException(status_code=404, detail="Access logs not found.")
+            return access_count
         except Exception as err:
             logging.error(err)
             raise HTTPException(status_code=404, detail="Access logs not found.")
@@ -1360,7 +2119,20 @@ class BaseHierarchyCRUD(
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Closes the database session."""
-        await self.session.close()
+        await close_async_session(self.session)
+
+    async def _refresh_effective_permissions(self, *child_ids: UUID) -> None:
+        """Refreshes the effective permissions of the children and everything inheriting from them."""
+        if not config.ACCESS_EFFECTIVE_PERMISSIONS:
+            return
+        if self.model == IdentityHierarchy:
+            await self.policy_crud.refresh_effective_permissions(
+                self.session, identity_ids=list(child_ids)
+            )
+        else:
+            await self.policy_crud.refresh_effective_permissions(
+                self.session, resource_ids=list(child_ids)
+            )
 
     async def create(
         self,
@@ -1413,13 +2185,10 @@ class BaseHierarchyCRUD(
 
             allowed_children = self.hierarchy.get_allowed_children_types(parent_type)
             if child_type in allowed_children:
-                relation = self.model(
-                    parent_id=parent_id,
-                    child_id=child_id,
-                    inherit=inherit,
-                )
-                relation = self.model.model_validate(relation)
+                (row,) = await self.get_new_relations(parent_id, [child_id], inherit)
+                relation = self.model(**row)
                 self.session.add(relation)
+                await self._refresh_effective_permissions(child_id)
                 await self.session.commit()
                 await self.session.refresh(relation)
                 return relation
@@ -1433,6 +2202,92 @@ class BaseHierarchyCRUD(
             logger.error(f"Error in creating hierarchy: {err}")
             raise HTTPException(status_code=403, detail="Forbidden.")
 
+    async def _check_many_children(
+        self,
+        current_user: CurrentUserData,
+        parent_id: UUID,
+        child_type: ResourceType,
+        child_ids: List[UUID],
+    ) -> None:
+        """Checks access to the parent and all children and their types in one query each - raises otherwise."""
+        parent_permission, *child_permissions = (
+            await self.policy_crud.check_access_many(
+                current_user, [parent_id, *child_ids]
+            )
+        )
+        if parent_permission.action not in [write, own] or any(
+            child_permission.action != own for child_permission in child_permissions
+        ):
+            raise HTTPException(status_code=403, detail="Forbidden.")
+
+        response = await self.session.exec(
+            select(IdentifierTypeLink.id, IdentifierTypeLink.type).where(
+                IdentifierTypeLink.id.in_([parent_id, *child_ids])
+            )
+        )
+        types = dict(response.all())
+        allowed_children = self.hierarchy.get_allowed_children_types(
+            types.get(parent_id)
+        )
+        if child_type not in allowed_children or any(
+            types.get(child_id) != child_type for child_id in child_ids
+        ):
+            logger.error("Bad request: child type not allowed for parent.")
+            raise HTTPException(
+                status_code=403,
+                detail="Bad request: child type not allowed for parent.",
+            )
+
+    async def get_new_relations(
+        self, parent_id: UUID, child_ids: List[UUID], inherit: bool
+    ) -> List[dict]:
+        """Returns the rows for the new parent-child relationships."""
+        return [
+            self.model.model_validate(
+                {"parent_id": parent_id, "child_id": child_id, "inherit": inherit}
+            ).model_dump()
+            for child_id in child_ids
+        ]
+
+    async def create_many(
+        self,
+        current_user: CurrentUserData,
+        parent_id: UUID,
+        child_type: ResourceType,
+        child_ids: List[UUID],
+        inherit: Optional[bool] = False,
+    ) -> List[BaseHierarchyModelRead]:
+        """Checks access and type matching for all children at once and creates the missing parent-child relationships."""
+        child_ids = list(dict.fromkeys(child_ids))
+        if not child_ids:
+            return []
+        try:
+            await self._check_many_children(
+                current_user, parent_id, child_type, child_ids
+            )
+            relations = await self.get_new_relations(parent_id, child_ids, inherit)
+            # existing relationships stay as they are:
+            for rows in chunk_rows(relations):
+                await self.session.exec(
+                    insert(self.model)
+                    .values(rows)
+                    .on_conflict_do_nothing(index_elements=["parent_id", "child_id"])
+                )
+            await self._refresh_effective_permissions(*child_ids)
+            await self.session.commit()
+
+            response = await self.session.exec(
+                select(self.model).where(
+                    self.model.parent_id == parent_id,
+                    self.model.child_id.in_(child_ids),
+                )
+            )
+            relations = {relation.child_id: relation for relation in response.all()}
+            return [relations[child_id] for child_id in child_ids]
+        except Exception as err:
+            logger.error(f"Error in creating hierarchies: {err}")
+            raise HTTPException(status_code=403, detail="Forbidden.")
+
     async def read(
         self,
         current_user: CurrentUserData,
@@ -1540,6 +2395,8 @@ class BaseHierarchyCRUD(
             # pprint(statement.compile().params)
 
             response = await self.session.exec(statement)
+            if response.rowcount > 0:
+                await self._refresh_effective_permissions(child_id)
             await self.session.commit()
             if response.rowcount == 0:
                 raise HTTPException(status_code=404, detail="Hierarchy not found.")
@@ -1557,38 +2414,229 @@ class ResourceHierarchyCRUD(
         # super().__init__(ResourceHierarchy, ResourceHierarchyTable)
         super().__init__(ResourceHierarchy, ResourceHierarchy)
 
-    async def create(
-        self,
-        current_user: CurrentUserData,
-        parent_id: UUID,
-        child_type: ResourceType,
-        child_id: UUID,
-        inherit: Optional[bool] = False,
-    ) -> ResourceHierarchy:
-        """Creates a new resource hierarchy."""
-        hierarchy = await super().create(
-            current_user, parent_id, child_type, child_id, inherit
+    async def _lock_children(self, parent_id: UUID) -> None:
+        """Serializes the changes to the order of the children of a parent until the transaction ends."""
+        await self.session.exec(
+            select(
+                func.pg_advisory_xact_lock(
+                    func.hashtextextended(literal(str(parent_id)), 0)
+                )
+            )
         )
 
-        # Add order to the hierarchy:
+    async def rebalance_children(self, parent_id: UUID) -> None:
+        """Spreads the order keys of all children of a parent evenly - runs only, when a gap is used up."""
+        ranked = (
+            select(
+                ResourceHierarchy.child_id,
+                (
+                    func.row_number().over(
+                        order_by=(
+                            ResourceHierarchy.order.asc().nulls_last(),
+                            ResourceHierarchy.child_id,
+                        )
+                    )
+                    * ORDER_GAP
+                ).label("order"),
+            )
+            .where(ResourceHierarchy.parent_id == parent_id)
+            .subquery()
+        )
+        await self.session.exec(
+            update(ResourceHierarchy)
+            .where(
+                ResourceHierarchy.parent_id == parent_id,
+                ResourceHierarchy.child_id == ranked.c.child_id,
+            )
+            .values(order=ranked.c.order)
+        )
+        logger.info(f"Rebalanced the order of the children of {parent_id}.")
 
-        # Get the next order value
+    async def _get_last_order(self, parent_id: UUID) -> int:
         result = await self.session.exec(
             select(func.max(ResourceHierarchy.order)).where(
                 ResourceHierarchy.parent_id == parent_id
             )
         )
-        max_order = result.one_or_none()
-        next_order = (max_order or 0) + 1
+        return result.one_or_none() or 0
+
+    async def get_new_relations(
+        self, parent_id: UUID, child_ids: List[UUID], inherit: bool
+    ) -> List[dict]:
+        """Returns the rows for the new parent-child relationships - appended after the existing children with gaps in between."""
+        # concurrent appends to the same parent wait here instead of getting the same order:
+        await self._lock_children(parent_id)
+        last_order = await self._get_last_order(parent_id)
+        if last_order + len(child_ids) * ORDER_GAP > MAX_ORDER:
+            await self.rebalance_children(parent_id)
+            last_order = await self._get_last_order(parent_id)
+        return [
+            ResourceHierarchy.model_validate(
+                {
+                    "parent_id": parent_id,
+                    "child_id": child_id,
+                    "inherit": inherit,
+                    "order": last_order + position * ORDER_GAP,
+                }
+            ).model_dump()
+            for position, child_id in enumerate(child_ids, start=1)
+        ]
+
+    def _get_tree_statement(self, root_id: UUID, depth: int):
+        """Selects the root and all relations down to depth below it in one recursive query."""
+        tree = (
+            select(
+                ResourceHierarchy.parent_id,
+                ResourceHierarchy.child_id,
+                ResourceHierarchy.order,
+                ResourceHierarchy.inherit,
+                literal(1).label("depth"),
+            )
+            .where(ResourceHierarchy.parent_id == root_id)
+            .cte(recursive=True)
+        )
+        hierarchy = aliased(ResourceHierarchy)
+        tree = tree.union_all(
+            select(
+                hierarchy.parent_id,
+                hierarchy.child_id,
+                hierarchy.order,
+                hierarchy.inherit,
+                tree.c.depth + 1,
+            )
+            .join(tree, hierarchy.parent_id == tree.c.child_id)
+            .where(tree.c.depth < depth)
+        )
+        root = select(
+            cast(null(), Uuid).label("parent_id"),
+            literal(root_id, Uuid).label("child_id"),
+            cast(null(), Integer).label("order"),
+            cast(null(), Boolean).label("inherit"),
+            literal(0).label("depth"),
+        )
+        nodes = union_all(root, select(tree)).subquery()
+        return select(
+            nodes.c.parent_id,
+            nodes.c.child_id,
+            nodes.c.order,
+            nodes.c.inherit,
+            IdentifierTypeLink.type,
+        ).join(IdentifierTypeLink, IdentifierTypeLink.id == nodes.c.child_id)
+
+    async def read_tree(
+        self,
+        current_user: Optional[CurrentUserData],
+        root_id: UUID,
+        depth: int = 1,
+        root_type: Optional[ResourceType] = None,
+    ) -> ResourceHierarchyTree:
+        """Reads a resource with its descendants down to depth - the relations in one recursive query and the resources in one query per type."""
+        try:
+            statement = self._get_tree_statement(root_id, depth)
+            # the permissions are checked once for all nodes of the tree:
+            statement = self.policy_crud.filters_allowed(
+                statement, read, IdentifierTypeLink, current_user
+            )
+            response = await self.session.exec(statement)
+            relations = response.all()
+
+            children = {}
+            types = {}
+            for parent_id, child_id, order, inherit, type in relations:
+                types[child_id] = ResourceType(type)
+                if parent_id is not None:
+                    # resources reached on several paths show up once per relation:
+                    children.setdefault(parent_id, {})[child_id] = (order, inherit)
+            if root_id not in types or root_type not in (None, types[root_id]):
+                raise HTTPException(status_code=404, detail="Resource not found.")
+
+            resources = {}
+            for type in set(types.values()):
+                model = ResourceType.get_model(type)
+                ids = [id for id, node_type in types.items() if node_type == type]
+                # the tree holds the relations - the relationships of the models are not loaded:
+                response = await self.session.exec(
+                    select(model).where(model.id.in_(ids)).options(raiseload("*"))
+                )
+                for resource in response.all():
+                    resources[resource.id] = resource.model_dump()
+
+            def build(id, order, inherit, level):
+                nodes = children.get(id, {}) if level < depth else {}
+                return ResourceHierarchyTree(
+                    id=id,
+                    type=types[id],
+                    order=order,
+                    inherit=inherit,
+                    resource=resources[id],
+                    children=[
+                        build(child_id, child_order, child_inherit, level + 1)
+                        for child_id, (child_order, child_inherit) in sorted(
+                            nodes.items(), key=lambda node: (node[1][0], node[0])
+                        )
+                        if child_id in resources
+                    ],
+                )
 
-        # Update the hierarchy with the order value:
-        hierarchy.order = next_order
-        await self.session.commit()
-        await self.session.refresh(hierarchy)
+            tree = build(root_id, None, None, 0)
+
+            async with AccessLoggingCRUD() as logging_crud:
+                await logging_crud.create_many(
+                    [
+                        AccessLogCreate(
+                            resource_id=id,
+                            action=read,
+                            identity_id=current_user.user_id if current_user else None,
+                            status_code=200,
+                        )
+                        for id in resources
+                    ]
+                )
+            return tree
+        except Exception as err:
+            logger.error(f"Error in reading resource tree: {err}")
+            raise HTTPException(status_code=404, detail="Resource not found.")
 
-        return hierarchy
+    async def _find_gap(
+        self,
+        parent_id: UUID,
+        child_id: UUID,
+        position: str,
+        other_child_id: UUID,
+    ) -> Optional[int]:
+        """Returns the order key in the middle of the gap next to the other child - None if the gap is used up."""
+        other = aliased(ResourceHierarchy)
+        sibling = aliased(ResourceHierarchy)
+        siblings = and_(
+            sibling.parent_id == parent_id,
+            sibling.child_id != child_id,
+        )
+        if position == "before":
+            neighbour = select(func.max(sibling.order)).where(
+                siblings, sibling.order < other.order
+            )
+        else:
+            neighbour = select(func.min(sibling.order)).where(
+                siblings, sibling.order > other.order
+            )
+        result = await self.session.exec(
+            select(other.order, neighbour.scalar_subquery()).where(
+                other.parent_id == parent_id, other.child_id == other_child_id
+            )
+        )
+        other_order, neighbour_order = result.one()
+        if other_order is None:
+            return None
+        if position == "before":
+            lower, upper = neighbour_order or 0, other_order
+        else:
+            lower = other_order
+            upper = neighbour_order or min(other_order + 2 * ORDER_GAP, MAX_ORDER)
+        if upper - lower < 2:
+            return None
+        return (lower + upper) // 2
 
-    async def reorder_children(  # noqa: C901
+    async def reorder_children(
         self,
         current_user: CurrentUserData,
         parent_id: UUID,
@@ -1596,82 +2644,33 @@ class ResourceHierarchyCRUD(
         position: str,
         other_child_id: Optional[UUID] = None,
     ) -> None:
-        """Reorders the children of a parent resource."""
+        """Moves a child before or after another child of the parent - updates the moving child only, unless the gap is used up."""
         try:
-            # print("=== other_child_id ===")
-            # print(other_child_id)
-
-            # Ensure user has write permissions on parent resource:
-            parent_access_request = AccessRequest(
-                resource_id=parent_id,
-                action=Action.write,
-                current_user=current_user,
+            # write access on the parent and both children:
+            permissions = await self.policy_crud.check_access_many(
+                current_user, [id for id in [parent_id, child_id, other_child_id] if id]
             )
-            if not await self.policy_crud.allows(parent_access_request):
+            if any(permission.action not in [write, own] for permission in permissions):
                 raise HTTPException(status_code=403, detail="Forbidden.")
-            # Alternative - same as above in create()
-            # TBD: decide which one to use and consider replacing the above with this one!
-            # it's anyways making another round trip to the database!
-            # statement = select(IdentifierTypeLink.type)
-            # statement = self.policy_crud.filters_allowed(
-            #     statement, Action.write, IdentifierTypeLink, current_user
-            # )
-            # statement = statement.where(IdentifierTypeLink.id == parent_id)
 
-            # result = await self.session.exec(statement)
-            # parent_type = result.one()
-
-            # parent_model = ResourceType.get_model(parent_type)
-
-            # Fetch the children of the parent resource
-            child_access_request = AccessRequest(
-                resource_id=child_id,
-                action=Action.write,
-                current_user=current_user,
-            )
-            if not await self.policy_crud.allows(child_access_request):
-                raise HTTPException(status_code=403, detail="Forbidden.")
-
-            if other_child_id:
-                other_child_access_request = AccessRequest(
-                    resource_id=other_child_id,
-                    action=Action.write,
-                    current_user=current_user,
+            await self._lock_children(parent_id)
+            order = await self._find_gap(parent_id, child_id, position, other_child_id)
+            if order is None:
+                await self.rebalance_children(parent_id)
+                order = await self._find_gap(
+                    parent_id, child_id, position, other_child_id
                 )
-                if not await self.policy_crud.allows(other_child_access_request):
-                    raise HTTPException(status_code=403, detail="Forbidden.")
-
-            # Get all children of the parent resource - no matter the access rights:
-            statement = select(self.model)
-            statement = statement.where(self.model.parent_id == parent_id)
-            statement = statement.order_by(self.model.order)
-            children = await self.session.exec(statement)
-            children = children.all()
-
-            # Find the old and new positions of the child
-            old_position = None
-            moving_child = None
-            new_position = None
-            for child in children:
-                if child.child_id == child_id:
-                    old_position = child.order
-                    moving_child = child
-                if other_child_id and child.child_id == other_child_id:
-                    if position == "before":
-                        new_position = child.order - 1
-                    elif position == "after":
-                        new_position = child.order
-
-            if old_position < new_position:
-                moving_child.order = new_position
-                for i in range(old_position, new_position):
-                    children[i].order = i
-            else:
-                moving_child.order = new_position + 1
-                for i in range(new_position, old_position - 1):
-                    children[i].order += 1
 
-            # Update the database
+            response = await self.session.exec(
+                update(ResourceHierarchy)
+                .where(
+                    ResourceHierarchy.parent_id == parent_id,
+                    ResourceHierarchy.child_id == child_id,
+                )
+                .values(order=order)
+            )
+            if response.rowcount != 1:
+                raise HTTPException(status_code=404, detail="Hierarchy not found.")
             await self.session.commit()
 
         except Exception as err:
@@ -1,16 +1,38 @@
 import logging
 import uuid
+from functools import cached_property, lru_cache
 from os import makedirs, path, remove, rename
-from typing import TYPE_CHECKING, Generic, List, Optional, Type, TypeVar
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    get_args,
+    get_origin,
+)
 
 from fastapi import HTTPException, UploadFile
 from fastapi.responses import FileResponse
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy.orm import aliased, class_mapper, contains_eager, foreign, noload
-from sqlmodel import SQLModel, asc, delete, func, or_, select
+from sqlalchemy.orm import aliased, class_mapper, contains_eager, foreign
+from sqlmodel import SQLModel, and_, asc, delete, select, tuple_
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.databases import get_async_session
+from core.config import config
+from core.databases import (
+    chunk_rows,
+    close_async_session,
+    decode_cursor,
+    encode_cursor,
+    get_async_session,
+    rollback_failed_session,
+)
 from crud.access import (
     AccessLoggingCRUD,
     AccessPolicyCRUD,
@@ -20,17 +42,26 @@ from crud.access import (
 )
 from models.access import (
     AccessLogCreate,
+    AccessPolicy,
     AccessPolicyCreate,
     AccessPolicyDelete,
     AccessRequest,
     IdentifierTypeLink,
     IdentityHierarchy,
     ResourceHierarchy,
+    ResourceHierarchyTree,
 )
 
 if TYPE_CHECKING:
     pass
-from core.types import Action, CurrentUserData, IdentityType, ResourceType
+from core.types import (
+    Action,
+    BaseType,
+    CurrentUserData,
+    IdentityType,
+    ResourceType,
+    model_registry,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +75,85 @@ BaseSchemaTypeRead = TypeVar("BaseSchemaTypeRead", bound=SQLModel)
 BaseSchemaTypeUpdate = TypeVar("BaseSchemaTypeUpdate", bound=SQLModel)
 
 
+# the model is the parent or the child in the hierarchy relation of a relationship:
+PARENT = "parent"
+CHILD = "child"
+
+
+class RelationshipPlan(NamedTuple):
+    """How a read joins a relationship of a model"""
+
+    attribute: Any
+    related_model: Type[SQLModel]
+    related_type: BaseType
+    # the model is parent or child to the related model - in the order of the hierarchy relations:
+    directions: Tuple[str, ...]
+
+
+class CRUDMetadata:
+    """Type, hierarchy and read plan of a model - resolved once and shared by all CRUD instances of the model"""
+
+    def __init__(self, model: Type[SQLModel]):
+        self.model = model
+        if model.__name__ in ResourceType.values():
+            self.entity_type = ResourceType(model.__name__)
+            self.type = ResourceType
+            self.hierarchy = ResourceHierarchy
+            self.hierarchy_CRUD = ResourceHierarchyCRUD
+        elif model.__name__ in IdentityType.values():
+            self.entity_type = IdentityType(model.__name__)
+            self.type = IdentityType
+            self.hierarchy = IdentityHierarchy
+            self.hierarchy_CRUD = IdentityHierarchyCRUD
+        else:
+            raise ValueError(
+                f"{model.__name__} is not a valid ResourceType or IdentityType"
+            )
+        self.relations = self.hierarchy.relations
+        self.read_plan: Optional[Tuple[RelationshipPlan, ...]] = None
+
+    def get_read_plan(self) -> Tuple[RelationshipPlan, ...]:
+        """Returns the relationships to join on read - resolved on first use, when all models are mapped."""
+        if self.read_plan is None:
+            self.read_plan = tuple(
+                self._plan_relationship(relationship)
+                for relationship in class_mapper(self.model).relationships
+            )
+        return self.read_plan
+
+    def _plan_relationship(self, relationship) -> RelationshipPlan:
+        related_model = self.type.get_model(relationship.mapper.class_.__name__)
+        related_type = self.type(related_model.__name__)
+        directions = []
+        for parent, children in self.relations.items():
+            if self.entity_type == parent and related_type in children:
+                directions.append(PARENT)
+            elif self.entity_type in children and related_type == parent:
+                directions.append(CHILD)
+        return RelationshipPlan(
+            attribute=getattr(self.model, relationship.key),
+            related_model=related_model,
+            related_type=related_type,
+            directions=tuple(directions),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_crud_metadata(model: Type[SQLModel]) -> CRUDMetadata:
+    """Returns the metadata of a model - the same instance for every CRUD of the model."""
+    return CRUDMetadata(model)
+
+
+def build_crud_registry() -> None:
+    """Registers the models and resolves the metadata of all typed models - called on application startup."""
+    model_registry.build()
+    for entity_types in (ResourceType, IdentityType):
+        for entity_type in entity_types:
+            model = model_registry.get(entity_type.value)
+            if model is not None:
+                get_crud_metadata(model).get_read_plan()
+
+
 class BaseCRUD(
     Generic[
         BaseModelType,
@@ -66,42 +176,31 @@ class BaseCRUD(
         self.data_directory = directory
         # TBD: move in the definition of the model, either in types or in access
         self.allow_standalone = allow_standalone
-        if base_model.__name__ in ResourceType.list():
-            self.entity_type = ResourceType(self.model.__name__)
-            self.type = ResourceType
-            self.hierarchy_CRUD = ResourceHierarchyCRUD()
-            self.hierarchy = ResourceHierarchy
-            self.relations = ResourceHierarchy.relations
-        elif base_model.__name__ in IdentityType.list():
-            # print("=== CRUD - base - IdentityType ===")
-            # print(IdentityType(self.model))
-            # print("=== CRUD - base - IdentityType.model.__name__ ===")
-            # print(IdentityType(self.model.__name__))
-            self.entity_type = IdentityType(self.model.__name__)
-            self.type = IdentityType
-            self.hierarchy_CRUD = IdentityHierarchyCRUD()
-            self.hierarchy = IdentityHierarchy
-            self.relations = IdentityHierarchy.relations
-        else:
-            raise ValueError(
-                f"{base_model.__name__} is not a valid ResourceType or IdentityType"
-            )
-
-        # TBD: move to to the init: get all possible parent-child relations for the entity_type there!
-
-        # if self.entity_type in ResourceType:
-        #     related_model = ResourceType.get_model(relationship.mapper.class_.__name__)
-
-        # elif self.entity_type in IdentityType:
-        #     related_model = IdentityType.get_model(relationship.mapper.class_.__name__)
+        metadata = get_crud_metadata(base_model)
+        self.entity_type = metadata.entity_type
+        self.type = metadata.type
+        self.hierarchy = metadata.hierarchy
+        self.relations = metadata.relations
+        self.metadata = metadata
 
-        self.policy_CRUD = AccessPolicyCRUD()
-        self.logging_CRUD = AccessLoggingCRUD()
         # moved to the if-block to check which hierarchy is relevant.
         # self.hierarchy_CRUD = (
         #     ResourceHierarchyCRUD()
         # )  # TBD. are the occasions, where I would need the IdentityHierarchyCRUD() here?
 
+    # the CRUDs keep the session of their context, so every instance gets its own - created when first used:
+    @cached_property
+    def policy_CRUD(self) -> AccessPolicyCRUD:
+        return AccessPolicyCRUD()
+
+    @cached_property
+    def logging_CRUD(self) -> AccessLoggingCRUD:
+        return AccessLoggingCRUD()
+
+    @cached_property
+    def hierarchy_CRUD(self):
+        return self.metadata.hierarchy_CRUD()
+
     async def __aenter__(self) -> AsyncSession:
         """Returns a database session."""
         self.session = await get_async_session()
@@ -109,7 +208,7 @@ class BaseCRUD(
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Closes the database session."""
-        await self.session.close()
+        await close_async_session(self.session)
 
     # async def _write_policy(
     #     self,
@@ -249,7 +348,6 @@ class BaseCRUD(
             # print("\n")
 
             await self._write_identifier_type_link(database_object.id)
-            self.session.add(database_object)
             # await self.session.commit()
             # await self.session.refresh(database_object)
             access_log = AccessLogCreate(
@@ -344,13 +442,15 @@ class BaseCRUD(
             # print(database_object)
 
             # After all checks have passed: commit the object to the database
-
+            # - added only now, as the nested CRUDs might share this session and commit earlier:
+            self.session.add(database_object)
             await self.session.commit()
             await self.session.refresh(database_object)
 
             return database_object
 
         except Exception as e:
+            await rollback_failed_session(self.session)
             try:
                 access_log = AccessLogCreate(
                     resource_id=database_object.id,
@@ -424,6 +524,153 @@ class BaseCRUD(
 
         return database_object
 
+    async def _insert_many(self, model: Type[SQLModel], rows: List[dict]) -> None:
+        """Inserts the rows with as few multi-row statements as the parameter limit allows."""
+        for chunk in chunk_rows(rows):
+            await self.session.exec(insert(model).values(chunk))
+
+    async def _check_parent_for_many(
+        self, parent_id: uuid.UUID, current_user: "CurrentUserData"
+    ) -> None:
+        """Checks write access to the parent and that it takes children of this type - raises otherwise."""
+        parent_access_request = AccessRequest(
+            resource_id=parent_id,
+            action=write,
+            current_user=current_user,
+        )
+        if not await self.policy_CRUD.allows(parent_access_request):
+            logger.error(f"Parent {parent_id} does not allow write access.")
+            raise HTTPException(status_code=403, detail="Forbidden.")
+        response = await self.session.exec(
+            select(IdentifierTypeLink.type).where(IdentifierTypeLink.id == parent_id)
+        )
+        parent_type = response.one_or_none()
+        if self.entity_type not in self.hierarchy.get_allowed_children_types(
+            parent_type
+        ):
+            logger.error("Bad request: child type not allowed for parent.")
+            raise HTTPException(status_code=403, detail="Forbidden.")
+
+    def _get_policies_for_many(
+        self,
+        object_ids: List[uuid.UUID],
+        current_user: "CurrentUserData",
+        public_action: Optional[Action] = None,
+    ) -> List[dict]:
+        """Returns the owner policies - and the public ones, if a public action is given."""
+        policies = [
+            AccessPolicyCreate(
+                resource_id=object_id, action=own, identity_id=current_user.user_id
+            )
+            for object_id in object_ids
+        ]
+        if public_action:
+            policies += [
+                AccessPolicyCreate(
+                    resource_id=object_id, action=public_action, public=True
+                )
+                for object_id in object_ids
+            ]
+        return [
+            AccessPolicy.model_validate(policy).model_dump(exclude={"id"})
+            for policy in policies
+        ]
+
+    async def _log_many(
+        self,
+        object_ids: List[uuid.UUID],
+        current_user: "CurrentUserData",
+        status_code: int,
+    ) -> None:
+        """Logs the creation of the objects."""
+        async with self.logging_CRUD as logging_CRUD:
+            await logging_CRUD.create_many(
+                [
+                    AccessLogCreate(
+                        resource_id=object_id,
+                        action=own,
+                        identity_id=current_user.user_id,
+                        status_code=status_code,
+                    )
+                    for object_id in object_ids
+                ]
+            )
+
+    async def create_many(
+        self,
+        objects: List[BaseSchemaTypeCreate],
+        current_user: "CurrentUserData",
+        parent_id: Optional[uuid.UUID] = None,
+        inherit: Optional[bool] = False,
+        public_action: Optional[Action] = None,
+    ) -> List[BaseModelType]:
+        """Creates new objects with their type links, policies, hierarchies and logs in a few multi-row statements."""
+        logger.info("BaseCRUD.create_many")
+        if inherit and not parent_id:
+            raise HTTPException(
+                status_code=400,
+                detail="Cannot inherit permissions without a parent.",
+            )
+        database_objects = [self.model.model_validate(object) for object in objects]
+        object_ids = [database_object.id for database_object in database_objects]
+        if not object_ids:
+            return []
+        try:
+            if parent_id:
+                await self._check_parent_for_many(parent_id, current_user)
+            elif not self.allow_standalone:
+                logger.error(f"{self.model.__name__} is not allowed standalone.")
+                raise HTTPException(status_code=403, detail="Forbidden.")
+
+            # type links first - objects, policies and hierarchies refer to them:
+            await self._insert_many(
+                IdentifierTypeLink,
+                [
+                    {"id": object_id, "type": self.entity_type}
+                    for object_id in object_ids
+                ],
+            )
+            await self._insert_many(
+                self.model,
+                [database_object.model_dump() for database_object in database_objects],
+            )
+            await self._insert_many(
+                AccessPolicy,
+                self._get_policies_for_many(object_ids, current_user, public_action),
+            )
+            if parent_id:
+                async with self.hierarchy_CRUD as hierarchy_CRUD:
+                    relations = await hierarchy_CRUD.get_new_relations(
+                        parent_id, object_ids, inherit
+                    )
+                await self._insert_many(self.hierarchy, relations)
+            if config.ACCESS_EFFECTIVE_PERMISSIONS:
+                await self.policy_CRUD.refresh_effective_permissions(
+                    self.session,
+                    identity_ids=None if public_action else [current_user.user_id],
+                    resource_ids=object_ids,
+                )
+            await self.session.commit()
+        except Exception as e:
+            # nothing got written, so there is no resource to log the failure for:
+            await rollback_failed_session(self.session)
+            logger.error(f"Error in BaseCRUD.create_many: {e}")
+            raise HTTPException(
+                status_code=403,
+                detail=f"{self.model.__name__} - Forbidden.",
+            )
+        await self._log_many(object_ids, current_user, 201)
+
+        # read back with the relationships for the response:
+        response = await self.session.exec(
+            select(self.model).where(self.model.id.in_(object_ids))
+        )
+        created_objects = {
+            created_object.id: created_object
+            for created_object in response.unique().all()
+        }
+        return [created_objects[object_id] for object_id in object_ids]
+
     async def add_child_to_parent(
         self,
         child_id: uuid.UUID,
@@ -443,6 +690,43 @@ class BaseCRUD(
 
         return hierarchy
 
+    async def add_children_to_parent(
+        self,
+        child_ids: List[uuid.UUID],
+        parent_id: uuid.UUID,
+        current_user: "CurrentUserData",
+        inherit: Optional[bool] = False,
+    ) -> List[BaseHierarchyModelRead]:
+        """Adds many members of this class to a parent (of another entity type) at once."""
+        async with self.hierarchy_CRUD as hierarchy_CRUD:
+            hierarchies = await hierarchy_CRUD.create_many(
+                current_user=current_user,
+                parent_id=parent_id,
+                child_type=self.entity_type,
+                child_ids=child_ids,
+                inherit=inherit,
+            )
+
+        return hierarchies
+
+    async def read_tree(
+        self,
+        id: uuid.UUID,
+        current_user: Optional["CurrentUserData"] = None,
+        depth: int = 1,
+    ) -> ResourceHierarchyTree:
+        """Reads an object of this class with its descendants down to depth."""
+        if self.hierarchy != ResourceHierarchy:
+            raise HTTPException(
+                status_code=404, detail=f"{self.model.__name__} not found."
+            )
+        async with self.hierarchy_CRUD as hierarchy_CRUD:
+            tree = await hierarchy_CRUD.read_tree(
+                current_user, id, depth, root_type=self.entity_type
+            )
+
+        return tree
+
     # TBD: implement tests for this!
     async def reorder_children(
         self,
@@ -500,12 +784,11 @@ class BaseCRUD(
                 current_user=current_user,
             )
 
-            # query relationships:
-            for relationship in class_mapper(self.model).relationships:
-                # Determine the related model, the relevant hierarchy and relations based on self.entity_type
-                related_model = self.type.get_model(relationship.mapper.class_.__name__)
-                related_attribute = getattr(self.model, relationship.key)
-                related_type = self.type(related_model.__name__)
+            # query relationships - the permission filter of the related model goes into the join condition,
+            # so a read costs one round-trip no matter how many relationships the model declares:
+            for relationship in self.metadata.get_read_plan():
+                related_model = relationship.related_model
+                related_attribute = relationship.attribute
                 related_statement = select(related_model.id)
                 related_statement = self.policy_CRUD.filters_allowed(
                     related_statement,
@@ -513,11 +796,12 @@ class BaseCRUD(
                     model=related_model,
                     current_user=current_user,
                 )
+                related_allowed = related_model.id.in_(related_statement)
 
-                # Check if self.entity_type is a key in relations, i.e. the model is a parent in the hierarchy
                 aliased_hierarchy = aliased(self.hierarchy)
-                for parent, children in self.relations.items():
-                    if self.entity_type == parent and related_type in children:
+                joined = False
+                for direction in relationship.directions:
+                    if direction == PARENT:
                         # self.model is a parent, join on parent_id
                         statement = statement.outerjoin(
                             aliased_hierarchy,
@@ -525,13 +809,17 @@ class BaseCRUD(
                         )
                         statement = statement.outerjoin(
                             related_model,
-                            related_model.id == foreign(aliased_hierarchy.child_id),
+                            and_(
+                                related_model.id == foreign(aliased_hierarchy.child_id),
+                                related_allowed,
+                            ),
                         )
                         if self.hierarchy == ResourceHierarchy:
                             statement = statement.order_by(asc(aliased_hierarchy.order))
                         else:
                             statement = statement.order_by(asc(related_model.id))
-                    elif self.entity_type in children and related_type == parent:
+                        joined = True
+                    elif direction == CHILD:
                         # self.model is a child, join on child_id
                         statement = statement.outerjoin(
                             aliased_hierarchy,
@@ -539,26 +827,21 @@ class BaseCRUD(
                         )
                         statement = statement.outerjoin(
                             related_model,
-                            related_model.id == foreign(aliased_hierarchy.parent_id),
+                            and_(
+                                related_model.id
+                                == foreign(aliased_hierarchy.parent_id),
+                                related_allowed,
+                            ),
                         )
                         statement = statement.order_by(asc(related_model.id))
+                        joined = True
 
-                count_related_statement = select(func.count()).select_from(
-                    related_statement.alias()
-                )
-                related_count = await self.session.exec(count_related_statement)
-                count = related_count.one()
-
-                if count == 0:
-                    statement = statement.options(noload(related_attribute))
-                else:
-                    statement = statement.where(
-                        or_(
-                            related_model.id
-                            == None,  # noqa: E711: comparison to None should be 'if cond is None:'
-                            related_model.id.in_(related_statement),
-                        )
-                    ).options(contains_eager(related_attribute))
+                if not joined:
+                    # relationships outside the hierarchy join along their own definition:
+                    statement = statement.outerjoin(
+                        related_attribute.and_(related_allowed)
+                    )
+                statement = statement.options(contains_eager(related_attribute))
 
             if joins:
                 for join in joins:
@@ -595,16 +878,19 @@ class BaseCRUD(
                     status_code=404, detail=f"{self.model.__name__} not found."
                 )
 
+            # TBD: add logging to accessed children!
+            access_logs = []
             for result in results:
-                # TBD: add logging to accessed children!
-                access_log = AccessLogCreate(
-                    resource_id=result.id,  # result might not be available here?
-                    action=read,
-                    identity_id=current_user.user_id if current_user else None,
-                    status_code=200,
+                access_logs.append(
+                    AccessLogCreate(
+                        resource_id=result.id,
+                        action=read,
+                        identity_id=current_user.user_id if current_user else None,
+                        status_code=200,
+                    )
                 )
-                async with self.logging_CRUD as logging_CRUD:
-                    await logging_CRUD.create(access_log)
+            async with self.logging_CRUD as logging_CRUD:
+                await logging_CRUD.create_many(access_logs)
 
             return results
         except Exception as err:
@@ -643,6 +929,110 @@ class BaseCRUD(
                     status_code=404, detail=f"{self.model.__name__} not found."
                 )
 
+    def _keyset_statement(
+        self,
+        keys: List,
+        current_user: Optional["CurrentUserData"] = None,
+        cursor: Optional[str] = None,
+        filters: Optional[List] = None,
+    ):
+        """Selects the keys of the readable objects after the cursor in keyset order."""
+        # the objects are picked on the model alone - the outer joins of read() multiply the rows
+        # and their ordering goes first, so limit and order cannot apply to the joined statement:
+        statement = select(*keys)
+        statement = self.policy_CRUD.filters_allowed(
+            statement=statement,
+            action=read,
+            model=self.model,
+            current_user=current_user,
+        )
+        if filters:
+            for filter in filters:
+                statement = statement.where(filter)
+        if cursor:
+            after = self._decode_keyset_cursor(keys, cursor)
+            statement = statement.where(tuple_(*keys) > tuple_(*after))
+        return statement.order_by(*[asc(key) for key in keys])
+
+    def _get_keyset(self, order_key=None) -> List:
+        """Returns the keyset columns - the order key, if any, and the id as tie breaker."""
+        return [self.model.id] if order_key is None else [order_key, self.model.id]
+
+    def _decode_keyset_cursor(self, keys: List, cursor: str) -> List:
+        """Decodes the cursor into values of the keyset columns - raises 400, if it does not fit."""
+        try:
+            return decode_cursor(cursor, keys)
+        except ValueError as err:
+            logger.info(f"{self.model.__name__} - {err}")
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    def check_cursor(self, cursor: Optional[str], order_key=None) -> None:
+        """Validates a cursor before reading - a streamed response can't turn into a 400 once it started."""
+        if cursor:
+            self._decode_keyset_cursor(self._get_keyset(order_key), cursor)
+
+    async def _read_in_order(
+        self, ids: List[uuid.UUID], current_user: Optional["CurrentUserData"] = None
+    ) -> list[BaseSchemaTypeRead]:
+        """Reads the objects with their relationships in the order of the ids."""
+        results = await self.read(
+            current_user=current_user, filters=[self.model.id.in_(ids)]
+        )
+        position = {id: index for index, id in enumerate(ids)}
+        return sorted(results, key=lambda result: position[result.id])
+
+    async def read_page(
+        self,
+        current_user: Optional["CurrentUserData"] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        order_key=None,
+        filters: Optional[List] = None,
+    ) -> Tuple[list[BaseSchemaTypeRead], Optional[str]]:
+        """Reads one page in keyset order on (order_key, id) - returns the page and the cursor of the next page."""
+        limit = min(limit or config.PAGE_SIZE_DEFAULT, config.PAGE_SIZE_MAX)
+        keys = self._get_keyset(order_key)
+        statement = self._keyset_statement(keys, current_user, cursor, filters)
+        # one row more tells, whether a next page exists:
+        response = await self.session.exec(statement.limit(limit + 1))
+        rows = [row if len(keys) > 1 else (row,) for row in response.all()]
+        if not rows:
+            raise HTTPException(
+                status_code=404, detail=f"{self.model.__name__} not found."
+            )
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        rows = rows[:limit]
+        results = await self._read_in_order([row[-1] for row in rows], current_user)
+        return results, next_cursor
+
+    async def read_chunks(
+        self,
+        current_user: Optional["CurrentUserData"] = None,
+        cursor: Optional[str] = None,
+        order_key=None,
+        filters: Optional[List] = None,
+    ) -> AsyncIterator[list[BaseSchemaTypeRead]]:
+        """Reads all objects after the cursor chunk by chunk in keyset order - the keys come from a server-side cursor."""
+        keys = self._get_keyset(order_key)
+        statement = self._keyset_statement(keys, current_user, cursor, filters)
+        statement = statement.execution_options(yield_per=config.STREAM_CHUNK_SIZE)
+        response = await self.session.stream(statement)
+        async for rows in response.partitions():
+            try:
+                yield await self._read_in_order([row[-1] for row in rows], current_user)
+            except HTTPException as err:
+                # objects deleted since the keys were selected:
+                if err.status_code != 404:
+                    raise
+
+    @classmethod
+    def get_read_model(cls) -> Type[BaseSchemaTypeRead]:
+        """Returns the read model from the type parameters of the CRUD class."""
+        for base in getattr(cls, "__orig_bases__", ()):
+            if get_origin(base) is BaseCRUD:
+                return get_args(base)[2]
+        raise TypeError(f"{cls.__name__} does not declare its read model.")
+
     async def read_by_id(
         self,
         id: uuid.UUID,
@@ -710,6 +1100,7 @@ class BaseCRUD(
             await session.refresh(current)
             return current
         except Exception as e:
+            await rollback_failed_session(session)
             try:
                 access_log = AccessLogCreate(
                     resource_id=current.id,
@@ -839,6 +1230,7 @@ class BaseCRUD(
             return None
 
         except Exception as e:
+            await rollback_failed_session(self.session)
             try:
                 access_log = AccessLogCreate(
                     resource_id=object_id,
@@ -5,6 +5,8 @@ from uuid import UUID
 from fastapi import HTTPException
 from sqlmodel import select
 
+from core.cache import delete_signed_up_user_id
+from core.databases import get_unit_of_work
 from core.types import Action, CurrentUserData, IdentityType
 from models.access import AccessLogCreate, AccessPolicyCreate
 from models.identity import (
@@ -358,6 +360,30 @@ class UserCRUD(BaseCRUD[User, UserCreate, UserRead, UserUpdate]):
         # )
         return current_user
 
+    async def delete(
+        self,
+        current_user: CurrentUserData,
+        object_id: UUID,
+    ) -> None:
+        """Deletes a user and forgets its sign-up, so the next request signs it up again."""
+        response = await self.session.exec(
+            select(User.azure_user_id).where(User.id == object_id)
+        )
+        azure_user_id = response.first()
+        await super().delete(current_user, object_id)
+        if azure_user_id:
+
+            async def forget():
+                await delete_signed_up_user_id(str(azure_user_id))
+
+            # inside a unit of work only after the deletion committed -
+            # before, concurrent requests still find the user and cache it again:
+            unit = get_unit_of_work()
+            if unit is None:
+                await forget()
+            else:
+                unit.add_after_commit_callback(forget)
+
     async def read_me(self, current_user: CurrentUserData) -> Me:
         """Returns the current user."""
         try:
@@ -6,7 +6,7 @@ from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.databases import get_async_session
+from core.databases import close_async_session, get_async_session
 from core.types import ResourceType
 from models.access import IdentifierTypeLink
 from models.public_resource import (
@@ -35,7 +35,7 @@ class PublicResourceCRUD:
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Closes the database session."""
-        await self.session.close()
+        await close_async_session(self.session)
 
     async def create(
         self,
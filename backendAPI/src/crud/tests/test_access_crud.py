@@ -1,23 +1,39 @@
 import uuid
+from datetime import date, datetime
 from pprint import pprint
+from unittest.mock import patch
 
 import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import func, select
 
+from core.config import config
+from core.databases import MAX_STATEMENT_PARAMETERS, unit_of_work
 from core.types import Action, CurrentUserData, IdentityType, ResourceType
 from crud.access import (
+    ORDER_GAP,
     AccessLoggingCRUD,
+    AccessLogPartitions,
+    AccessLogWriter,
     AccessPolicyCRUD,
     IdentityHierarchyCRUD,
     ResourceHierarchyCRUD,
+    add_months,
 )
 from models.access import (
+    AccessLog,
     AccessLogCreate,
+    AccessLogRollup,
     AccessPolicy,
     AccessPolicyCreate,
     AccessPolicyDelete,
     AccessPolicyUpdate,
+    EffectivePermission,
+    IdentifierTypeLink,
 )
-from models.protected_resource import ProtectedResource
+from models.identity import Group
+from models.protected_resource import ProtectedChild, ProtectedResource
 from tests.utils import (
     child_identity_id1,
     child_identity_id4,
@@ -1224,6 +1240,367 @@ async def test_create_access_log(register_many_current_users, register_many_reso
     assert created_log.status_code == access_log.status_code
 
 
+@pytest.mark.anyio
+async def test_create_many_access_logs(
+    register_many_current_users, register_many_resources, get_async_test_session
+):
+    """Test creating several access logs at once."""
+    current_user = register_many_current_users[1]
+    access_logs = [
+        AccessLogCreate(
+            identity_id=str(current_user.user_id),
+            resource_id=resource_id,
+            action=Action.read,
+            status_code=200,
+        )
+        for resource_id in register_many_resources[:3]
+    ]
+
+    async with AccessLoggingCRUD() as logging_crud:
+        await logging_crud.create_many(access_logs)
+
+    response = await get_async_test_session.exec(
+        select(AccessLog).where(AccessLog.identity_id == current_user.user_id)
+    )
+    written_logs = response.all()
+    assert len(written_logs) == 3
+    assert {log.resource_id for log in written_logs} == {
+        uuid.UUID(resource_id) for resource_id in register_many_resources[:3]
+    }
+
+
+@pytest.mark.anyio
+async def test_access_log_writer_writes_queued_logs_in_batches(
+    register_many_current_users, register_many_resources, get_async_test_session
+):
+    """Test the access log writer queues the logs and writes them in batches."""
+    current_user = register_many_current_users[1]
+    access_logs = [
+        AccessLogCreate(
+            identity_id=str(current_user.user_id),
+            resource_id=resource_id,
+            action=Action.read,
+            status_code=200,
+        )
+        for resource_id in register_many_resources
+    ]
+    statement = select(AccessLog).where(AccessLog.identity_id == current_user.user_id)
+    writer = AccessLogWriter()
+
+    with (
+        patch("crud.access.access_log_writer", writer),
+        patch.object(config, "ACCESS_LOG_BATCH_SIZE", 2),
+        patch.object(config, "ACCESS_LOG_FLUSH_INTERVAL", 60),
+    ):
+        await writer.start()
+        async with AccessLoggingCRUD() as logging_crud:
+            await logging_crud.create(access_logs[0])
+            await logging_crud.create_many(access_logs[1:])
+
+        assert writer.queue.qsize() == len(access_logs)
+        response = await get_async_test_session.exec(statement)
+        assert response.all() == []
+
+        await writer.flush()
+        assert writer.queue.empty()
+        response = await get_async_test_session.exec(statement)
+        assert len(response.all()) == len(access_logs)
+
+        await writer.stop()
+        assert not writer.running
+
+
+@pytest.mark.anyio
+async def test_access_log_writer_splits_batches_at_the_parameter_limit(
+    register_many_current_users, register_many_resources, get_async_test_session
+):
+    """Test a batch with more parameters than a statement takes is written without the row by row fallback."""
+    current_user = register_many_current_users[1]
+    resource_id = register_many_resources[0]
+    columns = len(AccessLog.model_fields) - 1
+    access_log = AccessLogCreate(
+        identity_id=str(current_user.user_id),
+        resource_id=resource_id,
+        action=Action.read,
+        status_code=200,
+    )
+    number_of_logs = MAX_STATEMENT_PARAMETERS // columns + 1
+    writer = AccessLogWriter()
+
+    with (
+        patch("crud.access.access_log_writer", writer),
+        patch.object(config, "ACCESS_LOG_BATCH_SIZE", number_of_logs),
+        patch.object(config, "ACCESS_LOG_QUEUE_SIZE", number_of_logs),
+        patch.object(config, "ACCESS_LOG_FLUSH_INTERVAL", 60),
+        patch("crud.access.logger.error") as log_error,
+    ):
+        await writer.start()
+        async with AccessLoggingCRUD() as logging_crud:
+            await logging_crud.create_many([access_log] * number_of_logs)
+        await writer.stop()
+
+    log_error.assert_not_called()
+    response = await get_async_test_session.exec(
+        select(func.count()).where(AccessLog.resource_id == resource_id)
+    )
+    assert response.one() == number_of_logs
+
+
+@pytest.mark.anyio
+async def test_access_log_writer_counts_logs_in_rollup(
+    register_many_current_users, register_many_resources, get_async_test_session
+):
+    """Test the access log writer adds up the hourly counts batch by batch."""
+    current_user = register_many_current_users[1]
+    resource_id = register_many_resources[0]
+    access_logs = [
+        AccessLogCreate(
+            identity_id=str(current_user.user_id),
+            resource_id=resource_id,
+            action=action,
+            status_code=200,
+        )
+        for action in [Action.read, Action.read, Action.write, Action.read]
+    ]
+    writer = AccessLogWriter()
+
+    with (
+        patch("crud.access.access_log_writer", writer),
+        patch.object(config, "ACCESS_LOG_BATCH_SIZE", 2),
+        patch.object(config, "ACCESS_LOG_FLUSH_INTERVAL", 60),
+    ):
+        await writer.start()
+        async with AccessLoggingCRUD() as logging_crud:
+            await logging_crud.create_many(access_logs)
+        await writer.stop()
+
+    response = await get_async_test_session.exec(
+        select(AccessLog).where(AccessLog.resource_id == resource_id)
+    )
+    written_logs = response.all()
+    response = await get_async_test_session.exec(
+        select(AccessLogRollup).where(AccessLogRollup.resource_id == resource_id)
+    )
+    rollups = response.all()
+    for action in [Action.read, Action.write]:
+        times = [log.time for log in written_logs if log.action == action]
+        counted = [rollup for rollup in rollups if rollup.action == action]
+        assert sum(rollup.count for rollup in counted) == len(times)
+        assert min(rollup.first_time for rollup in counted) == min(times)
+        assert max(rollup.last_time for rollup in counted) == max(times)
+
+
+@pytest.mark.anyio
+async def test_access_log_writer_drains_queue_on_stop(
+    register_many_current_users, register_many_resources, get_async_test_session
+):
+    """Test the access log writer writes the remaining logs, when it stops."""
+    current_user = register_many_current_users[1]
+    writer = AccessLogWriter()
+
+    with (
+        patch("crud.access.access_log_writer", writer),
+        patch.object(config, "ACCESS_LOG_FLUSH_INTERVAL", 60),
+    ):
+        await writer.start()
+        async with AccessLoggingCRUD() as logging_crud:
+            await logging_crud.create(
+                AccessLogCreate(
+                    identity_id=str(current_user.user_id),
+                    resource_id=register_many_resources[0],
+                    action=Action.write,
+                    status_code=200,
+                )
+            )
+        await writer.stop()
+
+    response = await get_async_test_session.exec(
+        select(AccessLog).where(AccessLog.identity_id == current_user.user_id)
+    )
+    assert len(response.all()) == 1
+
+
+@pytest.mark.anyio
+async def test_access_log_writer_drops_logs_when_queue_is_full(
+    register_many_current_users, register_many_resources
+):
+    """Test the access log writer drops logs from a full queue with the drop policy."""
+    current_user = register_many_current_users[1]
+    writer = AccessLogWriter()
+
+    with (
+        patch("crud.access.access_log_writer", writer),
+        patch.object(config, "ACCESS_LOG_QUEUE_SIZE", 2),
+        patch.object(config, "ACCESS_LOG_QUEUE_FULL_POLICY", "drop"),
+        patch.object(config, "ACCESS_LOG_FLUSH_INTERVAL", 60),
+    ):
+        await writer.start()
+        async with AccessLoggingCRUD() as logging_crud:
+            await logging_crud.create_many(
+                [
+                    AccessLogCreate(
+                        identity_id=str(current_user.user_id),
+                        resource_id=resource_id,
+                        action=Action.read,
+                        status_code=200,
+                    )
+                    for resource_id in register_many_resources[:5]
+                ]
+            )
+
+        assert writer.queue.qsize() == 2
+        assert writer.dropped == 3
+        await writer.stop()
+
+
+@pytest.mark.anyio
+async def test_access_log_writer_queues_logs_after_unit_of_work_committed(
+    register_many_current_users, register_many_resources
+):
+    """Test the access logs of a unit of work are queued only after its commit."""
+    current_user = register_many_current_users[1]
+    access_log = AccessLogCreate(
+        identity_id=str(current_user.user_id),
+        resource_id=register_many_resources[0],
+        action=Action.read,
+        status_code=200,
+    )
+    writer = AccessLogWriter()
+
+    with (
+        patch("crud.access.access_log_writer", writer),
+        patch.object(config, "ACCESS_LOG_FLUSH_INTERVAL", 60),
+    ):
+        await writer.start()
+        async with unit_of_work():
+            async with AccessLoggingCRUD() as logging_crud:
+                await logging_crud.create(access_log)
+            assert writer.queue.empty()
+        assert writer.queue.qsize() == 1
+
+        try:
+            async with unit_of_work():
+                async with AccessLoggingCRUD() as logging_crud:
+                    await logging_crud.create(access_log)
+                raise RuntimeError("Failure after logging.")
+        except RuntimeError:
+            pass
+        assert writer.queue.qsize() == 1
+        await writer.stop()
+
+
+async def get_access_log_partitions(session) -> list[str]:
+    """Returns the names of the partitions of the access log table."""
+    response = await session.exec(
+        text(
+            "SELECT child.relname FROM pg_inherits"
+            " JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid"
+            " WHERE pg_inherits.inhparent = 'accesslog'::regclass"
+        )
+    )
+    return sorted(name for (name,) in response.all())
+
+
+@pytest.mark.anyio
+async def test_access_log_partitions_are_created_ahead(get_async_test_session):
+    """Test the monthly partitions of the access logs exist for the next months."""
+    this_month = date.today().replace(day=1)
+
+    with patch.object(config, "ACCESS_LOG_PARTITIONS_AHEAD", 5):
+        await AccessLogPartitions().maintain()
+
+    assert await get_access_log_partitions(get_async_test_session) == [
+        AccessLogPartitions.get_name(add_months(this_month, months))
+        for months in range(6)
+    ]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("policy", ["drop", "detach"])
+async def test_access_log_partitions_remove_expired_months(
+    register_many_current_users,
+    register_many_resources,
+    get_async_test_session,
+    policy,
+):
+    """Test the partitions older than the retention are removed - with their logs at once."""
+    this_month = date.today().replace(day=1)
+    old_month = add_months(this_month, -3)
+    old_partition = AccessLogPartitions.get_name(old_month)
+    await get_async_test_session.exec(
+        text(
+            f"CREATE TABLE {old_partition} PARTITION OF accesslog"
+            f" FOR VALUES FROM ('{old_month}') TO ('{add_months(old_month, 1)}')"
+        )
+    )
+    get_async_test_session.add(
+        AccessLog(
+            identity_id=register_many_current_users[1].user_id,
+            resource_id=register_many_resources[0],
+            action=Action.read,
+            status_code=200,
+            time=datetime.combine(old_month, datetime.min.time()),
+        )
+    )
+    await get_async_test_session.commit()
+
+    with (
+        patch.object(config, "ACCESS_LOG_RETENTION_MONTHS", 2),
+        patch.object(config, "ACCESS_LOG_RETENTION_POLICY", policy),
+    ):
+        await AccessLogPartitions().maintain()
+
+    partitions = await get_access_log_partitions(get_async_test_session)
+    assert old_partition not in partitions
+    assert AccessLogPartitions.get_name(this_month) in partitions
+    response = await get_async_test_session.exec(
+        select(AccessLog).where(AccessLog.time < this_month)
+    )
+    assert response.all() == []
+    response = await get_async_test_session.exec(
+        text(f"SELECT to_regclass('{old_partition}') IS NOT NULL")
+    )
+    archived = response.one()[0]
+    assert archived == (policy == "detach")
+    if archived:
+        await get_async_test_session.exec(text(f"DROP TABLE {old_partition}"))
+        await get_async_test_session.commit()
+
+
+@pytest.mark.anyio
+async def test_read_access_logs_within_time_bounds(
+    register_many_current_users, register_many_resources
+):
+    """Test reading access logs bounded by time."""
+    current_user = register_many_current_users[1]
+    admin = CurrentUserData(**current_user_data_admin)
+    before = datetime.now()
+    async with AccessLoggingCRUD() as logging_crud:
+        await logging_crud.create(
+            AccessLogCreate(
+                identity_id=str(current_user.user_id),
+                resource_id=register_many_resources[0],
+                action=Action.read,
+                status_code=200,
+            )
+        )
+        access_logs = await logging_crud.read(
+            admin,
+            resource_id=register_many_resources[0],
+            identity_id=current_user.user_id,
+            since=before,
+        )
+        assert len(access_logs) == 1
+        with pytest.raises(Exception) as err:
+            await logging_crud.read(
+                admin,
+                resource_id=register_many_resources[0],
+                identity_id=current_user.user_id,
+                until=before,
+            )
+        assert err.value.status_code == 404
+
+
 # TBD: check if the rest is covered through test_access.py!
 
 # endregion AccessLogging CRUD tests
@@ -1252,7 +1629,7 @@ async def test_admin_create_resource_hierarchy(
     assert created_hierarchy.parent_id == uuid.UUID(resources[0])
     assert created_hierarchy.child_id == new_child_id
     assert created_hierarchy.inherit is False
-    assert created_hierarchy.order == 1
+    assert created_hierarchy.order == ORDER_GAP
 
 
 @pytest.mark.anyio
@@ -1277,7 +1654,7 @@ async def test_admin_create_resource_hierarchy_with_inheritance(
     assert created_hierarchy.parent_id == uuid.UUID(resources[0])
     assert created_hierarchy.child_id == new_child_id
     assert created_hierarchy.inherit is True
-    assert created_hierarchy.order == 1
+    assert created_hierarchy.order == ORDER_GAP
 
 
 @pytest.mark.anyio
@@ -2520,3 +2897,267 @@ async def test_user_deletes_identity_hierarchy_child_without_owner_rights(
 
 
 # endregion IdentityHierarchy CRUD tests
+
+
+# region EffectivePermission tests
+
+
+async def add_inheriting_group_and_resource_hierarchy(
+    register_current_user, register_one_identity, register_one_resource
+):
+    """Adds a group with write access to a parent resource; user and child inherit."""
+    current_admin_user = await register_current_user(current_user_data_admin)
+    current_user = await register_current_user(current_user_data_user1)
+    group_id = await register_one_identity(uuid.uuid4(), Group)
+    parent_id = uuid.uuid4()
+    child_id = uuid.uuid4()
+    await register_one_resource(parent_id, ProtectedResource)
+    await register_one_resource(child_id, ProtectedChild)
+
+    async with AccessPolicyCRUD() as policy_crud:
+        await policy_crud.create(
+            AccessPolicyCreate(
+                identity_id=group_id, resource_id=parent_id, action=Action.write
+            ),
+            current_admin_user,
+        )
+    async with IdentityHierarchyCRUD() as hierarchy_crud:
+        await hierarchy_crud.create(
+            current_user=current_admin_user,
+            parent_id=group_id,
+            child_type=IdentityType.user,
+            child_id=current_user.user_id,
+            inherit=True,
+        )
+    async with ResourceHierarchyCRUD() as hierarchy_crud:
+        await hierarchy_crud.create(
+            current_user=current_admin_user,
+            parent_id=parent_id,
+            child_type=ResourceType.protected_child,
+            child_id=child_id,
+            inherit=True,
+        )
+
+    return current_user, group_id, parent_id, child_id
+
+
+async def read_allowed_resource_ids(current_user: CurrentUserData, action: Action):
+    """Returns the ids of all registered resources, the user is allowed to perform the action on."""
+    async with AccessPolicyCRUD() as policy_crud:
+        statement = select(IdentifierTypeLink.id).where(
+            IdentifierTypeLink.type.in_(ResourceType.list())
+        )
+        statement = policy_crud.filters_allowed(
+            statement, action, IdentifierTypeLink, current_user
+        )
+        response = await policy_crud.session.exec(statement)
+        return set(response.all())
+
+
+@pytest.mark.anyio
+async def test_effective_permissions_match_hierarchy_queries(
+    register_current_user, register_one_identity, register_one_resource
+):
+    """Test the effective permissions resolve the same access as the recursive queries."""
+    with patch.object(config, "ACCESS_EFFECTIVE_PERMISSIONS", True):
+        current_user, _, parent_id, child_id = (
+            await add_inheriting_group_and_resource_hierarchy(
+                register_current_user, register_one_identity, register_one_resource
+            )
+        )
+        other_user = await register_current_user(current_user_data_user2)
+        indexed = [
+            await read_allowed_resource_ids(user, action)
+            for user in [current_user, other_user]
+            for action in Action
+        ]
+
+    recursive = [
+        await read_allowed_resource_ids(user, action)
+        for user in [current_user, other_user]
+        for action in Action
+    ]
+
+    assert indexed == [
+        {parent_id, child_id},
+        {parent_id, child_id},
+        set(),
+        set(),
+        set(),
+        set(),
+    ]
+    assert indexed == recursive
+
+
+@pytest.mark.anyio
+async def test_effective_permissions_revoked_on_hierarchy_and_policy_delete(
+    register_current_user, register_one_identity, register_one_resource
+):
+    """Test the effective permissions follow deleted hierarchies and policies."""
+    with patch.object(config, "ACCESS_EFFECTIVE_PERMISSIONS", True):
+        current_user, group_id, parent_id, child_id = (
+            await add_inheriting_group_and_resource_hierarchy(
+                register_current_user, register_one_identity, register_one_resource
+            )
+        )
+        current_admin_user = CurrentUserData(**current_user_data_admin)
+
+        async with ResourceHierarchyCRUD() as hierarchy_crud:
+            await hierarchy_crud.delete(
+                current_user=current_admin_user,
+                parent_id=parent_id,
+                child_id=child_id,
+            )
+        allowed = await read_allowed_resource_ids(current_user, Action.read)
+        assert allowed == {parent_id}
+
+        async with IdentityHierarchyCRUD() as hierarchy_crud:
+            await hierarchy_crud.delete(
+                current_user=current_admin_user,
+                parent_id=group_id,
+                child_id=current_user.user_id,
+            )
+        allowed = await read_allowed_resource_ids(current_user, Action.read)
+        assert allowed == set()
+
+        async with AccessPolicyCRUD() as policy_crud:
+            await policy_crud.delete(
+                current_admin_user,
+                AccessPolicyDelete(identity_id=group_id, resource_id=parent_id),
+            )
+        group = CurrentUserData(user_id=group_id)
+        allowed = await read_allowed_resource_ids(group, Action.read)
+        assert allowed == set()
+
+
+@pytest.mark.anyio
+async def test_rebuild_effective_permissions(
+    register_current_user,
+    register_one_identity,
+    register_one_resource,
+    add_one_test_access_policy,
+):
+    """Test rebuilding the effective permissions from policies and hierarchies."""
+    current_user, _, parent_id, child_id = (
+        await add_inheriting_group_and_resource_hierarchy(
+            register_current_user, register_one_identity, register_one_resource
+        )
+    )
+    await add_one_test_access_policy(
+        {"resource_id": str(parent_id), "action": Action.read, "public": True}
+    )
+    other_user = await register_current_user(current_user_data_user2)
+
+    with patch.object(config, "ACCESS_EFFECTIVE_PERMISSIONS", True):
+        allowed = await read_allowed_resource_ids(current_user, Action.write)
+        assert allowed == set()
+
+        await AccessPolicyCRUD().rebuild_effective_permissions()
+
+        allowed = await read_allowed_resource_ids(current_user, Action.write)
+        assert allowed == {parent_id, child_id}
+        allowed = await read_allowed_resource_ids(other_user, Action.read)
+        assert allowed == {parent_id, child_id}
+        allowed = await read_allowed_resource_ids(other_user, Action.write)
+        assert allowed == set()
+
+
+@pytest.mark.anyio
+async def test_effective_permissions_keep_one_public_row_per_resource(
+    add_one_test_access_policy, get_async_test_session
+):
+    """Test a second public effective permission for the same resource conflicts."""
+    resource_id = uuid.uuid4()
+    await add_one_test_access_policy(
+        {"resource_id": str(resource_id), "action": Action.read, "public": True}
+    )
+    with patch.object(config, "ACCESS_EFFECTIVE_PERMISSIONS", True):
+        await AccessPolicyCRUD().rebuild_effective_permissions()
+
+    response = await get_async_test_session.exec(
+        select(EffectivePermission).where(
+            EffectivePermission.resource_id == resource_id
+        )
+    )
+    assert [permission.identity_id for permission in response.all()] == [None]
+
+    get_async_test_session.add(
+        EffectivePermission(resource_id=resource_id, action=Action.read)
+    )
+    with pytest.raises(IntegrityError):
+        await get_async_test_session.commit()
+    await get_async_test_session.rollback()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("effective_permissions", [False, True])
+async def test_check_access_many_resolves_highest_inherited_action(
+    register_current_user,
+    register_one_identity,
+    register_one_resource,
+    effective_permissions,
+):
+    """Test the bulk access check returns the highest action including inheritance in one query."""
+    with patch.object(config, "ACCESS_EFFECTIVE_PERMISSIONS", effective_permissions):
+        current_user, _, parent_id, child_id = (
+            await add_inheriting_group_and_resource_hierarchy(
+                register_current_user, register_one_identity, register_one_resource
+            )
+        )
+        current_admin_user = CurrentUserData(**current_user_data_admin)
+        public_id = uuid.uuid4()
+        await register_one_resource(public_id, ProtectedResource)
+        async with AccessPolicyCRUD() as policy_crud:
+            await policy_crud.create(
+                AccessPolicyCreate(
+                    identity_id=current_user.user_id,
+                    resource_id=child_id,
+                    action=Action.own,
+                ),
+                current_admin_user,
+            )
+            await policy_crud.create(
+                AccessPolicyCreate(
+                    resource_id=public_id, action=Action.read, public=True
+                ),
+                current_admin_user,
+            )
+        other_user = await register_current_user(current_user_data_user2)
+        unknown_id = uuid.uuid4()
+        resource_ids = [parent_id, child_id, public_id, unknown_id, child_id]
+
+        async with AccessPolicyCRUD() as policy_crud:
+            permissions = await policy_crud.check_access_many(
+                current_user, resource_ids
+            )
+            other_permissions = await policy_crud.check_access_many(
+                other_user, resource_ids
+            )
+            admin_permissions = await policy_crud.check_access_many(
+                current_admin_user, resource_ids
+            )
+            single_permission = await policy_crud.check_access(current_user, child_id)
+
+    assert [permission.resource_id for permission in permissions] == resource_ids
+    assert [permission.action for permission in permissions] == [
+        Action.write,
+        Action.own,
+        Action.read,
+        None,
+        Action.own,
+    ]
+    assert [permission.action for permission in other_permissions] == [
+        None,
+        None,
+        Action.read,
+        None,
+        None,
+    ]
+    assert [permission.action for permission in admin_permissions] == [
+        Action.own
+    ] * len(resource_ids)
+    assert single_permission.resource_id == child_id
+    assert single_permission.action == Action.own
+
+
+# endregion EffectivePermission tests
@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+from core.types import IdentityType, ResourceType, get_all_models, model_registry
+from crud.base import CHILD, PARENT, get_crud_metadata
+from crud.category import CategoryCRUD
+from crud.demo_resource import DemoResourceCRUD
+from models.access import ResourceHierarchy
+from models.category import Category
+from models.demo_resource import DemoResource
+from models.identity import Group
+from models.protected_resource import ProtectedChild
+from models.tag import Tag
+
+
+def test_get_model_looks_up_the_registry():
+    """Test the models are found without walking all SQLModel subclasses."""
+    model_registry.build()
+
+    with patch("core.types.get_all_models", side_effect=get_all_models) as walk:
+        assert ResourceType.get_model("ProtectedChild") is ProtectedChild
+        assert IdentityType.get_model("Group") is Group
+
+    walk.assert_not_called()
+
+
+def test_registry_walks_the_models_once_for_an_unknown_name():
+    """Test a name without a model does not walk all SQLModel subclasses on every lookup."""
+    model_registry.build()
+
+    with patch.object(model_registry, "build", wraps=model_registry.build) as build:
+        for _ in range(3):
+            assert model_registry.get("NoSuchModel") is None
+
+    assert build.call_count == 1
+
+
+def test_crud_metadata_is_shared_by_all_instances():
+    """Test the CRUDs of a model share their type, hierarchy and read plan."""
+    first_crud = DemoResourceCRUD()
+    second_crud = DemoResourceCRUD()
+
+    assert first_crud.metadata is second_crud.metadata
+    assert first_crud.metadata is get_crud_metadata(DemoResource)
+    assert first_crud.entity_type == ResourceType.demo_resource
+    assert first_crud.hierarchy is ResourceHierarchy
+    # the CRUDs hold the session of their context, so they are not shared:
+    assert first_crud.policy_CRUD is not second_crud.policy_CRUD
+
+    read_plan = {
+        relationship.related_model: relationship.directions
+        for relationship in first_crud.metadata.get_read_plan()
+    }
+    assert read_plan[Category] == (CHILD,)
+    assert read_plan[Tag] == (PARENT,)
+    assert get_crud_metadata(Category) is CategoryCRUD().metadata
+
+
+def test_allowed_children_are_sets():
+    """Test the allowed children types of a parent type are looked up in a set."""
+    allowed_children = ResourceHierarchy.get_allowed_children_types(
+        ResourceType.protected_resource
+    )
+
+    assert allowed_children == frozenset(
+        [ResourceType.protected_child, ResourceType.protected_grand_child]
+    )
+    assert "ProtectedChild" in allowed_children
+    assert ResourceHierarchy.get_allowed_children_types("Unknown") == frozenset()
@@ -7,10 +7,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from socketio import ASGIApp
 import asyncio
 
-from core.databases import run_migrations
+from core.cache import close_redis_clients
+from core.databases import UnitOfWorkMiddleware, run_migrations
+from core.http_client import http_client
 from core.config import config
-from core.security import CurrentAccessTokenHasRole, CurrentAccessTokenHasScope
+from core.security import (
+    CurrentAccessTokenHasRole,
+    CurrentAccessTokenHasScope,
+    json_web_key_store,
+)
+from crud.access import AccessPolicyCRUD, access_log_partitions, access_log_writer
+from crud.base import build_crud_registry
 from routers.api.v1.access import router as access_router
+from routers.api.v1.base import NEXT_CURSOR_HEADER
 from routers.api.v1.category import router as category_router
 from routers.api.v1.core import router as core_router
 from routers.api.v1.demo_file import router as demo_file_router
@@ -33,6 +42,7 @@ from routers.socketio.v1.interactive_documentation import (
     interactive_documentation_router,
 )
 from routers.socketio.v1.public_namespace import public_namespace_router
+from routers.ws.v1.broadcast import public_web_socket_hub
 from routers.ws.v1.websockets import router as websocket_router
 
 # print("Current directory:", os.getcwd())
@@ -50,8 +60,28 @@ async def lifespan(app: FastAPI):
     # configure_logging()# TBD: add logging configuration
     # Don't do that: use Sessions instead!
     # await postgres.connect()
-    asyncio.create_task(run_migrations())
+    migrations = asyncio.create_task(run_migrations())
+    # all models are imported through the routers by now:
+    build_crud_registry()
+    if config.ACCESS_EFFECTIVE_PERMISSIONS:
+        # policies or hierarchies might have changed while the index was switched off -
+        # rebuilt only after the migrations finished and by one worker at a time:
+        await migrations
+        await AccessPolicyCRUD().rebuild_effective_permissions()
+    await http_client.start()
+    # the partitions need to exist, before the first access logs get written:
+    await access_log_partitions.start()
+    await access_log_writer.start()
+    await json_web_key_store.start()
+    await public_web_socket_hub.start()
     yield  # this is where the FastAPI runs - when its done, it comes back here and closes down
+    await public_web_socket_hub.stop()
+    await json_web_key_store.stop()
+    # writes the access logs, that are still queued:
+    await access_log_writer.stop()
+    await access_log_partitions.stop()
+    await close_redis_clients()
+    await http_client.stop()
     # await postgres.disconnect()
     logger.info("Application shutdown")
 
@@ -101,6 +131,8 @@ app = FastAPI(
     # TBD: add contact - also through environment variables?
 )
 
+# one database session and transaction per request - Socket.IO events get their own in the namespaces:
+app.add_middleware(UnitOfWorkMiddleware, exclude_path_prefixes=("/socketio/",))
 
 app.add_middleware(
     CORSMiddleware,
@@ -125,6 +157,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["POST", "GET", "PUT", "DELETE"],  # or ["*"],
     allow_headers=["*"],
+    # browsers hide response headers from scripts unless exposed:
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 ### DEPRECTATED: use lifespan instead
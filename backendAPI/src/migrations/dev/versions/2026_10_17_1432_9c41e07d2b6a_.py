@@ -0,0 +1,100 @@
+# fmt: off
+# ruff: noqa
+# isort:skip_file
+"""
+
+Revision ID: 9c41e07d2b6a
+Revises: 45bcdef52753
+Create Date: 2026-10-17 14:32:48.207311+02:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c41e07d2b6a'
+down_revision: Union[str, None] = '45bcdef52753'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# months ahead of the current one, the partitions are created for - the application creates the later ones:
+PARTITIONS_AHEAD = 3
+
+
+def rename_accesslog(new_name: str) -> None:
+    """Moves the access log table out of the way - keeps the id sequence for the new table."""
+    op.rename_table('accesslog', new_name)
+    op.execute(f"ALTER TABLE {new_name} RENAME CONSTRAINT accesslog_pkey TO {new_name}_pkey")
+    for column in ['action', 'identity_id', 'resource_id', 'time']:
+        op.execute(f"ALTER INDEX ix_accesslog_{column} RENAME TO ix_{new_name}_{column}")
+    op.execute("ALTER SEQUENCE accesslog_id_seq OWNED BY NONE")
+
+
+def create_accesslog(primary_key: Sequence[str], **kwargs) -> None:
+    op.create_table('accesslog',
+    sa.Column('identity_id', sa.Uuid(), nullable=True),
+    sa.Column('resource_id', sa.Uuid(), nullable=False),
+    sa.Column('action', postgresql.ENUM('read', 'write', 'own', name='action', create_type=False), nullable=False),
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('accesslog_id_seq'::regclass)"), nullable=False),
+    sa.Column('time', sa.DateTime(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['identity_id'], ['identifiertypelink.id'], ),
+    sa.ForeignKeyConstraint(['resource_id'], ['identifiertypelink.id'], ),
+    sa.PrimaryKeyConstraint(*primary_key),
+    **kwargs
+    )
+    op.execute("ALTER SEQUENCE accesslog_id_seq OWNED BY accesslog.id")
+    # on a partitioned table the indexes are created on every partition:
+    op.create_index(op.f('ix_accesslog_action'), 'accesslog', ['action'], unique=False)
+    op.create_index(op.f('ix_accesslog_identity_id'), 'accesslog', ['identity_id'], unique=False)
+    op.create_index(op.f('ix_accesslog_resource_id'), 'accesslog', ['resource_id'], unique=False)
+    op.create_index(op.f('ix_accesslog_time'), 'accesslog', ['time'], unique=False)
+
+
+def copy_accesslog(old_name: str) -> None:
+    op.execute(
+        f"""
+        INSERT INTO accesslog (identity_id, resource_id, action, id, time, status_code)
+        SELECT identity_id, resource_id, action, id, time, status_code
+        FROM {old_name}
+        """
+    )
+    op.drop_table(old_name)
+
+
+def upgrade() -> None:
+    rename_accesslog('accesslog_unpartitioned')
+    create_accesslog(['id', 'time'], postgresql_partition_by='RANGE (time)')
+    # one partition per month from the oldest access log until the months ahead:
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month date := date_trunc('month', coalesce((SELECT min(time) FROM accesslog_unpartitioned), now()));
+        BEGIN
+            WHILE month <= date_trunc('month', now()) + interval '{PARTITIONS_AHEAD} months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF accesslog FOR VALUES FROM (%L) TO (%L)',
+                    'accesslog_' || to_char(month, 'YYYY_MM'),
+                    month,
+                    month + interval '1 month'
+                );
+                month := month + interval '1 month';
+            END LOOP;
+        END $$;
+        """
+    )
+    copy_accesslog('accesslog_unpartitioned')
+
+
+def downgrade() -> None:
+    rename_accesslog('accesslog_partitioned')
+    create_accesslog(['id'])
+    copy_accesslog('accesslog_partitioned')
+
+# fmt: on
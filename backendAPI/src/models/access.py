@@ -1,6 +1,7 @@
 import uuid
 from datetime import datetime
-from typing import ClassVar, List, Optional
+from functools import lru_cache
+from typing import ClassVar, Dict, FrozenSet, List, Optional
 from pydantic import BaseModel, model_validator  # , create_model
 from sqlalchemy import (
     UniqueConstraint,
@@ -26,8 +27,8 @@ class IdentifierTypeLink(SQLModel, table=True):
     # TBD: is there another way to define the type of the column?
     @model_validator(mode="after")
     def validate_type(self):
-        if (self.type not in IdentityType.list()) and (
-            self.type not in ResourceType.list()
+        if (self.type not in IdentityType.values()) and (
+            self.type not in ResourceType.values()
         ):
             raise ValueError("Invalid type")
         return self
@@ -117,6 +118,24 @@ class AccessPolicy(AccessPolicyCreate, table=True):
     __table_args__ = (UniqueConstraint("identity_id", "resource_id"),)
 
 
+class EffectivePermission(SQLModel, table=True):
+    """Table for the highest action an identity holds on a resource, including inheritance"""
+
+    # Derived from AccessPolicy, ResourceHierarchy and IdentityHierarchy - never written directly.
+    # identity_id is None for permissions, that result from public policies.
+    id: Optional[int] = Field(default=None, primary_key=True)
+    identity_id: Optional[uuid.UUID] = Field(default=None, index=True)
+    resource_id: uuid.UUID = Field(index=True)
+    action: "Action" = Field()
+
+    # one public row per resource as well - NULL identities conflict with each other:
+    __table_args__ = (
+        UniqueConstraint(
+            "identity_id", "resource_id", postgresql_nulls_not_distinct=True
+        ),
+    )
+
+
 class AccessPolicyUpdate(AccessPolicyCreate):
     """Update model for access policies"""
 
@@ -186,9 +205,11 @@ class AccessLogCreate(SQLModel):
 
 
 class AccessLog(AccessLogCreate, table=True):
-    """Table for logging actual access attempts"""
+    """Table for logging actual access attempts - partitioned by month"""
 
-    id: Optional[int] = Field(default=None, primary_key=True)
+    id: Optional[int] = Field(
+        default=None, primary_key=True, sa_column_kwargs={"autoincrement": True}
+    )
     # id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4, primary_key=True)
     # identity_id: Optional[uuid.UUID] = Field(default=None, index=True)
     identity_id: Optional[uuid.UUID] = Field(
@@ -196,9 +217,12 @@ class AccessLog(AccessLogCreate, table=True):
     )
     resource_id: uuid.UUID = Field(foreign_key="identifiertypelink.id", index=True)
     action: "Action" = Field(index=True)
-    time: datetime = Field(default_factory=datetime.now, index=True)
+    # the partition key has to be part of the primary key:
+    time: datetime = Field(default_factory=datetime.now, primary_key=True, index=True)
     status_code: int = Field()
 
+    __table_args__ = {"postgresql_partition_by": "RANGE (time)"}
+
 
 class AccessLogRead(AccessLogCreate):
     """Read model access attempt logs"""
@@ -207,6 +231,35 @@ class AccessLogRead(AccessLogCreate):
     time: datetime
 
 
+class AccessLogRollup(SQLModel, table=True):
+    """Table for the number of access attempts per resource, action, status code and hour"""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    resource_id: uuid.UUID = Field(index=True)
+    action: "Action"
+    status_code: int
+    bucket: datetime
+    count: int
+    first_time: datetime
+    last_time: datetime
+
+    __table_args__ = (
+        UniqueConstraint("resource_id", "action", "status_code", "bucket"),
+    )
+
+
+class AccessLogAggregate(BaseModel):
+    """Read model for the number of access attempts per action, status code and time bucket"""
+
+    resource_id: uuid.UUID
+    action: Action
+    status_code: int
+    bucket: datetime
+    count: int
+    first_time: datetime
+    last_time: datetime
+
+
 # endregion Access
 
 
@@ -219,8 +272,16 @@ class BaseHierarchy:
     relations: ClassVar = {}
 
     @classmethod
-    def get_allowed_children_types(cls, entity_type: str) -> List[str]:
-        return cls.relations.get(entity_type, [])
+    @lru_cache(maxsize=None)
+    def get_allowed_children(cls) -> Dict[str, FrozenSet[str]]:
+        """Returns the allowed children types per parent type as sets - computed once per hierarchy."""
+        return {
+            parent: frozenset(children) for parent, children in cls.relations.items()
+        }
+
+    @classmethod
+    def get_allowed_children_types(cls, entity_type: str) -> FrozenSet[str]:
+        return cls.get_allowed_children().get(entity_type, frozenset())
 
 
 class ResourceHierarchyCreate(SQLModel):
@@ -298,6 +359,18 @@ class ResourceHierarchyRead(ResourceHierarchyCreate):
     pass
 
 
+class ResourceHierarchyTree(BaseModel):
+    """Read model for a resource with its descendants - children ordered by the hierarchy"""
+
+    id: uuid.UUID
+    type: ResourceType
+    # the relation to the parent - None for the root of the tree:
+    order: Optional[int] = None
+    inherit: Optional[bool] = None
+    resource: dict
+    children: List["ResourceHierarchyTree"] = []
+
+
 class IdentityHierarchyCreate(SQLModel):
     """Create model for identity hierarchy"""
 
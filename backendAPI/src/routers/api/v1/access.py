@@ -11,9 +11,10 @@ from core.security import (
     check_token_against_guards,
     get_http_access_token_payload,
 )
-from core.types import Action, IdentityType, ResourceType
+from core.types import Action, IdentityType, ResourceType, TimeBucket
 from crud.access import AccessLoggingCRUD, AccessPolicyCRUD
 from models.access import (
+    AccessLogAggregate,
     AccessLogRead,
     AccessPermission,
     AccessPolicy,
@@ -23,7 +24,7 @@ from models.access import (
     AccessPolicyUpdate,
 )
 
-from .base import BaseView
+from .base import BaseView, accepts_ndjson, stream_ndjson
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -213,11 +214,7 @@ async def get_my_access_for_resources(
     logger.info("GET access level for resource_id")
     current_user = await check_token_against_guards(token_payload, guards)
     async with access_policy_view.crud() as crud:
-        access_permissions = []
-        for resource_id in resource_ids:
-            permission = await crud.check_access(current_user, resource_id)
-            access_permissions.append(permission)
-    return access_permissions
+        return await crud.check_access_many(current_user, resource_ids)
 
 
 # endregion AccessPermissions
@@ -227,21 +224,49 @@ async def get_my_access_for_resources(
 access_log_view = BaseView(AccessLoggingCRUD)
 
 
+async def stream_access_logs(current_user, *filters, **time_bounds):
+    async with access_log_view.crud() as crud:
+        async for chunk in crud.stream(current_user, *filters, **time_bounds):
+            yield chunk
+
+
 @router.get("/logs", status_code=200)
 async def get_access_logs(
     resource_id: Annotated[UUID | None, Query()] = None,
     identity_id: Annotated[UUID | None, Query()] = None,
     action: Annotated[Action | None, Query()] = None,
     status_code: Annotated[int | None, Query()] = None,
+    since: Annotated[datetime | None, Query()] = None,
+    until: Annotated[datetime | None, Query()] = None,
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["Admin"])),
+    stream: bool = Depends(accepts_ndjson),
 ) -> list[AccessLogRead]:
-    """Returns all access logs."""
+    """Returns all access logs - streamed as newline delimited JSON, if the client accepts it."""
     logger.info("GET access logs")
     current_user = await check_token_against_guards(token_payload, guards)
+    if stream:
+        return stream_ndjson(
+            stream_access_logs(
+                current_user,
+                resource_id,
+                identity_id,
+                action,
+                status_code,
+                since=since,
+                until=until,
+            ),
+            AccessLogRead,
+        )
     async with access_log_view.crud() as crud:
         return await crud.read(
-            current_user, resource_id, identity_id, action, status_code=status_code
+            current_user,
+            resource_id,
+            identity_id,
+            action,
+            status_code=status_code,
+            since=since,
+            until=until,
         )
 
 
@@ -310,14 +335,7 @@ async def get_creation_date_for_resources(
     logger.info("GET access log information for resource")
     current_user = await check_token_against_guards(token_payload, guards)
     async with access_log_view.crud() as crud:
-        creation_dates = []
-        for resource_id in resource_ids:
-            creation_date = await crud.read_resource_created_at(
-                current_user,
-                resource_id=resource_id,
-            )
-            creation_dates.append(creation_date)
-    return creation_dates
+        return await crud.read_resources_created_at(current_user, resource_ids)
 
 
 @router.get("/log/{resource_id}/last-accessed", status_code=200)
@@ -346,15 +364,7 @@ async def get_last_accessed_for_resources(
     logger.info("GET access log information for resource")
     current_user = await check_token_against_guards(token_payload, guards)
     async with access_log_view.crud() as crud:
-        last_accessed_dates = []
-        for resource_id in resource_ids:
-            last_accessed = await crud.read_resource_last_accessed_at(
-                current_user,
-                resource_id=resource_id,
-                action=Action.read,
-            )
-            last_accessed_dates.append(last_accessed.time)
-    return last_accessed_dates
+        return await crud.read_resources_last_accessed_at(current_user, resource_ids)
 
 
 @router.get("/log/{resource_id}/count", status_code=200)
@@ -373,6 +383,28 @@ async def get_access_count_for_resource(
         )
 
 
+@router.get("/log/{resource_id}/aggregates", status_code=200)
+async def get_access_aggregates_for_resource(
+    resource_id: UUID,
+    action: Annotated[Action | None, Query()] = None,
+    status_code: Annotated[int | None, Query()] = None,
+    bucket: Annotated[TimeBucket, Query()] = TimeBucket.hour,
+    token_payload=Depends(get_http_access_token_payload),
+    guards: GuardTypes = Depends(Guards(roles=["User"])),
+) -> list[AccessLogAggregate]:
+    """Returns the number of accesses to a resource per action, status code and time bucket."""
+    logger.info("GET access log aggregates for resource")
+    current_user = await check_token_against_guards(token_payload, guards)
+    async with access_log_view.crud() as crud:
+        return await crud.read_aggregates(
+            current_user,
+            resource_id=resource_id,
+            action=action,
+            status_code=status_code,
+            bucket=bucket,
+        )
+
+
 # endregion AccessLogs
 
 ### No - don't implement - leave the hierarchy inside the individual resources
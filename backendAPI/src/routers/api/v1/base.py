@@ -1,15 +1,50 @@
 import logging
+from typing import AsyncIterable, Optional, Type
 
-from fastapi import HTTPException
+from fastapi import HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
+from core.config import config
+from core.databases import unit_of_work
 from core.security import check_token_against_guards  # CurrentAccessToken
 from core.types import GuardTypes
 
 logger = logging.getLogger(__name__)
 
+# clients pass the value as cursor to get the next page - missing on the last page:
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# clients opt in to streamed listings with this media type in the Accept header:
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def accepts_ndjson(request: Request) -> bool:
+    """Dependency, that tells whether the client asked for a streamed listing"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def stream_ndjson(
+    chunks: AsyncIterable[list], read_model: Type[BaseModel]
+) -> StreamingResponse:
+    """Streams the chunks as newline delimited JSON - one object per line, one write per chunk"""
+
+    async def lines():
+        # the unit of work of the request finishes, when the response starts,
+        # so the stream reads in its own connection and transaction:
+        async with unit_of_work():
+            async for chunk in chunks:
+                yield "".join(
+                    read_model.model_validate(
+                        object, from_attributes=True
+                    ).model_dump_json()
+                    + "\n"
+                    for object in chunk
+                )
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
 
 # TBD: implement rate limiting
-# TBD: implement pagination
 # TBD: implement sorting
 # TBD: implement filtering
 # TBD: implement searching
@@ -24,6 +59,28 @@ logger = logging.getLogger(__name__)
 #     groups: Optional[List[UUID]] = []
 
 
+class Pagination:
+    """Query parameters of the list routes - use as dependency: pagination: Pagination = Depends()"""
+
+    def __init__(
+        self,
+        request: Request,
+        response: Response,
+        limit: Optional[int] = Query(None, ge=1, le=config.PAGE_SIZE_MAX),
+        cursor: Optional[str] = Query(None),
+    ):
+        self.response = response
+        self.limit = limit
+        self.cursor = cursor
+        # streams all objects after the cursor instead of one page:
+        self.stream = accepts_ndjson(request)
+
+    def set_next_cursor(self, next_cursor: Optional[str]) -> None:
+        """Passes the cursor of the next page back to the client"""
+        if next_cursor:
+            self.response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
 class BaseView:
     """Base class for all views"""
 
@@ -32,7 +89,6 @@ class BaseView:
 
     # TBD: In a similar manner
     # - implement rate limiting
-    # - implement pagination
     # - implement sorting
     # async def _check_token_against_guards(self, token_payload, guards):
     #     """checks if token fulfills the required guards and returns current user."""
@@ -66,6 +122,23 @@ class BaseView:
             #     created_object = await crud.create(object, current_user)
         return created_object
 
+    async def post_many(
+        self,
+        objects,
+        token_payload,
+        guards,
+        parent_id=None,
+        inherit=False,
+        public_action=None,
+    ):
+        logger.info("POST view calls create_many CRUD")
+        current_user = await check_token_against_guards(token_payload, guards)
+        async with self.crud() as crud:
+            created_objects = await crud.create_many(
+                objects, current_user, parent_id, inherit, public_action
+            )
+        return created_objects
+
     async def post_with_public_access(
         self,
         object,
@@ -99,6 +172,24 @@ class BaseView:
             )
         return created_hierarchy
 
+    async def post_add_children_to_parent(
+        self,
+        child_ids,
+        parent_id,
+        token_payload=None,
+        guards=None,
+        inherit=False,
+    ):
+        logger.info(
+            "POST view to add children to parent calls add_children_to_parent CRUD"
+        )
+        current_user = await check_token_against_guards(token_payload, guards)
+        async with self.crud() as crud:
+            created_hierarchies = await crud.add_children_to_parent(
+                child_ids, parent_id, current_user, inherit
+            )
+        return created_hierarchies
+
     async def post_reorder_children(
         self,
         parent_id,
@@ -143,16 +234,34 @@ class BaseView:
         # get operation does not need a token_payload, if the resource is public
         token_payload=None,
         guards=None,
+        pagination: Optional[Pagination] = None,
     ):
         logger.info("GET view to retrieve all objects from read CRUD")
         current_user = None
         if token_payload:
             current_user = await check_token_against_guards(token_payload, guards)
+        if pagination is not None and pagination.stream:
+            self.crud().check_cursor(pagination.cursor)
+            return stream_ndjson(
+                self._read_chunks(current_user, pagination.cursor),
+                self.crud.get_read_model(),
+            )
         async with self.crud() as crud:
-            objects = await crud.read(current_user)
+            if pagination is None:
+                objects = await crud.read(current_user)
+            else:
+                objects, next_cursor = await crud.read_page(
+                    current_user, pagination.limit, pagination.cursor
+                )
+                pagination.set_next_cursor(next_cursor)
 
         return objects
 
+    async def _read_chunks(self, current_user, cursor):
+        async with self.crud() as crud:
+            async for chunk in crud.read_chunks(current_user, cursor):
+                yield chunk
+
     async def get_by_id(
         self,
         id,
@@ -167,6 +276,21 @@ class BaseView:
             object = await crud.read_by_id(id, current_user)
         return object
 
+    async def get_tree(
+        self,
+        id,
+        depth,
+        token_payload=None,
+        guards=None,
+    ):
+        logger.info("GET tree view to retrieve an object with its descendants")
+        current_user = None
+        if token_payload:
+            current_user = await check_token_against_guards(token_payload, guards)
+        async with self.crud() as crud:
+            tree = await crud.read_tree(id, current_user, depth)
+        return tree
+
     async def get_file_by_id(
         self,
         id,
@@ -2,14 +2,16 @@ import logging
 from uuid import UUID
 
 # from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 
+from core.config import config
 from core.security import Guards, get_http_access_token_payload
 from core.types import GuardTypes
 from crud.category import CategoryCRUD
+from models.access import ResourceHierarchyTree
 from models.category import Category, CategoryCreate, CategoryRead, CategoryUpdate
 
-from .base import BaseView
+from .base import BaseView, Pagination
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -44,6 +46,16 @@ async def post_category(
     )
 
 
+@router.post("/bulk", status_code=201)
+async def post_categories(
+    categories: list[CategoryCreate],
+    token_payload=Depends(get_http_access_token_payload),
+    guards: GuardTypes = Depends(Guards(scopes=["api.write"], roles=["User"])),
+) -> list[Category]:
+    """Creates many new categories at once."""
+    return await category_view.post_many(categories, token_payload, guards)
+
+
 # # TBD delete version before refactoring:
 # @router.get("/", status_code=200)
 # async def get_all_categories() -> List[Category]:
@@ -71,11 +83,13 @@ async def post_category(
 async def get_categories(
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["User"])),
+    pagination: Pagination = Depends(),
 ) -> list[CategoryRead]:
     """Returns all category."""
     return await category_view.get(
         token_payload,
         guards,
+        pagination=pagination,
         # roles=["User"],
     )
 
@@ -90,6 +104,17 @@ async def get_category_by_id(
     return await category_view.get_by_id(category_id, token_payload, guards)
 
 
+@router.get("/{category_id}/tree", status_code=200)
+async def get_category_tree(
+    category_id: UUID,
+    depth: int = Query(1, ge=1, le=config.RESOURCE_TREE_MAX_DEPTH),
+    token_payload=Depends(get_http_access_token_payload),
+    guards: GuardTypes = Depends(Guards(roles=["User"])),
+) -> ResourceHierarchyTree:
+    """Returns a category with its resources down to depth levels."""
+    return await category_view.get_tree(category_id, depth, token_payload, guards)
+
+
 # # TBD delete version before refactoring:
 # @router.put("/{category_id}")
 # async def update_category(
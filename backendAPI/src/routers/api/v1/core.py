@@ -1,8 +1,7 @@
+import asyncio
 import logging
 from typing import Annotated
 
-import httpx
-
 # from core.security import get_token_from_header
 from fastapi import APIRouter, Header
 
@@ -11,6 +10,7 @@ from fastapi import APIRouter, Header
 from msal import ConfidentialClientApplication
 
 from core.config import config
+from core.http_client import http_client
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -58,10 +58,10 @@ confClientApp = ConfidentialClientApplication(
 
 # TBD: refactor to use dependency injection
 # might require a working on-behalf-of workflow?
-def get_users_groups_ms_graph(access_token: str):
+async def get_users_groups_ms_graph(access_token: str):
     """Dummy function to try if access token works from backend: getting transistiveMemberOf"""
     # response = httpx.get("https://graph.microsoft.com/v1.0/me/transitiveMemberOf", headers = {"Authorization": f"Bearer {access_token}"})
-    response = httpx.get(
+    response = await http_client.get_client().get(
         "https://graph.microsoft.com/v1.0/me/transitiveMemberOf",
         headers={"Authorization": f"Bearer {access_token}"},
     )
@@ -72,10 +72,10 @@ def get_users_groups_ms_graph(access_token: str):
     return groups
 
 
-def get_me_ms_graph(access_token: str):
+async def get_me_ms_graph(access_token: str):
     """Dummy function to try if access token works from backend"""
     # response = httpx.get("https://graph.microsoft.com/v1.0/me/transitiveMemberOf", headers = {"Authorization": f"Bearer {access_token}"})
-    response = httpx.get(
+    response = await http_client.get_client().get(
         "https://graph.microsoft.com/v1.0/me",
         headers={"Authorization": f"Bearer {access_token}"},
     )
@@ -153,7 +153,9 @@ async def get_onbehalfof(authorization: Annotated[str | None, Header()] = None):
     # token = get_token_from_header(authorization)
     logger.info("🔑 Acquiring token on behalf of")
     print("=== getting token on behalf of ===")
-    result = confClientApp.acquire_token_on_behalf_of(
+    # MSAL is synchronous - keeps the event loop free while it talks to Azure:
+    result = await asyncio.to_thread(
+        confClientApp.acquire_token_on_behalf_of,
         token,
         scopes=["User.Read"],
         # scopes=[".default"],
@@ -169,7 +171,7 @@ async def get_onbehalfof(authorization: Annotated[str | None, Header()] = None):
             on_behalf_of_token = result["access_token"]
             # Seems to work:
             # response = get_users_groups_ms_graph(on_behalf_of_token)
-            response = get_me_ms_graph(on_behalf_of_token)
+            response = await get_me_ms_graph(on_behalf_of_token)
             logger.info("On behalf of access to Microsoft Graph")
             return {"body": response}
     except Exception as err:
@@ -4,6 +4,7 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, Query
 
+from core.config import config
 from core.security import (
     Guards,
     check_token_against_guards,
@@ -13,6 +14,7 @@ from core.security import (
 from core.types import GuardTypes
 from crud.demo_resource import DemoResourceCRUD
 from crud.tag import TagCRUD
+from models.access import ResourceHierarchyTree
 from models.demo_resource import (
     DemoResource,
     DemoResourceCreate,
@@ -20,7 +22,7 @@ from models.demo_resource import (
     DemoResourceUpdate,
 )
 
-from .base import BaseView
+from .base import BaseView, Pagination
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -40,6 +42,16 @@ async def post_demo_resource(
     return await demo_resource_view.post(demo_resource, token_payload, guards)
 
 
+@router.post("/bulk", status_code=201)
+async def post_demo_resources(
+    demo_resources: list[DemoResourceCreate],
+    token_payload=Depends(get_http_access_token_payload),
+    guards: GuardTypes = Depends(Guards(scopes=["api.write"], roles=["User"])),
+) -> list[DemoResourceRead]:
+    """Creates many new demo resources at once."""
+    return await demo_resource_view.post_many(demo_resources, token_payload, guards)
+
+
 # The get functions are totally public
 # TBD: still a policy is needed for the fine grained access control to make the resource public!
 # The default create only grants "own" access to the user, how creates it!
@@ -47,9 +59,10 @@ async def post_demo_resource(
 async def get_all_demo_resources(
     # token_payload=Depends(get_http_access_token_payload),
     token_payload=Depends(optional_get_http_access_token_payload),
+    pagination: Pagination = Depends(),
 ) -> list[DemoResourceRead]:
     """Returns all demo resources resources."""
-    return await demo_resource_view.get(token_payload)
+    return await demo_resource_view.get(token_payload, pagination=pagination)
 
 
 @router.get("/{demo_resource_id}", status_code=200)
@@ -64,6 +77,16 @@ async def get_demo_resource_by_id(
     return await demo_resource_view.get_by_id(demo_resource_id, token_payload)
 
 
+@router.get("/{demo_resource_id}/tree", status_code=200)
+async def get_demo_resource_tree(
+    demo_resource_id: UUID,
+    depth: int = Query(1, ge=1, le=config.RESOURCE_TREE_MAX_DEPTH),
+    token_payload=Depends(optional_get_http_access_token_payload),
+) -> ResourceHierarchyTree:
+    """Returns a demo resource with its tags and files down to depth levels."""
+    return await demo_resource_view.get_tree(demo_resource_id, depth, token_payload)
+
+
 @router.put("/{demo_resource_id}", status_code=200)
 async def put_demo_resource(
     demo_resource_id: UUID,
@@ -38,7 +38,7 @@ from models.identity import (
     UserUpdate,
 )
 
-from .base import BaseView
+from .base import BaseView, Pagination
 
 logger = logging.getLogger(__name__)
 
@@ -124,9 +124,10 @@ async def get_me(
 async def get_all_users(
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["Admin"])),
+    pagination: Pagination = Depends(),
 ) -> list[UserRead]:
     """Returns all users."""
-    return await user_view.get(token_payload, guards)
+    return await user_view.get(token_payload, guards, pagination)
 
 
 @user_router.get("/azure/{azure_user_id}", status_code=200)
@@ -251,17 +252,13 @@ async def post_existing_users_to_uebergroup(
 ) -> list[BaseHierarchyModelRead]:
     """Adds bulk of users to an ueber_group."""
     logger.info("POST users to ueber_group")
-    hierarchy_response = []
-    for user_id in user_ids:
-        response = await user_view.post_add_child_to_parent(
-            user_id,
-            ueber_group_id,
-            token_payload,
-            guards,
-            inherit,
-        )
-        hierarchy_response.append(response)
-    return hierarchy_response
+    return await user_view.post_add_children_to_parent(
+        user_ids,
+        ueber_group_id,
+        token_payload,
+        guards,
+        inherit,
+    )
 
 
 @ueber_group_router.post("/{ueber_group_id}/group", status_code=201)
@@ -289,26 +286,23 @@ async def post_existing_groups_to_uebergroup(
 ) -> list[BaseHierarchyModelRead]:
     """Adds bulk of groups to an ueber_group."""
     logger.info("POST groups to ueber_group")
-    hierarchy_response = []
-    for group_id in group_ids:
-        response = await group_view.post_add_child_to_parent(
-            group_id,
-            ueber_group_id,
-            token_payload,
-            guards,
-            inherit,
-        )
-        hierarchy_response.append(response)
-    return hierarchy_response
+    return await group_view.post_add_children_to_parent(
+        group_ids,
+        ueber_group_id,
+        token_payload,
+        guards,
+        inherit,
+    )
 
 
 @ueber_group_router.get("/", status_code=200)
 async def get_all_ueber_groups(
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["Admin"])),
+    pagination: Pagination = Depends(),
 ) -> list[UeberGroupRead]:
     """Returns all ueber_groups."""
-    return await ueber_group_view.get(token_payload, guards)
+    return await ueber_group_view.get(token_payload, guards, pagination)
 
 
 @ueber_group_router.get("/{ueber_group_id}", status_code=200)
@@ -440,17 +434,13 @@ async def post_existing_users_to_group(
 ) -> list[BaseHierarchyModelRead]:
     """Adds bulk of existing users to a group."""
     logger.info("POST users to group")
-    hierarchy_response = []
-    for user_id in user_ids:
-        response = await user_view.post_add_child_to_parent(
-            user_id,
-            group_id,
-            token_payload,
-            guards,
-            inherit,
-        )
-        hierarchy_response.append(response)
-    return hierarchy_response
+    return await user_view.post_add_children_to_parent(
+        user_ids,
+        group_id,
+        token_payload,
+        guards,
+        inherit,
+    )
 
 
 @group_router.post("/{group_id}/subgroup", status_code=201)
@@ -478,26 +468,23 @@ async def post_existing_subgroups_to_group(
 ) -> list[BaseHierarchyModelRead]:
     """Adds bulk of existing sub-groups by their id to a group."""
     logger.info("POST sub-groups to group")
-    hierarchy_response = []
-    for sub_group_id in sub_group_ids:
-        response = await sub_group_view.post_add_child_to_parent(
-            sub_group_id,
-            group_id,
-            token_payload,
-            guards,
-            inherit,
-        )
-        hierarchy_response.append(response)
-    return hierarchy_response
+    return await sub_group_view.post_add_children_to_parent(
+        sub_group_ids,
+        group_id,
+        token_payload,
+        guards,
+        inherit,
+    )
 
 
 @group_router.get("/", status_code=200)
 async def get_all_groups(
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["Admin"])),
+    pagination: Pagination = Depends(),
 ) -> list[GroupRead]:
     """Returns all groups."""
-    return await group_view.get(token_payload, guards)
+    return await group_view.get(token_payload, guards, pagination)
 
 
 @group_router.get("/{group_id}", status_code=200)
@@ -648,17 +635,13 @@ async def post_existing_users_to_subgroup(
 ) -> list[BaseHierarchyModelRead]:
     """Adds bulk of users to a sub_group."""
     logger.info("POST users to sub_group")
-    hierarchy_response = []
-    for user_id in user_ids:
-        response = await user_view.post_add_child_to_parent(
-            user_id,
-            sub_group_id,
-            token_payload,
-            guards,
-            inherit,
-        )
-        hierarchy_response.append(response)
-    return hierarchy_response
+    return await user_view.post_add_children_to_parent(
+        user_ids,
+        sub_group_id,
+        token_payload,
+        guards,
+        inherit,
+    )
 
 
 @sub_group_router.post("/{sub_group_id}/subsubgroup", status_code=201)
@@ -686,26 +669,23 @@ async def post_existing_subsubgroups_to_subgroup(
 ) -> list[BaseHierarchyModelRead]:
     """Adds bulk of sub-sub-groups to a sub-group."""
     logger.info("POST sub-sub-groups to sub-group")
-    hierarchy_response = []
-    for sub_sub_group_id in sub_sub_group_ids:
-        response = await sub_sub_group_view.post_add_child_to_parent(
-            sub_sub_group_id,
-            sub_group_id,
-            token_payload,
-            guards,
-            inherit,
-        )
-        hierarchy_response.append(response)
-    return hierarchy_response
+    return await sub_sub_group_view.post_add_children_to_parent(
+        sub_sub_group_ids,
+        sub_group_id,
+        token_payload,
+        guards,
+        inherit,
+    )
 
 
 @sub_group_router.get("/", status_code=200)
 async def get_all_sub_groups(
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["Admin"])),
+    pagination: Pagination = Depends(),
 ) -> list[SubGroupRead]:
     """Returns all sub_groups."""
-    return await sub_group_view.get(token_payload, guards)
+    return await sub_group_view.get(token_payload, guards, pagination)
 
 
 @sub_group_router.get("/{sub_group_id}", status_code=200)
@@ -858,26 +838,23 @@ async def post_existing_users_to_subsubgroup(
 ) -> list[BaseHierarchyModelRead]:
     """Adds bulk of users to a sub_sub_group."""
     logger.info("POST users to sub_sub_group")
-    hierarchy_response = []
-    for user_id in user_ids:
-        response = await user_view.post_add_child_to_parent(
-            user_id,
-            sub_sub_group_id,
-            token_payload,
-            guards,
-            inherit,
-        )
-        hierarchy_response.append(response)
-    return hierarchy_response
+    return await user_view.post_add_children_to_parent(
+        user_ids,
+        sub_sub_group_id,
+        token_payload,
+        guards,
+        inherit,
+    )
 
 
 @sub_sub_group_router.get("/", status_code=200)
 async def get_all_sub_sub_groups(
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["Admin"])),
+    pagination: Pagination = Depends(),
 ) -> list[SubGroupRead]:
     """Returns all sub_sub_groups."""
-    return await sub_sub_group_view.get(token_payload, guards)
+    return await sub_sub_group_view.get(token_payload, guards, pagination)
 
 
 @sub_sub_group_router.get("/{sub_sub_group_id}", status_code=200)
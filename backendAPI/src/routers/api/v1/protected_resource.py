@@ -4,6 +4,7 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, Query
 
+from core.config import config
 from core.security import Guards, get_http_access_token_payload
 from core.types import GuardTypes
 from crud.protected_resource import (
@@ -11,7 +12,7 @@ from crud.protected_resource import (
     ProtectedGrandChildCRUD,
     ProtectedResourceCRUD,
 )
-from models.access import ResourceHierarchyRead
+from models.access import ResourceHierarchyRead, ResourceHierarchyTree
 from models.protected_resource import (
     ProtectedChild,
     ProtectedChildCreate,
@@ -27,7 +28,7 @@ from models.protected_resource import (
     ProtectedResourceUpdate,
 )
 
-from .base import BaseView
+from .base import BaseView, Pagination
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -53,13 +54,26 @@ async def post_protected_resource(
     return await protected_resource_view.post(protected_resource, token_payload, guards)
 
 
+@router.post("/resource/bulk", status_code=201)
+async def post_protected_resources(
+    protected_resources: list[ProtectedResourceCreate],
+    token_payload=Depends(get_http_access_token_payload),
+    guards: GuardTypes = Depends(Guards(scopes=["api.write"], roles=["User"])),
+) -> list[ProtectedResource]:
+    """Creates many new protected resources at once."""
+    return await protected_resource_view.post_many(
+        protected_resources, token_payload, guards
+    )
+
+
 @router.get("/resource/", status_code=200)
 async def get_protected_resources(
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["User"])),
+    pagination: Pagination = Depends(),
 ) -> list[ProtectedResourceRead]:
     """Returns all protected resources."""
-    return await protected_resource_view.get(token_payload, guards)
+    return await protected_resource_view.get(token_payload, guards, pagination)
 
 
 @router.get("/resource/{resource_id}", status_code=200)
@@ -72,6 +86,19 @@ async def get_protected_resource_by_id(
     return await protected_resource_view.get_by_id(resource_id, token_payload, guards)
 
 
+@router.get("/resource/{resource_id}/tree", status_code=200)
+async def get_protected_resource_tree(
+    resource_id: UUID,
+    depth: int = Query(1, ge=1, le=config.RESOURCE_TREE_MAX_DEPTH),
+    token_payload=Depends(get_http_access_token_payload),
+    guards: GuardTypes = Depends(Guards(roles=["User"])),
+) -> ResourceHierarchyTree:
+    """Returns a protected resource with its descendants down to depth levels."""
+    return await protected_resource_view.get_tree(
+        resource_id, depth, token_payload, guards
+    )
+
+
 @router.put("/resource/{resource_id}", status_code=200)
 async def put_protected_resource(
     resource_id: UUID,
@@ -170,9 +197,10 @@ async def post_add_child_to_parent(
 async def get_protected_child(
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["User"])),
+    pagination: Pagination = Depends(),
 ) -> list[ProtectedChildRead]:
     """Returns all protected child resources."""
-    return await protected_child_view.get(token_payload, guards)
+    return await protected_child_view.get(token_payload, guards, pagination)
 
 
 @router.get("/child/{resource_id}", status_code=200)
@@ -185,6 +213,19 @@ async def get_protected_child_by_id(
     return await protected_child_view.get_by_id(resource_id, token_payload, guards)
 
 
+@router.get("/child/{resource_id}/tree", status_code=200)
+async def get_protected_child_tree(
+    resource_id: UUID,
+    depth: int = Query(1, ge=1, le=config.RESOURCE_TREE_MAX_DEPTH),
+    token_payload=Depends(get_http_access_token_payload),
+    guards: GuardTypes = Depends(Guards(roles=["User"])),
+) -> ResourceHierarchyTree:
+    """Returns a protected child resource with its grandchildren."""
+    return await protected_child_view.get_tree(
+        resource_id, depth, token_payload, guards
+    )
+
+
 @router.put("/child/{resource_id}", status_code=200)
 async def put_protected_child(
     resource_id: UUID,
@@ -248,9 +289,10 @@ async def post_protected_grandchild(
 async def get_protected_grandchild(
     token_payload=Depends(get_http_access_token_payload),
     guards: GuardTypes = Depends(Guards(roles=["User"])),
+    pagination: Pagination = Depends(),
 ) -> list[ProtectedGrandChildRead]:
     """Returns all protected grandchild resources."""
-    return await protected_grand_child_view.get(token_payload, guards)
+    return await protected_grand_child_view.get(token_payload, guards, pagination)
 
 
 @router.get("/grandchild/{resource_id}", status_code=200)
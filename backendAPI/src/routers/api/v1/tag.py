@@ -4,11 +4,11 @@ from uuid import UUID
 from fastapi import APIRouter, Depends
 
 from core.security import Guards, get_http_access_token_payload
-from core.types import GuardTypes
+from core.types import Action, GuardTypes
 from crud.tag import TagCRUD
 from models.tag import Tag, TagCreate, TagRead, TagUpdate
 
-from .base import BaseView
+from .base import BaseView, Pagination
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -43,6 +43,18 @@ async def post_tag(
     )
 
 
+@router.post("/bulk", status_code=201)
+async def post_tags(
+    tags: list[TagCreate],
+    token_payload=Depends(get_http_access_token_payload),
+    guards: GuardTypes = Depends(Guards(scopes=["api.write"], roles=["User"])),
+) -> list[Tag]:
+    """Creates many new tags at once."""
+    return await tag_view.post_many(
+        tags, token_payload, guards, public_action=Action.read
+    )
+
+
 # # TBD delete version before refactoring:
 # @router.get("/", status_code=200)
 # async def get_all_tags() -> list[Tag]:
@@ -67,9 +79,11 @@ async def post_tag(
 
 
 @router.get("/", status_code=200)
-async def get_tags() -> list[TagRead]:
+async def get_tags(
+    pagination: Pagination = Depends(),
+) -> list[TagRead]:
     """Returns all tags."""
-    return await tag_view.get()
+    return await tag_view.get(pagination=pagination)
 
 
 @router.get("/{tag_id}", status_code=200)
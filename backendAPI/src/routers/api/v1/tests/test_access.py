@@ -1,12 +1,16 @@
 import uuid
 from datetime import datetime, timedelta
+from unittest.mock import patch
+
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
 
+from core.config import config
 from core.types import Action, CurrentUserData, IdentityType, ResourceType
 from crud.access import AccessPolicyCRUD
 from models.access import (
+    AccessLogAggregate,
     AccessLogCreate,
     AccessLogRead,
     AccessPermission,
@@ -16,6 +20,7 @@ from models.access import (
 from models.demo_resource import DemoResource
 from models.identity import AzureGroup, User
 from models.protected_resource import ProtectedResource
+from routers.api.v1.base import NDJSON_MEDIA_TYPE
 from tests.utils import (
     azure_group_id1,
     azure_group_id2,
@@ -2719,6 +2724,37 @@ async def test_admin_gets_created_access_all_logs(
         assert returned.time == expected.time
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_admin_read],
+    indirect=True,
+)
+async def test_admin_streams_access_logs_as_ndjson(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+    add_many_test_access_logs,
+):
+    """Tests GET access logs streamed as newline delimited JSON in chunks."""
+    app_override_provide_http_token_payload
+
+    database_logs = add_many_test_access_logs
+
+    with patch.object(config, "STREAM_CHUNK_SIZE", 2):
+        response = await async_client.get(
+            "/api/v1/access/logs", headers={"Accept": NDJSON_MEDIA_TYPE}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    streamed = [
+        AccessLogRead.model_validate_json(line) for line in response.text.splitlines()
+    ]
+    # the sign up of the user adds to the test logs:
+    assert {log.id for log in database_logs} <= {log.id for log in streamed}
+    assert streamed == sorted(streamed, key=lambda log: (log.time, log.id))
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "mocked_provide_http_token_payload",
@@ -3144,9 +3180,9 @@ async def test_user_get_logs_for_identity(
     payload = response.json()
 
     assert response.status_code == 200
-    assert len(payload) == 9
+    assert len(payload) == 8
 
-    # Note: the first two logs are created through user self-sign up and user reading itself
+    # Note: the first log is created through user self-sign up - the request itself finds the signed up user in the cache
     for returned, expected in zip(payload[1:], access_logs):
         returned = AccessLogRead(**returned)
         expected = AccessLogCreate(**expected)
@@ -3254,7 +3290,8 @@ async def test_user_get_logs_for_identity_with_write_and_read_permission_only(
     payload = response.json()
 
     assert response.status_code == 200
-    assert len(payload) == 2
+    # only the self-sign up - the request finds the signed up user in the cache:
+    assert len(payload) == 1
 
     for returned in payload:
         returned = AccessLogRead(**returned)
@@ -3973,6 +4010,89 @@ async def test_get_access_count_for_resource(
     assert int(payload) == 5
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_admin_read, token_user1_read, token_user2_read],
+    indirect=True,
+)
+async def test_get_access_aggregates_for_resource(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+    add_many_test_access_logs,
+    current_user_from_azure_token,
+    mocked_provide_http_token_payload,
+    add_one_test_access_policy,
+):
+    """Tests GET access log counts per action, status code and day."""
+    app_override_provide_http_token_payload
+
+    current_user = await current_user_from_azure_token(
+        mocked_provide_http_token_payload
+    )
+    policy = {
+        "resource_id": resource_id2,
+        "identity_id": str(current_user.user_id),
+        "action": Action.read,
+    }
+    await add_one_test_access_policy(policy)
+
+    database_logs = [
+        log for log in add_many_test_access_logs if str(log.resource_id) == resource_id2
+    ]
+
+    response = await async_client.get(
+        f"/api/v1/access/log/{resource_id2}/aggregates?bucket=day"
+    )
+    payload = response.json()
+
+    assert response.status_code == 200
+    aggregates = [AccessLogAggregate(**aggregate) for aggregate in payload]
+    expected = {}
+    for log in database_logs:
+        day = log.time.replace(hour=0, minute=0, second=0, microsecond=0)
+        key = (log.action, log.status_code, day)
+        expected[key] = expected.get(key, []) + [log.time]
+    assert len(aggregates) == len(expected)
+    for aggregate in aggregates:
+        times = expected[(aggregate.action, aggregate.status_code, aggregate.bucket)]
+        assert aggregate.count == len(times)
+        assert aggregate.first_time == min(times)
+        assert aggregate.last_time == max(times)
+    assert sum(aggregate.count for aggregate in aggregates) == 5
+
+    response = await async_client.get(
+        f"/api/v1/access/log/{resource_id2}/aggregates?action=own"
+    )
+    payload = response.json()
+
+    assert response.status_code == 200
+    assert all(aggregate["action"] == Action.own for aggregate in payload)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read, token_user2_read],
+    indirect=True,
+)
+async def test_get_access_aggregates_for_resource_without_access_fails(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+    add_many_test_access_logs,
+):
+    """Tests GET access log counts without access to the resource."""
+    app_override_provide_http_token_payload
+
+    add_many_test_access_logs
+
+    response = await async_client.get(f"/api/v1/access/log/{resource_id2}/aggregates")
+    payload = response.json()
+
+    assert response.status_code == 404
+    assert payload == {"detail": "Access logs not found."}
+
+
 # endregion: ## GET tests
 
 # endregion: ## AccessLog tests
@@ -1,10 +1,14 @@
+import json
 import uuid
+from unittest.mock import patch
 
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
 
+from core.config import config
 from models.category import Category
+from routers.api.v1.base import NDJSON_MEDIA_TYPE, NEXT_CURSOR_HEADER
 from tests.utils import (
     token_admin,
     token_admin_read_write,
@@ -40,6 +44,41 @@ async def test_post_category(
     assert "id" in content
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_admin_read_write, token_user1_read_write],
+    indirect=True,
+)
+async def test_post_categories_in_bulk(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+):
+    """Tests bulk POST of categories - all or none of them."""
+
+    app_override_provide_http_token_payload
+
+    categories = [
+        {"name": f"Cat {number}", "description": "Imported"} for number in range(3)
+    ]
+    response = await async_client.post(
+        "/api/v1/category/bulk",
+        json=categories + [{"name": "Test Category Name That Is Too Long"}],
+    )
+    assert response.status_code == 422
+
+    response = await async_client.post("/api/v1/category/bulk", json=categories)
+
+    assert response.status_code == 201
+    content = response.json()
+    assert [category["name"] for category in content] == [
+        category["name"] for category in categories
+    ]
+
+    all_response = await async_client.get("/api/v1/category/")
+    assert len(all_response.json()) == len(categories)
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "mocked_provide_http_token_payload",
@@ -105,6 +144,93 @@ async def test_get_all_categories(
     # assert 0
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read_write],
+    indirect=True,
+)
+async def test_get_categories_page_by_page(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+):
+    """Tests GET categories in pages following the cursor."""
+
+    app_override_provide_http_token_payload
+    categories = [{"name": f"Category {number}"} for number in range(7)]
+    response = await async_client.post("/api/v1/category/bulk", json=categories)
+    assert response.status_code == 201
+    created_ids = sorted(category["id"] for category in response.json())
+
+    pages = []
+    params = {"limit": 3}
+    while True:
+        response = await async_client.get("/api/v1/category/", params=params)
+        assert response.status_code == 200
+        pages.append([category["id"] for category in response.json()])
+        next_cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not next_cursor:
+            break
+        params = {"limit": 3, "cursor": next_cursor}
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [id for page in pages for id in page] == created_ids
+
+    response = await async_client.get("/api/v1/category/", params={"cursor": "x"})
+    assert response.status_code == 400
+
+    response = await async_client.get(
+        "/api/v1/category/", params={"limit": config.PAGE_SIZE_MAX + 1}
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read_write],
+    indirect=True,
+)
+async def test_get_categories_streamed_as_ndjson(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+):
+    """Tests GET categories streamed as newline delimited JSON, resuming after a cursor."""
+
+    app_override_provide_http_token_payload
+    categories = [{"name": f"Category {number}"} for number in range(5)]
+    response = await async_client.post("/api/v1/category/bulk", json=categories)
+    assert response.status_code == 201
+    created_ids = sorted(category["id"] for category in response.json())
+
+    with patch.object(config, "STREAM_CHUNK_SIZE", 2):
+        response = await async_client.get(
+            "/api/v1/category/", headers={"Accept": NDJSON_MEDIA_TYPE}
+        )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    streamed = [json.loads(line) for line in response.text.splitlines()]
+    assert [category["id"] for category in streamed] == created_ids
+    assert all(category["name"].startswith("Category") for category in streamed)
+
+    response = await async_client.get("/api/v1/category/", params={"limit": 2})
+    response = await async_client.get(
+        "/api/v1/category/",
+        params={"cursor": response.headers[NEXT_CURSOR_HEADER]},
+        headers={"Accept": NDJSON_MEDIA_TYPE},
+    )
+    streamed = [json.loads(line) for line in response.text.splitlines()]
+    assert [category["id"] for category in streamed] == created_ids[2:]
+
+    response = await async_client.get(
+        "/api/v1/category/",
+        params={"cursor": "x"},
+        headers={"Accept": NDJSON_MEDIA_TYPE},
+    )
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor."}
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "mocked_provide_http_token_payload",
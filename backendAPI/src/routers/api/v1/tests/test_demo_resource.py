@@ -65,6 +65,41 @@ async def test_post_demo_resource(
     assert last_accessed_at.action == Action.own
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read_write, token_admin_read_write],
+    indirect=True,
+)
+async def test_post_demo_resources_in_bulk(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+):
+    """Tests bulk POST of demo resources with their category."""
+    app_override_provide_http_token_payload
+
+    category_response = await async_client.post(
+        "/api/v1/category/", json={"name": "Imports"}
+    )
+    category = category_response.json()
+    resources = [
+        {**one_test_demo_resource, "name": f"Resource {number}"} for number in range(3)
+    ] + [{**one_test_demo_resource, "category_id": category["id"]}]
+
+    response = await async_client.post("/api/v1/demoresource/bulk", json=resources)
+
+    assert response.status_code == 201
+    content = [DemoResourceRead(**resource) for resource in response.json()]
+    assert [resource.name for resource in content] == [
+        resource["name"] for resource in resources
+    ]
+    assert content[0].category is None
+    assert str(content[3].category.id) == category["id"]
+
+    all_response = await async_client.get("/api/v1/demoresource/")
+    assert len(all_response.json()) == len(resources)
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "mocked_provide_http_token_payload",
@@ -2767,6 +2767,90 @@ async def test_bulk_add_groups_to_ueber_group_and_bulk_remove(
     assert all(group_id in ueber_group_group_ids for group_id in expected_ids)
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_admin_read_write],
+    indirect=True,
+)
+async def test_bulk_add_users_to_ueber_group_keeps_existing_memberships(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+    add_many_azure_test_users: List[User],
+    add_many_test_ueber_groups,
+):
+    """Tests bulk adding skips users, that are already members."""
+    app_override_provide_http_token_payload
+
+    existing_users = await add_many_azure_test_users()
+    mocked_ueber_groups = await add_many_test_ueber_groups()
+
+    response = await async_client.post(
+        f"/api/v1/uebergroup/{str(mocked_ueber_groups[1].id)}/users?inherit=false",
+        json=[str(user.id) for user in existing_users[0:2]],
+    )
+    assert response.status_code == 201
+
+    user_ids = [str(user.id) for user in existing_users]
+    response = await async_client.post(
+        f"/api/v1/uebergroup/{str(mocked_ueber_groups[1].id)}/users",
+        json=user_ids + user_ids[0:1],
+    )
+
+    assert response.status_code == 201
+    memberships = response.json()
+    assert [membership["child_id"] for membership in memberships] == user_ids
+    assert [membership["inherit"] for membership in memberships] == [
+        False,
+        False,
+        True,
+        True,
+        True,
+    ]
+
+    ueber_group_response = await async_client.get(
+        f"/api/v1/uebergroup/{str(mocked_ueber_groups[1].id)}"
+    )
+    ueber_group = UeberGroupRead(**ueber_group_response.json())
+    assert len(ueber_group.users) == 5
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_admin_read_write],
+    indirect=True,
+)
+async def test_bulk_add_rejects_all_children_if_one_has_the_wrong_type(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+    add_many_azure_test_users: List[User],
+    add_many_test_ueber_groups,
+    add_many_test_groups,
+):
+    """Tests bulk adding adds none of the children, if one is not allowed for the parent."""
+    app_override_provide_http_token_payload
+
+    existing_users = await add_many_azure_test_users()
+    mocked_groups = await add_many_test_groups()
+    mocked_ueber_groups = await add_many_test_ueber_groups()
+
+    response = await async_client.post(
+        f"/api/v1/uebergroup/{str(mocked_ueber_groups[1].id)}/users",
+        json=[str(user.id) for user in existing_users] + [str(mocked_groups[0].id)],
+    )
+
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Forbidden."}
+
+    ueber_group_response = await async_client.get(
+        f"/api/v1/uebergroup/{str(mocked_ueber_groups[1].id)}"
+    )
+    ueber_group = UeberGroupRead(**ueber_group_response.json())
+    assert ueber_group.users == []
+    assert ueber_group.groups == []
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "mocked_provide_http_token_payload",
@@ -2,17 +2,24 @@ from datetime import datetime, timedelta
 from uuid import UUID, uuid4
 
 import pytest
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from httpx import AsyncClient
+from sqlalchemy import event
 
+from core.databases import postgres_async_engine
 from core.types import Action, CurrentUserData, ResourceType
-from crud.access import AccessLoggingCRUD, AccessPolicyCRUD, ResourceHierarchyCRUD
+from crud.access import (
+    ORDER_GAP,
+    AccessLoggingCRUD,
+    AccessPolicyCRUD,
+    ResourceHierarchyCRUD,
+)
 from crud.protected_resource import (
     ProtectedChildCRUD,
     ProtectedGrandChildCRUD,
     ProtectedResourceCRUD,
 )
-from models.access import ResourceHierarchyRead
+from models.access import ResourceHierarchy, ResourceHierarchyRead
 from models.protected_resource import (
     ProtectedChild,
     ProtectedChildRead,
@@ -21,6 +28,7 @@ from models.protected_resource import (
     ProtectedResource,
     ProtectedResourceRead,
 )
+from routers.api.v1.base import NEXT_CURSOR_HEADER
 from tests.utils import (
     current_user_data_admin,
     current_user_data_user2,
@@ -113,6 +121,327 @@ async def test_post_protected_resource_with_logs_and_policies(
     assert policies[0].action == Action.own
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_admin_read_write, token_user1_read_write],
+    indirect=True,
+)
+async def test_post_protected_resources_in_bulk_with_logs_and_policies(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+    current_test_user,
+):
+    """Tests the bulk post of protected resources writes all rows with a few statements."""
+    app_override_provide_http_token_payload
+    protected_resources = [
+        {"name": f"Imported Resource {number}", "description": "From legacy"}
+        for number in range(50)
+    ]
+    write_statements = []
+
+    def count_write_statements(conn, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
+            write_statements.append(statement)
+
+    event.listen(
+        postgres_async_engine.sync_engine,
+        "before_cursor_execute",
+        count_write_statements,
+    )
+    try:
+        response = await async_client.post(
+            "/api/v1/protected/resource/bulk",
+            json=protected_resources,
+        )
+    finally:
+        event.remove(
+            postgres_async_engine.sync_engine,
+            "before_cursor_execute",
+            count_write_statements,
+        )
+
+    assert response.status_code == 201
+    created_protected_resources = [
+        ProtectedResource(**content) for content in response.json()
+    ]
+    assert [resource.name for resource in created_protected_resources] == [
+        resource["name"] for resource in protected_resources
+    ]
+    # type links, objects, policies, effective permissions and logs - independent of the number of objects:
+    assert len(write_statements) <= 6
+
+    async with AccessLoggingCRUD() as crud:
+        last_accessed_at = await crud.read_resource_last_accessed_at(
+            CurrentUserData(**current_user_data_admin),
+            resource_id=created_protected_resources[0].id,
+        )
+    assert last_accessed_at.identity_id == current_test_user.user_id
+    assert last_accessed_at.action == Action.own
+    assert last_accessed_at.status_code == 201
+
+    async with ProtectedResourceCRUD() as crud:
+        db_protected_resources = await crud.read(current_test_user)
+    assert len(db_protected_resources) == len(protected_resources)
+
+    async with AccessPolicyCRUD() as crud:
+        policies = await crud.read(
+            current_test_user,
+            resource_id=created_protected_resources[-1].id,
+        )
+    assert len(policies) == 1
+    assert policies[0].identity_id == current_test_user.user_id
+    assert policies[0].action == Action.own
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read_write],
+    indirect=True,
+)
+async def test_create_many_protected_children_under_a_parent(
+    current_test_user,
+    add_many_test_protected_resources,
+    mocked_provide_http_token_payload,
+):
+    """Tests children created in bulk get appended to the parent in order."""
+    protected_resources = await add_many_test_protected_resources(
+        mocked_provide_http_token_payload
+    )
+    parent_id = protected_resources[0].id
+
+    async with ProtectedChildCRUD() as crud:
+        with pytest.raises(HTTPException) as error:
+            await crud.create_many(
+                many_test_protected_child_resources, current_test_user
+            )
+        assert error.value.status_code == 403
+
+        created_children = await crud.create_many(
+            many_test_protected_child_resources,
+            current_test_user,
+            parent_id=parent_id,
+            inherit=True,
+        )
+
+    assert [child.title for child in created_children] == [
+        child["title"] for child in many_test_protected_child_resources
+    ]
+    async with ResourceHierarchyCRUD() as crud:
+        relations = await crud.read(current_test_user, parent_id=parent_id)
+    orders = {relation.child_id: relation.order for relation in relations}
+    assert [orders[child.id] for child in created_children] == [
+        position * ORDER_GAP for position in range(1, len(created_children) + 1)
+    ]
+    assert all(relation.inherit for relation in relations)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read_write],
+    indirect=True,
+)
+async def test_reorder_children_updates_one_row_and_rebalances_used_up_gaps(
+    current_test_user,
+    add_many_test_protected_resources,
+    mocked_provide_http_token_payload,
+):
+    """Tests a move writes the moving child only - and spreads the order keys, when no gap is left."""
+    protected_resources = await add_many_test_protected_resources(
+        mocked_provide_http_token_payload
+    )
+    parent_id = protected_resources[0].id
+    async with ProtectedChildCRUD() as crud:
+        children = await crud.create_many(
+            many_test_protected_child_resources[:3],
+            current_test_user,
+            parent_id=parent_id,
+        )
+
+    async def read_orders():
+        async with ResourceHierarchyCRUD() as crud:
+            relations = await crud.read(current_test_user, parent_id=parent_id)
+        return {relation.child_id: relation.order for relation in relations}
+
+    update_statements = []
+
+    def count_update_statements(conn, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            update_statements.append(statement)
+
+    event.listen(
+        postgres_async_engine.sync_engine,
+        "before_cursor_execute",
+        count_update_statements,
+    )
+    try:
+        async with ResourceHierarchyCRUD() as crud:
+            await crud.reorder_children(
+                current_test_user, parent_id, children[2].id, "before", children[0].id
+            )
+    finally:
+        event.remove(
+            postgres_async_engine.sync_engine,
+            "before_cursor_execute",
+            count_update_statements,
+        )
+    assert len(update_statements) == 1
+    orders = await read_orders()
+    assert orders[children[2].id] == ORDER_GAP // 2
+    assert sorted(orders, key=orders.get) == [
+        children[2].id,
+        children[0].id,
+        children[1].id,
+    ]
+
+    # consecutive order keys leave no gap:
+    async with ResourceHierarchyCRUD() as crud:
+        for order, child in enumerate(children, start=1):
+            relation = await crud.session.get(ResourceHierarchy, (parent_id, child.id))
+            relation.order = order
+        await crud.session.commit()
+        await crud.reorder_children(
+            current_test_user, parent_id, children[2].id, "after", children[0].id
+        )
+    orders = await read_orders()
+    assert sorted(orders, key=orders.get) == [
+        children[0].id,
+        children[2].id,
+        children[1].id,
+    ]
+    assert len(set(orders.values())) == len(children)
+    assert min(orders.values()) == ORDER_GAP
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read_write],
+    indirect=True,
+)
+async def test_get_protected_resource_tree(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+    current_test_user,
+    add_many_test_protected_resources,
+    mocked_provide_http_token_payload,
+):
+    """Tests the tree of a protected resource is read with one query for the hierarchy and one per type."""
+    app_override_provide_http_token_payload
+    protected_resources = await add_many_test_protected_resources(
+        mocked_provide_http_token_payload
+    )
+    root_id = protected_resources[0].id
+    async with ProtectedChildCRUD() as crud:
+        children = await crud.create_many(
+            many_test_protected_child_resources, current_test_user, parent_id=root_id
+        )
+    async with ProtectedGrandChildCRUD() as crud:
+        grandchildren = await crud.create_many(
+            many_test_protected_grandchild_resources,
+            current_test_user,
+            parent_id=children[0].id,
+        )
+
+    select_statements = []
+
+    def count_select_statements(conn, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            select_statements.append(statement)
+
+    event.listen(
+        postgres_async_engine.sync_engine,
+        "before_cursor_execute",
+        count_select_statements,
+    )
+    try:
+        async with ProtectedResourceCRUD() as crud:
+            tree = await crud.read_tree(root_id, current_test_user, depth=2)
+    finally:
+        event.remove(
+            postgres_async_engine.sync_engine,
+            "before_cursor_execute",
+            count_select_statements,
+        )
+    # the hierarchy and one query for each of the three types:
+    assert len(select_statements) == 4
+    assert tree.id == root_id
+    assert tree.resource["name"] == protected_resources[0].name
+    assert [child.id for child in tree.children] == [child.id for child in children]
+    assert [child.order for child in tree.children] == [
+        position * ORDER_GAP for position in range(1, len(children) + 1)
+    ]
+    assert [grandchild.id for grandchild in tree.children[0].children] == [
+        grandchild.id for grandchild in grandchildren
+    ]
+    assert all(not child.children for child in tree.children[1:])
+
+    response = await async_client.get(f"/api/v1/protected/resource/{root_id}/tree")
+    assert response.status_code == 200
+    content = response.json()
+    assert [child["resource"]["title"] for child in content["children"]] == [
+        child.title for child in children
+    ]
+    assert all(child["children"] == [] for child in content["children"])
+
+    response = await async_client.get(f"/api/v1/category/{root_id}/tree")
+    assert response.status_code == 404
+
+    async with ProtectedGrandChildCRUD() as crud:
+        with pytest.raises(HTTPException) as error:
+            await crud.read_tree(
+                grandchildren[0].id, CurrentUserData(**current_user_data_user2)
+            )
+    assert error.value.status_code == 404
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read_write],
+    indirect=True,
+)
+async def test_get_protected_resources_page_keeps_all_children(
+    async_client: AsyncClient,
+    app_override_provide_http_token_payload: FastAPI,
+    current_test_user,
+    add_many_test_protected_resources,
+    mocked_provide_http_token_payload,
+):
+    """Tests a page holds whole resources - the joined children do not count against the limit."""
+    app_override_provide_http_token_payload
+    protected_resources = await add_many_test_protected_resources(
+        mocked_provide_http_token_payload
+    )
+    async with ProtectedChildCRUD() as crud:
+        created_children = await crud.create_many(
+            many_test_protected_child_resources,
+            current_test_user,
+            parent_id=protected_resources[0].id,
+        )
+
+    response = await async_client.get(
+        "/api/v1/protected/resource/", params={"limit": 1}
+    )
+    assert response.status_code == 200
+    page = response.json()
+    assert [resource["id"] for resource in page] == [str(protected_resources[0].id)]
+    assert [child["id"] for child in page[0]["protected_children"]] == [
+        str(child.id) for child in created_children
+    ]
+
+    response = await async_client.get(
+        "/api/v1/protected/resource/",
+        params={"limit": 2, "cursor": response.headers[NEXT_CURSOR_HEADER]},
+    )
+    assert response.status_code == 200
+    assert [resource["id"] for resource in response.json()] == [
+        str(resource.id) for resource in protected_resources[1:3]
+    ]
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "mocked_provide_http_token_payload",
@@ -2020,6 +2349,73 @@ async def test_user_gets_only_protected_children_with_access_as_relationship_fro
     assert mocked_protected_children[1].title not in modelled_protected_children_titles
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read_write],
+    indirect=True,
+)
+async def test_user_reads_protected_resources_with_children_in_one_query(
+    mocked_provide_http_token_payload,
+    current_test_user,
+    add_many_test_protected_resources,
+    add_many_test_protected_children,
+    add_one_test_access_policy,
+    add_one_parent_child_resource_relationship,
+):
+    """Tests reading resources with relationships costs one query, independent of the relationships' permissions."""
+    mocked_protected_resources = await add_many_test_protected_resources(
+        mocked_provide_http_token_payload
+    )
+    mocked_protected_children = await add_many_test_protected_children()
+
+    for child in mocked_protected_children[:2]:
+        await add_one_parent_child_resource_relationship(
+            parent_id=mocked_protected_resources[0].id,
+            child_id=child.id,
+            type=ResourceType.protected_child,
+        )
+    await add_one_test_access_policy(
+        {
+            "resource_id": str(mocked_protected_children[0].id),
+            "identity_id": current_test_user.user_id,
+            "action": "read",
+        }
+    )
+
+    read_statements = []
+
+    def count_read_statements(conn, cursor, statement, parameters, context, many):
+        # the access logs get inserted after reading:
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            read_statements.append(statement)
+
+    event.listen(
+        postgres_async_engine.sync_engine,
+        "before_cursor_execute",
+        count_read_statements,
+    )
+    try:
+        async with ProtectedResourceCRUD() as crud:
+            read_protected_resources = await crud.read(current_test_user)
+    finally:
+        event.remove(
+            postgres_async_engine.sync_engine,
+            "before_cursor_execute",
+            count_read_statements,
+        )
+
+    assert len(read_statements) == 1
+    assert len(read_protected_resources) == len(mocked_protected_resources)
+    for read_protected_resource in read_protected_resources:
+        if read_protected_resource.id == mocked_protected_resources[0].id:
+            assert [
+                child.id for child in read_protected_resource.protected_children
+            ] == [mocked_protected_children[0].id]
+        else:
+            assert read_protected_resource.protected_children == []
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "mocked_provide_http_token_payload",
@@ -4,8 +4,11 @@ import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
 
+from core.types import Action, CurrentUserData
+from crud.access import AccessPolicyCRUD
 from models.tag import Tag
 from tests.utils import (
+    current_user_data_admin,
     token_admin,
     token_admin_read,
     token_admin_read_write,
@@ -50,6 +53,37 @@ async def test_post_tag(
     assert "id" in content
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "mocked_provide_http_token_payload",
+    [token_user1_read_write, token_admin_read_write],
+    indirect=True,
+)
+async def test_post_tags_in_bulk_with_public_read_access(
+    async_client: AsyncClient, app_override_provide_http_token_payload: FastAPI
+):
+    """Tests bulk POST of tags, that everyone can read."""
+
+    app_override_provide_http_token_payload
+
+    tags = [{"name": f"Tag{number}"} for number in range(3)]
+    response = await async_client.post("/api/v1/tag/bulk", json=tags)
+
+    assert response.status_code == 201
+    content = response.json()
+    assert [tag["name"] for tag in content] == [tag["name"] for tag in tags]
+
+    async with AccessPolicyCRUD() as crud:
+        policies = await crud.read(
+            CurrentUserData(**current_user_data_admin),
+            resource_id=content[0]["id"],
+        )
+    assert {policy.action for policy in policies} == {Action.read, Action.own}
+    assert [policy.public for policy in policies if policy.action == Action.read] == [
+        True
+    ]
+
+
 @pytest.mark.anyio
 @pytest.mark.parametrize(
     "mocked_provide_http_token_payload",
@@ -1,19 +1,48 @@
+import json
 import logging
+import zlib
+from typing import Optional, Tuple
 
 import socketio
 
+from core.cache import get_socketio_auth, set_socketio_auth
 from core.config import config
+from core.databases import unit_of_work
 from core.security import (
+    check_guards,
     check_token_against_guards,
     get_azure_token_payload,
     get_token_from_cache,
 )
-from core.types import GuardTypes
+from core.types import CurrentUserData, GuardTypes, SnapshotPage
 
 logger = logging.getLogger(__name__)
 
+
+def get_client_manager(
+    write_only: bool = False,
+) -> Optional[socketio.AsyncRedisManager]:
+    """Returns the Redis manager, if clients connect to more than one worker or replica"""
+    # without it, emits only reach the clients connected to this process;
+    # write_only managers emit from outside the Socket.IO server, like background jobs:
+    if not config.SOCKETIO_REDIS_MANAGER:
+        return None
+    logger.info("Socket.IO emits fan out through Redis")
+    return socketio.AsyncRedisManager(
+        f"redis://{config.REDIS_HOST}:{config.REDIS_PORT}/{config.REDIS_SESSION_DB}",
+        channel=config.SOCKETIO_REDIS_CHANNEL,
+        write_only=write_only,
+        redis_options={
+            "password": config.REDIS_PASSWORD or None,
+            "socket_connect_timeout": config.REDIS_SOCKET_CONNECT_TIMEOUT,
+            "health_check_interval": config.REDIS_HEALTH_CHECK_INTERVAL,
+        },
+    )
+
+
 socketio_server = socketio.AsyncServer(
     async_mode="asgi",
+    client_manager=get_client_manager(),
     cors_allowed_origins=[],  # disable CORS in Socket.IO, as FastAPI handles CORS!
     logger=False,
     engineio_logger=False,  # prevents the ping and pong messages from being logged
@@ -149,6 +178,11 @@ class BaseNamespace(socketio.AsyncNamespace):
         self.callback_on_connect = callback_on_connect
         self.callback_on_disconnect = callback_on_disconnect
 
+    async def trigger_event(self, event, *args):
+        """Handles every event in its own unit of work - one database session for all CRUDs."""
+        async with unit_of_work():
+            return await super().trigger_event(event, *args)
+
     async def _get_session_data(self, sid):
         """Get socketio session data from the socketio server."""
         try:
@@ -184,15 +218,9 @@ class BaseNamespace(socketio.AsyncNamespace):
                 # token = await get_token_from_cache(auth["session_id"], ["User.Read"])
                 # catch and handle an expired token gracefully and return something to the client on a different message channel,
                 # so it can initiate the authentication process and come back with a new session id
-                token = await get_token_from_cache(
-                    auth["session_id"], [f"api://{config.API_SCOPE}/socketio"]
-                )  # TBD: add get scopes from guards - potentially distinguish between MSGraph scopes and backendAPI scopes?!
-                token_payload = await get_azure_token_payload(token)
-                # print("=== base - on_connect - token_payload ===")
-                # print(token_payload, flush=True)
-                print("=== base - on_connect - token_payload - name ===")
-                print(token_payload["name"], flush=True)
-                current_user = await check_token_against_guards(token_payload, guards)
+                token_payload, current_user = await self.authenticate(
+                    auth["session_id"]
+                )
                 session_data = {
                     "user_name": token_payload["name"],
                     "current_user": current_user,
@@ -219,7 +247,7 @@ class BaseNamespace(socketio.AsyncNamespace):
         if self.callback_on_connect is not None:
             # This works:
             # print("=== base - on_connect - callback_on_connect ===")
-            await self.callback_on_connect(sid)
+            await self.callback_on_connect(sid, auth)
 
         # current_user = await check_token_against_guards(token_payload, self.guards)
         # print("=== base - on_connect - sid - current_user ===")
@@ -233,6 +261,62 @@ class BaseNamespace(socketio.AsyncNamespace):
         # TBD: should not return anything or potentially true?
         # return "OK from server"
 
+    async def authenticate(self, session_id: str) -> Tuple[dict, CurrentUserData]:
+        """Returns token payload and current user of the session - from the cache until the token expires"""
+        # reconnects and connects to further namespaces skip the token exchange and the database:
+        cached = await get_socketio_auth(session_id)
+        if cached is not None:
+            await check_guards(cached["token_payload"], self.guards)
+            return cached["token_payload"], cached["current_user"]
+        token = await get_token_from_cache(
+            session_id, [f"api://{config.API_SCOPE}/socketio"]
+        )  # TBD: add get scopes from guards - potentially distinguish between MSGraph scopes and backendAPI scopes?!
+        token_payload = await get_azure_token_payload(token)
+        current_user = await check_token_against_guards(token_payload, self.guards)
+        await set_socketio_auth(session_id, token_payload, current_user)
+        return token_payload, current_user
+
+    async def get_snapshot_page(
+        self, cursor: Optional[str], limit: int
+    ) -> SnapshotPage:
+        """Returns the state after the cursor - namespaces with state override this, without state it's empty"""
+        return SnapshotPage(data=[], cursor=cursor)
+
+    async def send_snapshot(self, sid, auth=None):
+        """Sends the state as compressed pages - usable as callback_on_connect"""
+        # reconnecting clients send the cursor of the last page they got in their auth:
+        cursor = (auth or {}).get("snapshot_cursor")
+        while True:
+            try:
+                page = await self.get_snapshot_page(
+                    cursor, config.SOCKETIO_SNAPSHOT_PAGE_SIZE
+                )
+            except Exception as err:
+                if cursor is None:
+                    raise err
+                logger.warning(
+                    f"Failed to resume snapshot from cursor {cursor} in {self.namespace}: {err}"
+                )
+                cursor = None
+                continue
+            data = json.dumps(page.data, default=str).encode()
+            compressed = len(data) > config.SOCKETIO_SNAPSHOT_COMPRESSION_THRESHOLD
+            await self.server.emit(
+                "snapshot",
+                {
+                    # zlib format - browsers inflate it with DecompressionStream("deflate"):
+                    "data": zlib.compress(data) if compressed else page.data,
+                    "compressed": compressed,
+                    "cursor": page.cursor,
+                    "more": page.more,
+                },
+                to=sid,
+                namespace=self.namespace,
+            )
+            if not page.more or page.cursor == cursor:
+                return "snapshot"
+            cursor = page.cursor
+
     async def on_disconnect(self, sid):
         """Disconnect event for socket.io namespaces."""
         logger.info(f"Client with session id {sid} disconnected.")
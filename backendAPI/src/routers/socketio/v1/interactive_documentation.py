@@ -1,4 +1,9 @@
 import logging
+from typing import Optional
+
+from core.cache import redis_session_client
+from core.config import config
+from core.types import SnapshotPage
 
 from .base import BaseNamespace
 
@@ -6,28 +11,27 @@ logger = logging.getLogger(__name__)
 
 
 class InteractiveDocumentation(BaseNamespace):
+    """Collects ratings and comments on the presentation topics - shared by all workers through Redis"""
+
+    topics = [
+        "Repository",
+        "Infrastructure",
+        "Architecture",
+        "Security",
+        "Backend",
+        "Frontend",
+    ]
+    # sum and number of ratings per topic, the average is derived when read:
+    sums_location = "interactive_documentation:sums"
+    counts_location = "interactive_documentation:counts"
+    # capped stream of the comments - the oldest ones are dropped:
+    comments_location = "interactive_documentation:comments"
+
     def __init__(self):
         super().__init__(
             namespace="/interactive-documentation",
-            callback_on_connect=self.initial_data_transfer,
+            callback_on_connect=self.send_snapshot,
         )
-        self.average = {
-            "Repository": 0.0,
-            "Infrastructure": 0.0,
-            "Architecture": 0.0,
-            "Security": 0.0,
-            "Backend": 0.0,
-            "Frontend": 0.0,
-        }
-        self.count = {
-            "Repository": 0,
-            "Infrastructure": 0,
-            "Architecture": 0,
-            "Security": 0,
-            "Backend": 0,
-            "Frontend": 0,
-        }
-        self.comments = []
 
     # async def on_connect(self, sid, environ, auth=None):
     #     """Executes on connect for the interactive documentation namespace."""
@@ -35,48 +39,86 @@ class InteractiveDocumentation(BaseNamespace):
     #     print(sid, flush=True)
     #     # return await super().on_connect(sid, environ, auth)
 
-    async def initial_data_transfer(self, sid):
-        """Executes transferring the initial data on connect."""
-        for topic in self.average:
-            await self.server.emit(
-                "averages",
+    @staticmethod
+    def get_average(total, count) -> float:
+        """Returns the average of the ratings - 0.0 without ratings"""
+        count = int(count or 0)
+        return float(total or 0.0) / count if count else 0.0
+
+    async def get_snapshot_page(
+        self, cursor: Optional[str], limit: int
+    ) -> SnapshotPage:
+        """Returns the averages of all topics and the comments after the cursor in one round-trip"""
+        # the cursor is the id of the last comment the client got:
+        start = f"({cursor}" if cursor else "-"
+        async with redis_session_client.pipeline(transaction=True) as pipeline:
+            pipeline.hgetall(self.sums_location)
+            pipeline.hgetall(self.counts_location)
+            pipeline.xrange(self.comments_location, min=start, count=limit + 1)
+            sums, counts, comments = await pipeline.execute()
+        averages = []
+        for topic in self.topics:
+            count = int(counts.get(topic.encode(), 0))
+            averages.append(
                 {
                     "topic": topic,
-                    "average": self.average[topic],
-                    "count": self.count[topic],
-                },
-                to=sid,
-                namespace=self.namespace,
-            )
-        for comment in self.comments:
-            await self.server.emit(
-                "server_comments",
-                {"topic": comment["topic"], "comment": comment["comment"]},
-                to=sid,
-                namespace=self.namespace,
+                    "average": self.get_average(sums.get(topic.encode()), count),
+                    "count": count,
+                }
             )
-        return "initial_data_transfer"
+        comments = [
+            {
+                "id": comment_id.decode(),
+                "topic": fields[b"topic"].decode(),
+                "comment": fields[b"comment"].decode(),
+            }
+            for comment_id, fields in comments
+        ]
+        more = len(comments) > limit
+        comments = comments[:limit]
+        return SnapshotPage(
+            data={"averages": averages, "comments": comments},
+            cursor=comments[-1]["id"] if comments else cursor,
+            more=more,
+        )
 
     async def on_comments(self, sid, data):
         """Presentation interests for socket.io."""
         logger.info(f"Received comment in interactive documentation from client {sid}.")
+        topic = data["topic"]
+        if topic not in self.topics:
+            logger.warning(f"Client {sid} commented on unknown topic {topic}.")
+            return
+
+        # both counters change together - workers never see a sum without its count:
+        async with redis_session_client.pipeline(transaction=True) as pipeline:
+            pipeline.hincrbyfloat(self.sums_location, topic, data["value"])
+            pipeline.hincrby(self.counts_location, topic, 1)
+            if data["comment"]:
+                pipeline.xadd(
+                    self.comments_location,
+                    {"topic": topic, "comment": data["comment"]},
+                    maxlen=config.INTERACTIVE_DOCUMENTATION_MAX_COMMENTS,
+                    approximate=False,
+                )
+            new_sum, new_count, *comment_id = await pipeline.execute()
 
-        self.comments.append({"topic": data["topic"], "comment": data["comment"]})
+        # clients keep the id as cursor to resume the snapshot after a reconnect:
         await self.emit(
-            "server_comments", {"topic": data["topic"], "comment": data["comment"]}
+            "server_comments",
+            {
+                "id": comment_id[0].decode() if comment_id else None,
+                "topic": topic,
+                "comment": data["comment"],
+            },
         )
-
-        old_average = self.average[data["topic"]]
-        old_count = self.count[data["topic"]]
-
-        new_average = (old_average * old_count + data["value"]) / (old_count + 1)
-        self.count[data["topic"]] += 1
-        new_count = self.count[data["topic"]]
-        self.average[data["topic"]] = new_average
-
         await self.emit(
             "averages",
-            {"topic": data["topic"], "average": new_average, "count": new_count},
+            {
+                "topic": topic,
+                "average": self.get_average(new_sum, new_count),
+                "count": new_count,
+            },
         )
 
 
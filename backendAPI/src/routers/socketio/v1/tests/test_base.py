@@ -0,0 +1,257 @@
+import asyncio
+import json
+import time
+import uuid
+import zlib
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import socketio
+import uvicorn
+
+from core.cache import redis_session_client
+from core.config import config
+from core.types import CurrentUserData, GuardTypes, SnapshotPage
+from routers.socketio.v1.base import BaseNamespace, get_client_manager
+
+
+def test_client_manager_stays_in_memory_by_default():
+    """Tests emits only reach the clients of this process without the Redis manager."""
+    with patch.object(config, "SOCKETIO_REDIS_MANAGER", False):
+        assert get_client_manager() is None
+
+
+@pytest.mark.anyio
+async def test_client_manager_fans_out_emits_through_redis():
+    """Tests an emit from another process reaches a connected client through Redis."""
+    channel = f"socketio:test:{uuid.uuid4()}"
+    with (
+        patch.object(config, "SOCKETIO_REDIS_MANAGER", True),
+        patch.object(config, "SOCKETIO_REDIS_CHANNEL", channel),
+    ):
+        manager = get_client_manager()
+        emitter = get_client_manager(write_only=True)
+
+    assert isinstance(manager, socketio.AsyncRedisManager)
+    assert manager.channel == channel
+    assert emitter.write_only is True
+
+    server = socketio.AsyncServer(async_mode="asgi", client_manager=manager)
+    server.register_namespace(socketio.AsyncNamespace("/demo"))
+    app = socketio.ASGIApp(server, socketio_path="socketio/v1")
+    uvicorn_server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=8670, log_level="info")
+    )
+    serving = asyncio.create_task(uvicorn_server.serve())
+    await asyncio.sleep(1)
+
+    client = socketio.AsyncClient()
+    received = asyncio.get_running_loop().create_future()
+    client.on(
+        "demo_message",
+        lambda data: received.set_result(data),
+        namespace="/demo",
+    )
+    try:
+        await client.connect(
+            "http://127.0.0.1:8670", socketio_path="socketio/v1", namespaces=["/demo"]
+        )
+        # the server subscribes in the background:
+        await asyncio.sleep(0.5)
+        await emitter.emit("demo_message", {"text": "hello"}, namespace="/demo")
+        assert await asyncio.wait_for(received, timeout=5) == {"text": "hello"}
+    finally:
+        await client.disconnect()
+        await server.shutdown()
+        uvicorn_server.should_exit = True
+        await uvicorn_server.shutdown()
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+
+
+class CountingNamespace(BaseNamespace):
+    """Namespace with the numbers up to total as state."""
+
+    def __init__(self, total: int):
+        super().__init__(namespace="/counting", callback_on_connect=self.send_snapshot)
+        self.total = total
+
+    async def get_snapshot_page(self, cursor, limit) -> SnapshotPage:
+        start = int(cursor) + 1 if cursor is not None else 0
+        numbers = list(range(start, min(start + limit, self.total)))
+        return SnapshotPage(
+            data=numbers,
+            cursor=str(numbers[-1]) if numbers else cursor,
+            more=start + limit < self.total,
+        )
+
+
+@pytest.mark.anyio
+async def test_snapshot_is_sent_in_compressed_pages():
+    """Tests the state reaches the client in pages, compressed above the threshold."""
+    namespace = CountingNamespace(total=1000)
+    with (
+        patch.object(config, "SOCKETIO_SNAPSHOT_PAGE_SIZE", 400),
+        patch.object(config, "SOCKETIO_SNAPSHOT_COMPRESSION_THRESHOLD", 512),
+        patch.object(namespace.server, "emit", new=AsyncMock()) as emit,
+    ):
+        await namespace.callback_on_connect("sid1", {})
+
+    payloads = [call.args[1] for call in emit.call_args_list]
+    assert all(call.args[0] == "snapshot" for call in emit.call_args_list)
+    assert all(call.kwargs["to"] == "sid1" for call in emit.call_args_list)
+    assert [payload["more"] for payload in payloads] == [True, True, False]
+    assert [payload["cursor"] for payload in payloads] == ["399", "799", "999"]
+    assert [payload["compressed"] for payload in payloads] == [True, True, True]
+    numbers = [
+        number
+        for payload in payloads
+        for number in json.loads(zlib.decompress(payload["data"]))
+    ]
+    assert numbers == list(range(1000))
+
+
+@pytest.mark.anyio
+async def test_snapshot_resumes_from_the_cursor_of_the_reconnecting_client():
+    """Tests a reconnecting client only gets the state after its cursor."""
+    namespace = CountingNamespace(total=10)
+    with patch.object(namespace.server, "emit", new=AsyncMock()) as emit:
+        await namespace.callback_on_connect("sid1", {"snapshot_cursor": "6"})
+
+    payload = emit.call_args.args[1]
+    assert emit.call_count == 1
+    assert payload == {
+        "data": [7, 8, 9],
+        "compressed": False,
+        "cursor": "9",
+        "more": False,
+    }
+
+
+@pytest.mark.anyio
+async def test_snapshot_of_namespace_without_state_is_empty():
+    """Tests a namespace without its own snapshot page sends one empty page."""
+    namespace = BaseNamespace(namespace="/stateless")
+    with patch.object(namespace.server, "emit", new=AsyncMock()) as emit:
+        await namespace.send_snapshot("sid1")
+
+    assert emit.call_count == 1
+    assert emit.call_args.args[1] == {
+        "data": [],
+        "compressed": False,
+        "cursor": None,
+        "more": False,
+    }
+
+
+def mock_token_payload(expires_in: int = 3600) -> dict:
+    return {
+        "name": "Test User",
+        "scp": "socketio",
+        "roles": ["User"],
+        "exp": int(time.time()) + expires_in,
+    }
+
+
+async def store_session(session_id: str) -> None:
+    """Stores a session, as the frontend does on login."""
+    await redis_session_client.set(f"session:{session_id}", "{}", ex=60)
+
+
+async def connect_with_mocked_token(namespace, session_id, token_payload, user_id):
+    """Connects to the namespace - the token exchange and the user lookup are mocked."""
+    with (
+        patch(
+            "routers.socketio.v1.base.get_token_from_cache",
+            new=AsyncMock(return_value="token"),
+        ) as get_token,
+        patch(
+            "routers.socketio.v1.base.get_azure_token_payload",
+            new=AsyncMock(return_value=token_payload),
+        ),
+        patch(
+            "routers.socketio.v1.base.check_token_against_guards",
+            new=AsyncMock(return_value=CurrentUserData(user_id=user_id)),
+        ),
+        patch.object(namespace.server, "save_session", new=AsyncMock()) as save,
+    ):
+        await namespace.on_connect("sid", {}, {"session_id": session_id})
+    return get_token, save
+
+
+@pytest.mark.anyio
+async def test_reconnects_and_further_namespaces_are_authenticated_from_cache():
+    """Tests the token is only exchanged on the first connect of a session."""
+    session_id = str(uuid.uuid4())
+    user_id = uuid.uuid4()
+    first = BaseNamespace(namespace="/first", guards=GuardTypes(scopes=["socketio"]))
+    second = BaseNamespace(namespace="/second", guards=GuardTypes(roles=["User"]))
+    await store_session(session_id)
+
+    get_token, _ = await connect_with_mocked_token(
+        first, session_id, mock_token_payload(), user_id
+    )
+    assert get_token.call_count == 1
+
+    for namespace in [first, second]:
+        get_token, save = await connect_with_mocked_token(
+            namespace, session_id, mock_token_payload(), uuid.uuid4()
+        )
+        assert get_token.call_count == 0
+        session_data = save.call_args.args[1]
+        assert session_data["user_name"] == "Test User"
+        assert session_data["current_user"].user_id == user_id
+
+
+@pytest.mark.anyio
+async def test_cached_session_is_checked_against_the_guards_of_the_namespace():
+    """Tests a cached session does not open namespaces its token does not grant."""
+    session_id = str(uuid.uuid4())
+    public = BaseNamespace(namespace="/first", guards=GuardTypes(scopes=["socketio"]))
+    admin = BaseNamespace(namespace="/admin", guards=GuardTypes(roles=["Admin"]))
+    await store_session(session_id)
+    await connect_with_mocked_token(
+        public, session_id, mock_token_payload(), uuid.uuid4()
+    )
+
+    with pytest.raises(ConnectionRefusedError):
+        await connect_with_mocked_token(
+            admin, session_id, mock_token_payload(), uuid.uuid4()
+        )
+
+
+@pytest.mark.anyio
+async def test_logged_out_session_is_not_authenticated_from_cache():
+    """Tests a session removed from the cache authenticates again, even if its token is valid."""
+    namespace = BaseNamespace(namespace="/first", guards=GuardTypes())
+    session_id = str(uuid.uuid4())
+    await store_session(session_id)
+    await connect_with_mocked_token(
+        namespace, session_id, mock_token_payload(), uuid.uuid4()
+    )
+
+    await redis_session_client.delete(f"session:{session_id}")
+    get_token, _ = await connect_with_mocked_token(
+        namespace, session_id, mock_token_payload(), uuid.uuid4()
+    )
+    assert get_token.call_count == 1
+
+
+@pytest.mark.anyio
+async def test_session_is_not_cached_beyond_the_token_expiry():
+    """Tests sessions with expired tokens and a disabled cache authenticate on every connect."""
+    namespace = BaseNamespace(namespace="/first", guards=GuardTypes())
+    session_id = str(uuid.uuid4())
+    for _ in range(2):
+        get_token, _ = await connect_with_mocked_token(
+            namespace, session_id, mock_token_payload(expires_in=-1), uuid.uuid4()
+        )
+        assert get_token.call_count == 1
+
+    session_id = str(uuid.uuid4())
+    with patch.object(config, "SOCKETIO_AUTH_CACHE_TTL", 0):
+        for _ in range(2):
+            get_token, _ = await connect_with_mocked_token(
+                namespace, session_id, mock_token_payload(), uuid.uuid4()
+            )
+            assert get_token.call_count == 1
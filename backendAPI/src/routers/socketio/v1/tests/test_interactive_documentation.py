@@ -0,0 +1,103 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from core.cache import redis_session_client
+from core.config import config
+from routers.socketio.v1.interactive_documentation import InteractiveDocumentation
+
+
+@pytest.fixture(scope="function")
+async def interactive_documentation():
+    """Provides the interactive documentation namespace and clears its state afterwards."""
+    namespace = InteractiveDocumentation()
+    yield namespace
+    await redis_session_client.delete(
+        namespace.sums_location,
+        namespace.counts_location,
+        namespace.comments_location,
+    )
+
+
+@pytest.mark.anyio
+async def test_comments_update_the_shared_averages(interactive_documentation):
+    """Tests ratings of all clients add up to one average per topic in Redis."""
+    with patch.object(interactive_documentation, "emit", new=AsyncMock()) as emit:
+        await interactive_documentation.on_comments(
+            "sid1", {"topic": "Backend", "comment": "Nice!", "value": 80}
+        )
+        await interactive_documentation.on_comments(
+            "sid2", {"topic": "Backend", "comment": "", "value": 40}
+        )
+
+    emit.assert_called_with(
+        "averages", {"topic": "Backend", "average": 60.0, "count": 2}
+    )
+    # another worker reads the same state:
+    page = await InteractiveDocumentation().get_snapshot_page(None, 10)
+    backend = next(
+        average for average in page.data["averages"] if average["topic"] == "Backend"
+    )
+    assert backend == {"topic": "Backend", "average": 60.0, "count": 2}
+    assert [
+        (comment["topic"], comment["comment"]) for comment in page.data["comments"]
+    ] == [("Backend", "Nice!")]
+
+
+@pytest.mark.anyio
+async def test_comments_are_capped(interactive_documentation):
+    """Tests only the most recent comments are kept."""
+    with (
+        patch.object(config, "INTERACTIVE_DOCUMENTATION_MAX_COMMENTS", 3),
+        patch.object(interactive_documentation, "emit", new=AsyncMock()),
+    ):
+        for number in range(5):
+            await interactive_documentation.on_comments(
+                "sid1", {"topic": "Frontend", "comment": f"{number}", "value": 50}
+            )
+
+    page = await interactive_documentation.get_snapshot_page(None, 10)
+    assert [comment["comment"] for comment in page.data["comments"]] == [
+        "2",
+        "3",
+        "4",
+    ]
+
+
+@pytest.mark.anyio
+async def test_snapshot_pages_resume_after_the_last_comment(interactive_documentation):
+    """Tests the comments are paged by their id and a cursor skips the known ones."""
+    with patch.object(interactive_documentation, "emit", new=AsyncMock()) as emit:
+        for number in range(5):
+            await interactive_documentation.on_comments(
+                "sid1", {"topic": "Security", "comment": f"{number}", "value": 90}
+            )
+    last_comment_id = emit.call_args_list[-2].args[1]["id"]
+
+    first_page = await interactive_documentation.get_snapshot_page(None, 2)
+    second_page = await interactive_documentation.get_snapshot_page(
+        first_page.cursor, 2
+    )
+    third_page = await interactive_documentation.get_snapshot_page(
+        second_page.cursor, 2
+    )
+
+    assert [page.more for page in [first_page, second_page, third_page]] == [
+        True,
+        True,
+        False,
+    ]
+    assert [
+        comment["comment"]
+        for page in [first_page, second_page, third_page]
+        for comment in page.data["comments"]
+    ] == ["0", "1", "2", "3", "4"]
+    assert third_page.cursor == last_comment_id
+    assert [average["topic"] for average in third_page.data["averages"]] == (
+        InteractiveDocumentation.topics
+    )
+
+    # a client, that got everything, only gets the averages:
+    resumed_page = await interactive_documentation.get_snapshot_page(last_comment_id, 2)
+    assert resumed_page.data["comments"] == []
+    assert resumed_page.cursor == last_comment_id
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+from fastapi import WebSocket
+
+from core.cache import redis_session_client
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastClient:
+    """Connected websocket with its own send queue and writer task"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(
+            maxsize=config.WEBSOCKET_SEND_QUEUE_SIZE
+        )
+        self.writer: Optional[asyncio.Task] = None
+
+
+class BroadcastHub:
+    """Broadcasts messages to all websockets of a channel - on all workers through Redis pub/sub"""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.clients: Dict[int, BroadcastClient] = {}
+        self.listener: Optional[asyncio.Task] = None
+        # closing of dropped clients runs in the background:
+        self.closing: Set[asyncio.Task] = set()
+        self.dropped_messages = 0
+        self.dropped_clients = 0
+
+    @property
+    def running(self) -> bool:
+        """Whether the hub receives the messages of the other workers"""
+        return self.listener is not None and not self.listener.done()
+
+    async def start(self) -> None:
+        """Starts listening to the messages of all workers - called on application startup"""
+        self.listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stops listening and disconnects the writers - called on application shutdown"""
+        if self.listener is not None:
+            self.listener.cancel()
+            await asyncio.gather(self.listener, return_exceptions=True)
+            self.listener = None
+        for client in list(self.clients.values()):
+            await self.disconnect(client)
+
+    async def connect(self, websocket: WebSocket) -> BroadcastClient:
+        """Registers an accepted websocket and starts its writer"""
+        client = BroadcastClient(websocket)
+        client.writer = asyncio.create_task(self._write(client))
+        self.clients[id(client)] = client
+        return client
+
+    async def disconnect(self, client: BroadcastClient) -> None:
+        """Unregisters the websocket and stops its writer - the messages still queued are discarded"""
+        self.clients.pop(id(client), None)
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
+            await asyncio.gather(client.writer, return_exceptions=True)
+
+    async def publish(self, message: str) -> None:
+        """Sends the message to the websockets of all workers"""
+        if self.running:
+            try:
+                # the listener delivers to the websockets of this worker as well:
+                await redis_session_client.publish(self.channel, message)
+                return
+            except Exception as err:
+                logger.error(f"Failed to publish to {self.channel}: {err}")
+        self.deliver(message)
+
+    def deliver(self, message: str) -> None:
+        """Queues the message for the websockets of this worker - never waits for slow clients"""
+        for client in list(self.clients.values()):
+            try:
+                client.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._handle_slow_client(client, message)
+
+    def metrics(self) -> dict:
+        """Returns the queue depths and drop counts of this worker"""
+        depths = [client.queue.qsize() for client in self.clients.values()]
+        return {
+            "clients": len(depths),
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_messages": self.dropped_messages,
+            "dropped_clients": self.dropped_clients,
+        }
+
+    def _handle_slow_client(self, client: BroadcastClient, message: str) -> None:
+        if config.WEBSOCKET_SLOW_CLIENT_POLICY == "disconnect":
+            self.dropped_clients += 1
+            self.dropped_messages += client.queue.qsize() + 1
+            logger.warning(f"Disconnecting slow websocket client from {self.channel}.")
+            self.clients.pop(id(client), None)
+            task = asyncio.create_task(self._drop(client))
+            self.closing.add(task)
+            task.add_done_callback(self.closing.discard)
+            return
+        # "coalesce" keeps the most recent messages only:
+        client.queue.get_nowait()
+        client.queue.put_nowait(message)
+        self.dropped_messages += 1
+
+    async def _drop(self, client: BroadcastClient) -> None:
+        await self.disconnect(client)
+        try:
+            # 1013: try again later
+            await client.websocket.close(code=1013)
+        except Exception as err:
+            logger.info(f"Failed to close slow websocket client: {err}")
+
+    async def _write(self, client: BroadcastClient) -> None:
+        try:
+            while True:
+                message = await client.queue.get()
+                await client.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            logger.info(f"Stopped writing to websocket client: {err}")
+            self.clients.pop(id(client), None)
+
+    async def _listen(self) -> None:
+        pubsub = redis_session_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(self.channel)
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    self.deliver(message["data"].decode())
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            logger.error(f"Stopped listening to {self.channel}: {err}")
+        finally:
+            await pubsub.aclose()
+
+
+public_web_socket_hub = BroadcastHub("ws:v1:public_web_socket")
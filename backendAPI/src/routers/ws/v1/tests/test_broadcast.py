@@ -0,0 +1,103 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from core.config import config
+from routers.ws.v1.broadcast import BroadcastHub
+
+
+class FakeWebSocket:
+    """Websocket, that records the messages sent to it - or blocks like a slow client."""
+
+    def __init__(self, slow: bool = False):
+        self.messages = []
+        self.closed_with = None
+        self.unblocked = asyncio.Event()
+        if not slow:
+            self.unblocked.set()
+
+    async def send_text(self, message: str):
+        await self.unblocked.wait()
+        self.messages.append(message)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+@pytest.mark.anyio
+async def test_slow_client_does_not_hold_up_the_others():
+    """Tests a slow client only keeps the most recent messages."""
+    hub = BroadcastHub("ws:test:coalesce")
+    fast_websocket = FakeWebSocket()
+    slow_websocket = FakeWebSocket(slow=True)
+    with (
+        patch.object(config, "WEBSOCKET_SEND_QUEUE_SIZE", 2),
+        patch.object(config, "WEBSOCKET_SLOW_CLIENT_POLICY", "coalesce"),
+    ):
+        await hub.connect(fast_websocket)
+        await hub.connect(slow_websocket)
+        for number in range(5):
+            await hub.publish(f"message {number}")
+            await asyncio.sleep(0)
+
+        assert fast_websocket.messages == [f"message {number}" for number in range(5)]
+        metrics = hub.metrics()
+        assert metrics["clients"] == 2
+        assert metrics["max_queue_depth"] == 2
+        assert metrics["dropped_messages"] == 2
+        assert metrics["dropped_clients"] == 0
+
+        slow_websocket.unblocked.set()
+        await asyncio.sleep(0.01)
+    # the first message was on its way already:
+    assert slow_websocket.messages == ["message 0", "message 3", "message 4"]
+    await hub.stop()
+
+
+@pytest.mark.anyio
+async def test_slow_client_gets_disconnected():
+    """Tests a slow client gets closed, when its queue is full."""
+    hub = BroadcastHub("ws:test:disconnect")
+    slow_websocket = FakeWebSocket(slow=True)
+    with (
+        patch.object(config, "WEBSOCKET_SEND_QUEUE_SIZE", 1),
+        patch.object(config, "WEBSOCKET_SLOW_CLIENT_POLICY", "disconnect"),
+    ):
+        await hub.connect(slow_websocket)
+        for number in range(3):
+            await hub.publish(f"message {number}")
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+
+    assert slow_websocket.closed_with == 1013
+    assert hub.metrics() == {
+        "clients": 0,
+        "queued_messages": 0,
+        "max_queue_depth": 0,
+        "dropped_messages": 2,
+        "dropped_clients": 1,
+    }
+
+
+@pytest.mark.anyio
+async def test_broadcast_reaches_the_websockets_of_other_workers():
+    """Tests messages published on one worker reach the websockets of another."""
+    publishing_hub = BroadcastHub("ws:test:workers")
+    receiving_hub = BroadcastHub("ws:test:workers")
+    websocket = FakeWebSocket()
+    await publishing_hub.start()
+    await receiving_hub.start()
+    await receiving_hub.connect(websocket)
+    # the hubs subscribe in the background:
+    await asyncio.sleep(0.5)
+
+    await publishing_hub.publish("Hello from another worker!")
+    for _ in range(20):
+        if websocket.messages:
+            break
+        await asyncio.sleep(0.1)
+
+    assert websocket.messages == ["Hello from another worker!"]
+    await publishing_hub.stop()
+    await receiving_hub.stop()
@@ -1,4 +1,5 @@
 import pytest
+from fastapi.testclient import TestClient
 from httpx import AsyncClient
 from websockets.asyncio.client import connect
 
@@ -12,3 +13,22 @@ async def test_public_websocket(
         await websocket.send("Hello, world!")
         response = await websocket.recv()
         assert response == "Message received from client: Hello, world!"
+
+
+def test_public_websocket_broadcasts_to_all_clients(client: TestClient):
+    """Test a message to the public websocket reaches all connected clients."""
+    with client.websocket_connect("/ws/v1/public_web_socket") as first_websocket:
+        with client.websocket_connect("/ws/v1/public_web_socket") as second_websocket:
+            first_websocket.send_text("Hello, world!")
+            assert (
+                first_websocket.receive_text()
+                == "Message received from client: Hello, world!"
+            )
+            assert (
+                second_websocket.receive_text()
+                == "Message received from client: Hello, world!"
+            )
+
+    response = client.get("/ws/v1/public_web_socket/metrics")
+    assert response.status_code == 200
+    assert response.json()["dropped_clients"] == 0
@@ -1,13 +1,13 @@
 import logging
-from typing import List
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from .broadcast import public_web_socket_hub
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 public_web_socket_on = True
-clients: List[WebSocket] = []
 
 
 @router.websocket("/public_web_socket")
@@ -15,7 +15,8 @@ async def demo_websocket_endpoint(websocket: WebSocket):
     """Demo websocket endpoint."""
     logger.info("=== ws - v1 - public_web_socket ===")
     await websocket.accept()
-    clients.append(websocket)
+    # every client gets its own send queue - slow clients don't hold up the others:
+    client = await public_web_socket_hub.connect(websocket)
     print("=== ws - v1 - public_web_socket - connected ===")
     # print("=== clients ===")
     # pprint([vars(client) for client in clients])
@@ -29,14 +30,12 @@ async def demo_websocket_endpoint(websocket: WebSocket):
             print("=== ws - v1 - public_web_socket - data ===", flush=True)
             print(data, flush=True)
             # await websocket.send_text(f"Message received from client: {data}")
-            for client in clients:
-                await client.send_text(f"Message received from client: {data}")
+            await public_web_socket_hub.publish(f"Message received from client: {data}")
     except WebSocketDisconnect:
         logger.info("=== ws - v1 - public_web_socket - disconnected ===")
         print("=== Websocket closed ===", flush=True)
         print("=== websocket ===", flush=True)
         print(websocket, flush=True)
-        clients.remove(websocket)
     except Exception as e:
         logger.info("=== ws - v1 - public_web_socket - exception ===")
         print("=== Exception in websocket ===", flush=True)
@@ -46,8 +45,7 @@ async def demo_websocket_endpoint(websocket: WebSocket):
         #     code=status.WS_1011_INTERNAL_ERROR, reason=f"Websocket closed: {str(e)}"
         # )
     finally:
-        if websocket in clients:
-            clients.remove(websocket)
+        await public_web_socket_hub.disconnect(client)
         logger.info("=== ws - v1 - public_web_socket - disconnected ===")
         print("=== Websocket closed ===")
         try:
@@ -56,3 +54,9 @@ async def demo_websocket_endpoint(websocket: WebSocket):
             logger.info("=== ws - v1 - public_web_socket - exception ===")
             print("=== Exception in closing websocket ===", flush=True)
             print(str(e), flush=True)
+
+
+@router.get("/public_web_socket/metrics")
+async def get_public_web_socket_metrics() -> dict:
+    """Returns the send queue depths and drop counts of the public websocket on this worker."""
+    return public_web_socket_hub.metrics()
@@ -57,6 +57,9 @@ class RedisClientWrapper implements ICacheClient {
 
 		if (authSessionData) {
 			await this.redisClient.expire(`msal:${key}`, 60 * 60 * 24 * 7); // 7 days
+			// the backend reloads its copy of the token cache only, when the version changed:
+			await this.redisClient.incr(`msal:${key}:version`);
+			await this.redisClient.expire(`msal:${key}:version`, 60 * 60 * 24 * 7);
 		}
 		return authSessionData;
 	}
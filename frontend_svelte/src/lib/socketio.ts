@@ -5,10 +5,18 @@ import { getContext } from 'svelte';
 import type { BackendAPIConfiguration } from '$lib/types.d.ts';
 import type { SocketioConnection } from '$lib/types.d.ts';
 
+// Snapshots above a size threshold arrive zlib compressed:
+const inflate = async (data: ArrayBuffer) => {
+	const stream = new Blob([data]).stream().pipeThrough(new DecompressionStream('deflate'));
+	return await new Response(stream).json();
+};
+
 export class SocketIO {
 	// TBD: remove event and rooms from SocketioConnection
 	// private connection: SocketioConnection;
 	public client: Socket;
+	// pages of a snapshot are handled in the order they arrived:
+	private snapshots: Promise<void> = Promise.resolve();
 
 	constructor(connection: SocketioConnection) {
 		// TBD: put a try catch here?
@@ -25,6 +33,24 @@ export class SocketIO {
 		this.client.connect();
 	}
 
+	// Receives the state of the namespace page by page and remembers the cursor,
+	// so a reconnect only transfers what changed since:
+	onSnapshot(handler: (data: any) => void) {
+		this.client.on('snapshot', (snapshot) => {
+			this.snapshots = this.snapshots.then(async () => {
+				const data = snapshot.compressed ? await inflate(snapshot.data) : snapshot.data;
+				handler(data);
+				this.setSnapshotCursor(snapshot.cursor);
+			});
+		});
+	}
+
+	setSnapshotCursor(cursor: string | null) {
+		if (cursor) {
+			(this.client.auth as Record<string, unknown>).snapshot_cursor = cursor;
+		}
+	}
+
 	// sendMessage(message: string) {
 	//     this.socket.send(message);
 	// }